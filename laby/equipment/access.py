@@ -0,0 +1,106 @@
+"""
+Role and approval checks without loading the user on every request.
+
+The role decorators (decorators.py) used to read request.user, which costs
+a User query on top of the session lookup on every protected request. The
+user's role and approval now ride along in the session, stamped with a
+per-user version kept in the cache; signals.py bumps that version whenever
+the User row is saved (approve_staff, a role or password change) or
+deleted, and the next request re-reads the user. API access tokens carry
+the same claims (AccessTokenObtainPairSerializer, AccessTokenAuthentication).
+
+With the per-process locmem cache a bump only reaches the process that
+made it, so every entry is also re-checked after AUTH_CACHE_SECONDS; use
+LABY_CACHE=file to invalidate across worker processes at once.
+
+Staff only count as staff once an admin has approved them.
+"""
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+
+SESSION_ACCESS_KEY = '_laby_access'
+
+Access = namedtuple('Access', 'user_id role is_approved')
+
+
+# who may do what; takes a User, an Access or an API TokenUser
+def is_admin(user):
+    return user.role == 'Admin'
+
+
+def is_staff_member(user):
+    return user.role == 'Admin' or (user.role == 'Staff' and bool(user.is_approved))
+
+
+def _version_key(user_id):
+    return f"laby:access:{user_id}"
+
+
+def access_version(user_id):
+    # a missing key (evicted or never read) starts from a fresh number, so older stamps never match
+    return cache.get_or_set(_version_key(user_id), time.time_ns, timeout=None)
+
+
+def bump_access(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def remember(request, user):
+    """Stores the user's access in the session (done at login, and after every re-check)."""
+    request.session[SESSION_ACCESS_KEY] = [user.pk, user.role, user.is_approved,
+                                           access_version(user.pk), time.time()]
+    return Access(user.pk, user.role, user.is_approved)
+
+
+def get_access(request):
+    """The logged-in user's Access, or None when nobody is logged in."""
+    session = request.session
+    user_id = session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    stored = session.get(SESSION_ACCESS_KEY)
+    if stored:
+        stored_id, role, is_approved, version, checked_at = stored
+        if (str(stored_id) == str(user_id) and version == access_version(stored_id)
+                and time.time() - checked_at < getattr(settings, 'AUTH_CACHE_SECONDS', 300)):
+            return Access(stored_id, role, is_approved)
+    # missing or stale: load the user the usual way (session hash checks included)
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    return remember(request, user)
+
+
+class AccessTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['role'] = user.role
+        token['is_approved'] = user.is_approved
+        token['access_version'] = access_version(user.pk)
+        return token
+
+
+class AccessTokenAuthentication(JWTAuthentication):
+    """
+    Trusts the role claims of a token issued since the user last changed:
+    request.user is then a TokenUser (.pk, .role, .is_approved) and no User
+    query runs. Older tokens fall back to loading the User.
+    """
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get('access_version')
+        if user_id is not None and version is not None and version == access_version(user_id):
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import User, Supplier, Equipment, UsageRecord, Alert
+from .models import (
+    User, Supplier, Equipment, UsageRecord, Alert, OverdueNotice, Reservation, Category, Location, Condition,
+)
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -12,7 +14,13 @@ class SupplierAdmin(admin.ModelAdmin):
 @admin.register(Equipment)
 class EquipmentAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'quantity', 'condition', 'location', 'added_on')
-    search_fields = ('name', 'category')
+    list_select_related = ('category', 'location', 'condition')
+    search_fields = ('name', 'category__name')
+
+@admin.register(Category, Location, Condition)
+class LookupAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
 
 @admin.register(UsageRecord)
 class UsageRecordAdmin(admin.ModelAdmin):
@@ -20,4 +28,15 @@ class UsageRecordAdmin(admin.ModelAdmin):
 
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
-    list_display = ('equipment', 'type', 'created_at')
+    list_display = ('equipment', 'type', 'occurrences', 'created_at', 'last_seen_at', 'is_active')
+    list_filter = ('type', 'is_active')
+
+@admin.register(OverdueNotice)
+class OverdueNoticeAdmin(admin.ModelAdmin):
+    list_display = ('usage_record', 'overdue_since', 'next_reminder_on', 'reminders_sent', 'closed_on')
+    list_filter = ('closed_on',)
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('equipment', 'user', 'quantity', 'starts_on', 'ends_on', 'status')
+    list_filter = ('status',)
@@ -0,0 +1,192 @@
+"""
+The one place alerts are raised and resolved.
+
+An alert's dedup key is (equipment, type), one of Alert.TYPE_CHOICES; the
+partial unique constraint alert_active_key_uniq allows one active alert per
+key. Raising a key that is already active coalesces into that alert
+(occurrences + 1, last_seen_at, latest message) instead of adding a row.
+
+Writes per alert are bounded: a repeat within ALERT_COALESCE_SECONDS of the
+alert's last write is only counted in memory, and folded into its next
+write or into flush_pending(), which the scheduler runs every pass. New
+alerts, and alerts raised again after being resolved, are always written.
+
+Low stock is a state, not an event: sync_low_stock() raises it for items
+at or below LOW_STOCK_THRESHOLD and resolves it once they are restocked.
+It runs whenever stock changes (signals.py) and on every scheduler pass.
+"""
+import datetime
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, TextField, Value, When
+from django.utils import timezone
+
+from . import audit, stats
+from .caching import bump_version
+from .events import alerts_changed
+from .models import Alert, AuditEvent, Equipment
+
+
+_pending = {}  # alert id -> [repeats not written yet, latest message]
+_pending_lock = threading.Lock()
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def active():
+    """Active alerts, most recently seen first: one query on alert_active_seen_idx."""
+    return (Alert.objects.filter(is_active=True)
+            .select_related('equipment__category', 'equipment__location').order_by('-last_seen_at'))
+
+
+def raise_alert(equipment_id, kind, message):
+    """Raises `kind` on an item, or coalesces into its active alert; returns the alert id."""
+    now = timezone.now()
+    current = _active(equipment_id, kind)
+    if current is None:
+        try:
+            with transaction.atomic():
+                alert = Alert.objects.create(equipment_id=equipment_id, type=kind, message=message,
+                                             last_seen_at=now)
+            return alert.id
+        except IntegrityError:
+            # raised at the same moment elsewhere: count this one as a repeat of theirs
+            current = _active(equipment_id, kind)
+            if current is None:
+                raise
+
+    alert_id, last_seen_at = current
+    if now - last_seen_at < datetime.timedelta(seconds=setting('ALERT_COALESCE_SECONDS', 60)):
+        with _pending_lock:
+            repeats = _pending.setdefault(alert_id, [0, message])
+            repeats[0] += 1
+            repeats[1] = message
+        return alert_id
+    with _pending_lock:
+        repeats, _ = _pending.pop(alert_id, (0, None))
+    _coalesce({alert_id: 1 + repeats}, {alert_id: message}, now)
+    return alert_id
+
+
+def raise_many(kind, events):
+    """
+    raise_alert() for a batch of (equipment_id, message) events, without the
+    write bound: a batch already costs one INSERT and one UPDATE.
+    Returns {equipment_id: alert id}.
+    """
+    counts = Counter(equipment_id for equipment_id, _ in events)
+    messages = dict(events)  # the latest message per item wins
+    if not counts:
+        return {}
+    now = timezone.now()
+    existing = dict(Alert.objects.filter(type=kind, is_active=True, equipment_id__in=counts)
+                    .values_list('equipment_id', 'id'))
+    new = [Alert(equipment_id=equipment_id, type=kind, message=messages[equipment_id],
+                 occurrences=count, last_seen_at=now)
+           for equipment_id, count in counts.items() if equipment_id not in existing]
+    try:
+        with transaction.atomic():
+            created = Alert.objects.bulk_create(new)
+    except IntegrityError:
+        # some were raised at the same moment elsewhere: insert one by one, coalescing into theirs
+        created = []
+        for alert in new:
+            try:
+                with transaction.atomic():
+                    created += Alert.objects.bulk_create([alert])
+            except IntegrityError:
+                current = _active(alert.equipment_id, kind)
+                if current is None:
+                    raise
+                existing[alert.equipment_id] = current[0]
+    if created:
+        # bulk_create skips the signals that keep these current
+        stats.bump(alert_count=len(created))
+        audit.record_many(created, AuditEvent.CREATED)
+        transaction.on_commit(lambda: bump_version('alert'))
+        alerts_changed(alert.id for alert in created)
+    if existing:
+        _coalesce({alert_id: counts[equipment_id] for equipment_id, alert_id in existing.items()},
+                  {alert_id: messages[equipment_id] for equipment_id, alert_id in existing.items()}, now)
+    return {**existing, **{alert.equipment_id: alert.id for alert in created}}
+
+
+def resolve(alerts):
+    """Deactivates the active alerts in the `alerts` queryset; returns how many."""
+    ids = list(alerts.filter(is_active=True).values_list('id', flat=True))
+    resolved = alerts.filter(is_active=True).update(is_active=False)
+    if resolved:
+        alerts_changed(ids)
+        audit.record('alert', AuditEvent.UPDATED, {alert_id: {'is_active': False} for alert_id in ids})
+        # update() skips the signals that keep these current
+        stats.bump(alert_count=-resolved)
+        transaction.on_commit(lambda: bump_version('alert'))
+    return resolved
+
+
+def flush_pending():
+    """Writes the repeats counted in memory; returns how many alerts were updated."""
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if pending:
+        # they still count towards alerts resolved since, so no is_active filter
+        _coalesce({alert_id: count for alert_id, (count, _) in pending.items()},
+                  {alert_id: message for alert_id, (_, message) in pending.items()}, timezone.now())
+    return len(pending)
+
+
+def sync_low_stock(equipment_ids=None):
+    """
+    Raises Low Stock for items at or below LOW_STOCK_THRESHOLD and resolves it
+    for items above; all items when `equipment_ids` is None.
+    Returns (raised or coalesced, resolved).
+    """
+    threshold = setting('LOW_STOCK_THRESHOLD', 2)
+    items = Equipment.objects.all()
+    alerts = Alert.objects.filter(type=Alert.LOW_STOCK, is_active=True)
+    if equipment_ids is not None:
+        items = items.filter(id__in=equipment_ids)
+        alerts = alerts.filter(equipment_id__in=equipment_ids)
+    low = dict(items.filter(quantity__lte=threshold).values_list('id', 'quantity'))
+    alerted = set(alerts.values_list('equipment_id', flat=True))
+
+    raise_many(Alert.LOW_STOCK, [(equipment_id, _low_stock_message(quantity))
+                                 for equipment_id, quantity in low.items() if equipment_id not in alerted])
+    if equipment_ids is not None:
+        # stock moved again while low: a repeat, so the message shows the new count
+        for equipment_id in alerted & set(low):
+            raise_alert(equipment_id, Alert.LOW_STOCK, _low_stock_message(low[equipment_id]))
+    raised = len(low) if equipment_ids is not None else len(set(low) - alerted)
+    return raised, resolve(alerts.filter(equipment_id__in=alerted - set(low)))
+
+
+def _low_stock_message(quantity):
+    return f"Only {quantity} units left"
+
+
+def _active(equipment_id, kind):
+    return (Alert.objects.filter(equipment_id=equipment_id, type=kind, is_active=True)
+            .values_list('id', 'last_seen_at').first())
+
+
+def _case(values):
+    return Case(*[When(pk=pk, then=Value(value)) for pk, value in values.items()], default=Value(0),
+                output_field=PositiveIntegerField())
+
+
+def _coalesce(repeats, messages, now):
+    """Adds `repeats` ({alert id: n}) to occurrences and stamps last_seen_at, in one UPDATE."""
+    Alert.objects.filter(id__in=list(repeats)).update(
+        occurrences=F('occurrences') + _case(repeats),
+        message=Case(*[When(pk=pk, then=Value(message)) for pk, message in messages.items()],
+                     default=F('message'), output_field=TextField()),
+        last_seen_at=now,
+    )
+    transaction.on_commit(lambda: bump_version('alert'))
+    alerts_changed(repeats)
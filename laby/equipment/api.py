@@ -0,0 +1,226 @@
+"""
+Read-only REST API under /api/.
+
+Every list is cursor paginated, accepts ?fields= and answers conditional
+GETs (If-None-Match / If-Modified-Since) with 304 straight from the cache
+versions, before any database query runs.
+
+/api/catalogue/ is the exception: one precompressed JSON document of the
+whole catalogue plus ?since= deltas, for clients that filter locally
+(equipment/catalogue.py). So are the audit endpoints, which read the
+append-only log (equipment/audit.py) rather than cached tables.
+"""
+import hashlib
+
+from django.http import HttpResponse
+from django.urls import include, path
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import permissions, viewsets
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from . import audit, catalogue, lookups, rollups
+from .access import AccessTokenAuthentication, AccessTokenObtainPairSerializer, is_staff_member
+from .caching import get_last_modified, get_versions
+from .models import Alert, AuditEvent, Equipment, EquipmentRequest, UsageRecord
+from .serializers import (
+    AlertSerializer, AuditEventSerializer, EquipmentRequestSerializer, EquipmentSerializer, UsageRecordSerializer,
+)
+
+
+class NewestFirstCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class IsStaffRole(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and is_staff_member(request.user)
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified from the per-model cache versions of `depends_on`.
+    Polling clients that already hold the current data get an empty 304.
+    """
+    depends_on = ()
+
+    def _validators(self, request):
+        versions = get_versions(*self.depends_on)
+        raw = ':'.join([
+            request.get_full_path(), str(request.user.pk),
+            *(str(versions[name]) for name in self.depends_on),
+        ])
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        return etag, int(get_last_modified(*self.depends_on))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(request, '_conditional_validators', None)
+        if validators and response.status_code == 200:
+            etag, last_modified = validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request) or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request) or super().retrieve(request, *args, **kwargs)
+
+    def _conditional(self, request):
+        etag, last_modified = self._validators(request)
+        request._conditional_validators = (etag, last_modified)
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+class EquipmentViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Equipment.objects.with_lookups()
+    serializer_class = EquipmentSerializer
+    pagination_class = NewestFirstCursorPagination
+    filterset_fields = ['category', 'location', 'condition']  # lookup ids
+    search_fields = ['name', 'category__name', 'location__name']
+    depends_on = ('equipment', 'category', 'location', 'condition')
+
+
+class UsageRecordViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = UsageRecordSerializer
+    pagination_class = NewestFirstCursorPagination
+    filterset_fields = {'user': ['exact'], 'equipment': ['exact'], 'returned_on': ['isnull'],
+                        'due_date': ['lt', 'gte']}
+    depends_on = ('usagerecord', 'equipment')
+
+    def get_queryset(self):
+        records = UsageRecord.objects.with_related()
+        if not is_staff_member(self.request.user):
+            records = records.filter(user_id=self.request.user.pk)
+        return records
+
+
+class EquipmentRequestViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = EquipmentRequestSerializer
+    pagination_class = NewestFirstCursorPagination
+    filterset_fields = ['status', 'equipment', 'user']
+    depends_on = ('equipmentrequest', 'equipment')
+
+    def get_queryset(self):
+        requests = EquipmentRequest.objects.with_related()
+        if not is_staff_member(self.request.user):
+            requests = requests.filter(user_id=self.request.user.pk)
+        return requests
+
+
+class AlertViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Alert.objects.select_related('equipment')
+    serializer_class = AlertSerializer
+    pagination_class = NewestFirstCursorPagination
+    permission_classes = [IsStaffRole]
+    filterset_fields = ['is_active', 'type', 'equipment']
+    depends_on = ('alert', 'equipment')
+
+
+class AnalyticsView(APIView):
+    """Loan analytics from the rollup tables; same ?days= / ?start=&end= / ?category=<id> as the dashboard."""
+    permission_classes = [IsStaffRole]
+
+    def get(self, request):
+        start, end = rollups.parse_range(request.query_params)
+        return Response(rollups.report(start, end, lookups.parse_id(request.query_params.get('category'))))
+
+
+class AuditEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """Who changed what: ?model=equipment&object_id=12, ?user=, ?action=, ?created_at__gte=."""
+    queryset = AuditEvent.objects.select_related('user')
+    serializer_class = AuditEventSerializer
+    pagination_class = NewestFirstCursorPagination
+    permission_classes = [IsStaffRole]
+    filterset_fields = {'model': ['exact'], 'object_id': ['exact'], 'user': ['exact'], 'action': ['exact'],
+                        'created_at': ['gte', 'lte']}
+
+
+class InventoryAsOfView(APIView):
+    """Equipment as it stood at ?at= (ISO date or datetime), optionally one ?category=<id> or ?equipment=."""
+    permission_classes = [IsStaffRole]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            when = audit.parse_when(params.get('at', ''))
+        except ValueError as exc:
+            raise ValidationError({'at': str(exc)})
+        equipment = params.get('equipment')
+        if equipment and not equipment.isdigit():
+            raise ValidationError({'equipment': "Expected an equipment id."})
+        category = params.get('category')
+        if category and not category.isdigit():
+            raise ValidationError({'category': "Expected a category id."})
+        equipment_ids = [int(equipment)] if equipment else None
+        items = audit.inventory_as_of(when, int(category) if category else None, equipment_ids)
+        return Response({'at': when, 'count': len(items), 'items': items})
+
+
+class CatalogueView(APIView):
+    """
+    The whole catalogue, or with ?since=<version> what changed after it.
+    Browsers on the viewer pages use their session; other clients a token.
+    """
+    authentication_classes = [AccessTokenAuthentication, SessionAuthentication]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                changes = catalogue.delta(int(since))
+            except ValueError:
+                raise ValidationError({'since': "Expected a catalogue version."})
+            if changes is not None:
+                _, data = changes
+                # deltas are small: compress only the ones worth it
+                return self._send(request, catalogue.encode(data) if len(data) > 1024 else {'': data})
+
+        version = catalogue.current_version()
+        etag = quote_etag(f"catalogue-{version}")
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified:
+            return not_modified
+        _, bodies = catalogue.snapshot(version)
+        response = self._send(request, bodies)
+        response['ETag'] = etag
+        return response
+
+    def _send(self, request, bodies):
+        accepted = {part.split(';')[0].strip() for part in request.headers.get('Accept-Encoding', '').split(',')}
+        encoding = next((name for name in ('br', 'gzip') if name in bodies and name in accepted), '')
+        response = HttpResponse(bodies[encoding], content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+router = DefaultRouter()
+router.register('equipment', EquipmentViewSet, basename='api-equipment')
+router.register('usage-records', UsageRecordViewSet, basename='api-usage-record')
+router.register('requests', EquipmentRequestViewSet, basename='api-request')
+router.register('alerts', AlertViewSet, basename='api-alert')
+router.register('audit/events', AuditEventViewSet, basename='api-audit-event')
+
+urlpatterns = [
+    path('token/', TokenObtainPairView.as_view(serializer_class=AccessTokenObtainPairSerializer),
+         name='api_token'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='api_token_refresh'),
+    path('analytics/', AnalyticsView.as_view(), name='api_analytics'),
+    path('catalogue/', CatalogueView.as_view(), name='api_catalogue'),
+    path('audit/inventory/', InventoryAsOfView.as_view(), name='api_inventory_as_of'),
+    path('', include(router.urls)),
+]
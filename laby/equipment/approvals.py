@@ -0,0 +1,153 @@
+"""
+Batch processing of pending EquipmentRequests.
+
+process_requests() handles any number of requests in one transaction with
+a fixed number of queries: the requests and their Equipment rows are
+locked once, stock is checked for the whole batch in memory (oldest
+request first), loans are written with bulk_create and requests with
+bulk_update, and the stock moves through StockLedger.apply_many. An
+approval also leaves alone the units reserved during the loan (today to the
+due date, availability.py): a request they would be taken from is refused.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, availability, events, projection, rollups, stats
+from .caching import bump_version
+from .ledger import StockLedger
+from .models import AuditEvent, Equipment, EquipmentRequest, StockMovement, UsageRecord
+
+
+MAX_BATCH = 500
+
+APPROVED = 'approved'
+REJECTED = 'rejected'
+INSUFFICIENT_STOCK = 'insufficient_stock'
+RESERVED = 'reserved'
+NOT_PENDING = 'not_pending'
+NOT_FOUND = 'not_found'
+
+Outcome = namedtuple('Outcome', 'request_id status message')
+
+
+def process_requests(request_ids, action, user, due_date=None):
+    """
+    Approves or rejects the pending requests in `request_ids`.
+    Returns one Outcome per id, in the order given. Requests that can't be
+    approved (stock ran out, already processed, unknown, not a number) are
+    reported and left untouched; the rest are processed together. Raises
+    InsufficientStock, with nothing changed, if stock moved underneath.
+    """
+    if action not in ('approve', 'reject'):
+        raise ValueError(f"Unknown action {action!r}")
+    if action == 'approve' and not due_date:
+        raise ValueError("A due date is required to approve requests.")
+    request_ids = list(dict.fromkeys(_request_id(i) for i in request_ids))[:MAX_BATCH]
+    now = timezone.now()
+    outcomes = {}
+
+    with transaction.atomic():
+        # lock order by id, like StockLedger, so concurrent batches can't deadlock
+        requests = list(
+            EquipmentRequest.objects.select_for_update(of=('self',))
+            .filter(id__in=[i for i in request_ids if isinstance(i, int)]).select_related('equipment').only(
+                'user_id', 'equipment_id', 'quantity', 'status', 'requested_at', 'equipment__name',
+            ).order_by('id')
+        )
+        pending = []
+        for req in requests:
+            if req.status == 'pending':
+                pending.append(req)
+            else:
+                outcomes[req.id] = Outcome(req.id, NOT_PENDING, f"Request was already {req.status}.")
+
+        if action == 'approve':
+            processed = _approve(pending, user, due_date, outcomes)
+        else:
+            processed = pending
+            for req in pending:
+                outcomes[req.id] = Outcome(req.id, REJECTED, f"Rejected request for {req.equipment.name}.")
+
+        for req in processed:
+            req.status = APPROVED if action == 'approve' else REJECTED
+            req.processed_at = now
+        EquipmentRequest.objects.bulk_update(processed, ['status', 'processed_at'])
+        audit.record_many(processed, fields=['status'])
+        if processed:
+            # bulk_update skips post_save, which is what bumps the cache version
+            transaction.on_commit(lambda: bump_version('equipmentrequest'))
+            projection.apply_many(projection.merge(*(
+                projection.request_change({'equipment_id': req.equipment_id, 'quantity': req.quantity,
+                                           'status': projection.PENDING}, None)
+                for req in processed
+            )))
+            events.requests_changed(req.id for req in processed)
+
+    return [outcomes.get(i) or Outcome(i, NOT_FOUND, "No such request.") for i in request_ids]
+
+
+def _request_id(value):
+    # ids that aren't numbers stay as given and are reported as not found
+    value = str(value).strip()
+    return int(value) if value.isdigit() else value
+
+
+def _approve(pending, user, due_date, outcomes):
+    """
+    Approves what the locked stock and the reservations over the loan allow,
+    oldest request first; returns the approved requests.
+    """
+    available = dict(
+        Equipment.objects.select_for_update()
+        .filter(id__in={req.equipment_id for req in pending})
+        .order_by('id').values_list('id', 'quantity')
+    )
+    start, end = availability.loan_window(due_date)
+    # every loan of the batch holds its units over the same window, so they simply add up
+    free = availability.free_units_many(list(available), start, end, stock=available)
+    approved = []
+    for req in sorted(pending, key=lambda r: (r.requested_at, r.id)):
+        if free.get(req.equipment_id, 0) >= req.quantity:
+            available[req.equipment_id] -= req.quantity
+            free[req.equipment_id] -= req.quantity
+            approved.append(req)
+        elif available.get(req.equipment_id, 0) >= req.quantity:
+            outcomes[req.id] = Outcome(
+                req.id, RESERVED,
+                f"Only {free[req.equipment_id]} {req.equipment.name} free until {due_date}; "
+                f"the rest is reserved.",
+            )
+        else:
+            outcomes[req.id] = Outcome(
+                req.id, INSUFFICIENT_STOCK,
+                f"Not enough {req.equipment.name} in stock ({available.get(req.equipment_id, 0)} left).",
+            )
+    if not approved:
+        return []
+
+    today = timezone.localdate()
+    records = UsageRecord.objects.bulk_create([
+        UsageRecord(user_id=req.user_id, equipment_id=req.equipment_id, quantity_used=req.quantity,
+                    borrowed_on=today, due_date=due_date, approved_by=user)
+        for req in approved
+    ])
+    # the guarded UPDATEs can still refuse if the rows weren't really locked
+    # (SQLite): InsufficientStock then rolls the whole batch back
+    StockLedger.apply_many([
+        StockMovement(equipment_id=req.equipment_id, delta=-req.quantity, reason='approve',
+                      created_by=user, usage_record=record, equipment_request=req)
+        for req, record in zip(approved, records)
+    ])
+    # bulk_create skips the signals that keep these current
+    stats.bump(borrowed_count=len(records))
+    rollups.apply_many([(None, rollups.record_state(record)) for record in records])
+    audit.record_many(records, AuditEvent.CREATED)
+    projection.apply_many(projection.merge(*(
+        projection.loan_change(None, rollups.record_state(record)) for record in records)))
+    transaction.on_commit(lambda: bump_version('usagerecord'))
+
+    for req in approved:
+        outcomes[req.id] = Outcome(req.id, APPROVED, f"Approved request for {req.equipment.name}.")
+    return approved
@@ -6,5 +6,6 @@ class EquipmentConfig(AppConfig):
     name = 'equipment'
     
     def ready(self):
+        import equipment.db
         import equipment.signals
 
@@ -0,0 +1,137 @@
+"""
+Async versions of the busiest pages, and the /events/ stream.
+
+urls.py routes the dashboards and equipment_detail here when ASYNC_VIEWS is
+on, the default under ASGI (uvicorn laby.asgi:application). A request
+waiting on the database then holds a coroutine instead of a worker thread,
+and the live update stream can stay open for as long as the page does.
+
+Django's async ORM (aget, acount, ...) runs every query on the request's
+one sync thread, so awaiting several of them still runs them one after the
+other. gather_reads() runs independent reads on worker threads instead,
+each with its own database connection, and waits for all of them together.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.utils import timezone
+
+from . import events, lookups, views
+from .access import get_access, is_staff_member
+from .caching import get_versions
+from .decorators import admin_required, staff_required, viewer_allowed
+from .models import Category, DashboardStats, Equipment, EquipmentRequest, UsageRecord
+from .profiling import profiled_queries
+
+
+def _on_worker(func):
+    def run():
+        close_old_connections()
+        try:
+            # the request's profiling sample (a contextvar) is carried over to the worker
+            with profiled_queries():
+                return func()
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def gather_reads(*funcs):
+    """Runs the (read-only) callables concurrently on worker threads; returns their results."""
+    return await asyncio.gather(*(_on_worker(func)() for func in funcs))
+
+
+async def arender(request, template, context):
+    # lazy querysets left in the context (cached fragments) are read while rendering
+    (response,) = await gather_reads(lambda: render(request, template, context))
+    return response
+
+
+#viewer dashboard with search and filters
+@viewer_allowed
+async def viewer_dashboard(request):
+    categories, locations, versions = await gather_reads(
+        views.category_options, views.location_options, lambda: get_versions('equipment'))
+    context = views.viewer_dashboard_context(request, categories, locations, versions)
+    return await arender(request, 'equipment/viewer_dashboard.html', context)
+
+
+@viewer_allowed
+async def equipment_detail(request, id):
+    equipment = await aget_object_or_404(Equipment.objects.with_lookups().with_availability(), id=id)
+    return await arender(request, 'equipment/equipment_detail.html', {'equipment': equipment})
+
+
+#admin dashboard
+@admin_required
+async def admin_dashboard(request):
+    stats, versions, category_names = await gather_reads(
+        DashboardStats.load, lambda: get_versions('equipment', 'alert'), lambda: lookups.names(Category))
+    context = views.admin_dashboard_context(stats, versions, category_names)
+    return await arender(request, 'equipment/admin_dashboard.html', context)
+
+
+#staff dashboard; approving and rejecting (POST) stays with the sync view
+@staff_required
+async def staff_dashboard(request):
+    if request.method == "POST":
+        return await sync_to_async(views.staff_dashboard)(request)
+
+    today = timezone.now().date()
+    borrowed_records, requests_list, stats, versions = await gather_reads(
+        lambda: list(UsageRecord.objects.open().with_related().order_by('due_date')),
+        lambda: list(EquipmentRequest.objects.pending().with_related()),
+        DashboardStats.load,
+        lambda: get_versions('usagerecord', 'equipment'),
+    )
+    overdue_records = UsageRecord.objects.overdue(today).with_related().order_by('due_date')  # cached fragment
+    context = views.staff_dashboard_context(today, borrowed_records, overdue_records, requests_list, stats,
+                                            versions)
+    return await arender(request, "equipment/staff_dashboard.html", context)
+
+
+#live updates for open dashboards (Server-Sent Events, see equipment/events.py)
+@viewer_allowed
+async def events_stream(request):
+    if not isinstance(request, ASGIRequest):
+        # under WSGI an open stream would hold a worker for good: ask the browser to come back later
+        return HttpResponse("retry: 30000\n\n", content_type='text/event-stream')
+
+    # viewers only see stock; alerts and requests are for staff
+    private = not is_staff_member(await sync_to_async(get_access)(request))
+    response = StreamingHttpResponse(_stream(private), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass each event on as it comes
+    return response
+
+
+async def _stream(private):
+    watched = ('equipment',) if private else events.WATCHED_MODELS
+    poll = getattr(settings, 'EVENTS_POLL_SECONDS', 15)
+    (versions,) = await gather_reads(lambda: get_versions(*watched))
+    yield "retry: 5000\n\n"
+
+    with events.subscribe() as queue:
+        covered = set()  # models whose changes were already sent as events since the last poll
+        while True:
+            try:
+                event, message = await asyncio.wait_for(queue.get(), poll)
+            except asyncio.TimeoutError:
+                (current,) = await gather_reads(lambda: get_versions(*watched))
+                moved = {name for name in watched if current[name] != versions[name]} - covered
+                versions, covered = current, set()
+                # changed in another process (or by a write that sends no event): reload to see it
+                if moved:
+                    yield events.format_event('changed', {name: current[name] for name in moved})
+                else:
+                    yield ": keep-alive\n\n"
+                continue
+            if private and event != 'stock':
+                continue
+            covered.add(events.EVENT_MODELS[event])
+            yield message
@@ -0,0 +1,255 @@
+"""
+Append-only audit log: who changed what, and what things looked like at any time.
+
+Every change to an Equipment, UsageRecord, EquipmentRequest or Alert adds an
+AuditEvent with the audited fields it wrote, the acting user (set per request
+by AuditUserMiddleware) and the time. Events are buffered per transaction and
+written with one bulk INSERT once it commits; a rolled back transaction
+writes none. Single saves and deletes come from signals; the paths that skip
+them record their own events (StockLedger, approvals, alerts, importer).
+
+A checkpoint copies the audited fields of every row (AuditSnapshot), so
+state_as_of() starts from the newest checkpoint at or before the requested
+time and replays only the events after it. The scheduler takes one every
+AUDIT_CHECKPOINT_EVENTS events. Nothing from before the log started is
+known beyond the first checkpoint (taken by migration 0022).
+"""
+import datetime
+import threading
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import lookups
+from .access import get_access
+from .models import (
+    Alert, AuditCheckpoint, AuditEvent, AuditSnapshot, Category, Condition, Equipment, EquipmentRequest, Location,
+    UsageRecord,
+)
+
+
+# model_name -> (model, audited fields as attnames)
+AUDITED = {
+    'equipment': (Equipment, ('name', 'category_id', 'location_id', 'condition_id', 'quantity')),
+    'usagerecord': (UsageRecord, ('user_id', 'equipment_id', 'quantity_used', 'borrowed_on', 'due_date',
+                                  'returned_on', 'is_damaged')),
+    'equipmentrequest': (EquipmentRequest, ('user_id', 'equipment_id', 'quantity', 'status')),
+    'alert': (Alert, ('equipment_id', 'type', 'is_active')),
+}
+
+_request = ContextVar('laby_audit_request', default=None)
+_local = threading.local()
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AuditUserMiddleware:
+    """Attributes the events recorded while handling a request to its user."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
+
+
+def _acting_user_id():
+    request = _request.get()
+    access = get_access(request) if request is not None and hasattr(request, 'session') else None
+    return access.user_id if access else None
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+class _Batch(list):
+    def flush(self):
+        if getattr(_local, 'batch', None) is self:
+            del _local.batch
+        AuditEvent.objects.bulk_create(self, batch_size=1000)
+
+
+def _pending():
+    """The events waiting for the current transaction to commit."""
+    connection = transaction.get_connection()
+    batch = getattr(_local, 'batch', None)
+    # a rolled back transaction drops its on_commit callbacks, and with them its batch
+    if batch is None or not any(entry[1] == batch.flush for entry in connection.run_on_commit):
+        batch = _local.batch = _Batch()
+        transaction.on_commit(batch.flush, robust=True)
+    return batch
+
+
+def record(model, action, changes):
+    """Logs `changes` ({object_id: {field: value}}) of one audited model, at commit."""
+    user_id = _acting_user_id()
+    now = timezone.now()
+    events = [AuditEvent(model=model, object_id=object_id, action=action, data=data, user_id=user_id,
+                         created_at=now)
+              for object_id, data in changes.items()]
+    if not events:
+        return
+    if transaction.get_connection().in_atomic_block:
+        _pending().extend(events)
+    else:
+        AuditEvent.objects.bulk_create(events)
+
+
+def fields_of(instance, update_fields=None):
+    """The audited fields a save of `instance` wrote (deferred ones excluded)."""
+    _, fields = AUDITED[instance._meta.model_name]
+    return {
+        field: instance.__dict__[field] for field in fields
+        if field in instance.__dict__
+        and (update_fields is None or field in update_fields or field.removesuffix('_id') in update_fields)
+    }
+
+
+def record_saved(instance, created, update_fields=None):
+    data = fields_of(instance, None if created else update_fields)
+    if created or data:
+        record(instance._meta.model_name, AuditEvent.CREATED if created else AuditEvent.UPDATED,
+               {instance.pk: data})
+
+
+def record_deleted(instance):
+    record(instance._meta.model_name, AuditEvent.DELETED, {instance.pk: {}})
+
+
+def record_many(instances, action=AuditEvent.UPDATED, fields=None):
+    """Events for rows written in bulk; `fields` limits an update to the columns it set."""
+    for model, group in _by_model(instances).items():
+        record(model, action, {instance.pk: fields_of(instance, fields) for instance in group})
+
+
+def _by_model(instances):
+    groups = {}
+    for instance in instances:
+        groups.setdefault(instance._meta.model_name, []).append(instance)
+    return groups
+
+
+def record_stock(equipment_ids):
+    """Events for quantities moved with UPDATE ... SET quantity = quantity + n (StockLedger)."""
+    record('equipment', AuditEvent.UPDATED, {
+        equipment_id: {'quantity': quantity}
+        for equipment_id, quantity in Equipment.objects.filter(id__in=equipment_ids).values_list('id', 'quantity')
+    })
+
+
+# ---------------------------------------------------------------------------
+# Checkpoints and point-in-time reads
+# ---------------------------------------------------------------------------
+
+def checkpoint():
+    """Copies every audited row into a new checkpoint; returns it."""
+    with transaction.atomic():
+        point = AuditCheckpoint.objects.create(
+            last_event_id=AuditEvent.objects.aggregate(last=Max('id'))['last'] or 0)
+        for name, (model, fields) in AUDITED.items():
+            rows = model.objects.order_by().values_list('pk', *fields).iterator(chunk_size=5000)
+            batch = []
+            for pk, *values in rows:
+                batch.append(AuditSnapshot(checkpoint=point, model=name, object_id=pk,
+                                           data=dict(zip(fields, values))))
+                if len(batch) >= 5000:
+                    AuditSnapshot.objects.bulk_create(batch)
+                    batch = []
+            AuditSnapshot.objects.bulk_create(batch)
+    return point
+
+
+def maybe_checkpoint():
+    """Takes a checkpoint once AUDIT_CHECKPOINT_EVENTS events piled up since the last; returns rows copied."""
+    last = AuditCheckpoint.objects.order_by('-id').values_list('last_event_id', flat=True).first() or 0
+    if AuditEvent.objects.filter(id__gt=last).count() < setting('AUDIT_CHECKPOINT_EVENTS', 50000):
+        return 0
+    return checkpoint().rows.count()
+
+
+def parse_when(text):
+    """An aware datetime from an ISO date or datetime; a bare date means the end of that day."""
+    when = parse_datetime(text)
+    if when is None:
+        day = parse_date(text)
+        if day is None:
+            raise ValueError(f"Expected an ISO date or datetime, got {text!r}.")
+        when = datetime.datetime.combine(day, datetime.time.max)
+    return timezone.make_aware(when) if timezone.is_naive(when) else when
+
+
+def state_as_of(model, when, object_ids=None):
+    """
+    {object_id: {field: value}} of the `model` rows that existed at `when`,
+    and the checkpoint it started from (None before the first one).
+    """
+    point = AuditCheckpoint.objects.filter(taken_at__lte=when).order_by('-taken_at').first()
+    state = {}
+    events = AuditEvent.objects.filter(model=model, created_at__lte=when)
+    if point is not None:
+        rows = point.rows.filter(model=model)
+        if object_ids is not None:
+            rows = rows.filter(object_id__in=object_ids)
+        state = {object_id: data for object_id, data in rows.values_list('object_id', 'data').iterator()}
+        events = events.filter(id__gt=point.last_event_id)
+    if object_ids is not None:
+        events = events.filter(object_id__in=object_ids)
+
+    for object_id, action, data in events.order_by('id').values_list('object_id', 'action', 'data').iterator():
+        if action == AuditEvent.DELETED:
+            state.pop(object_id, None)
+        else:
+            state.setdefault(object_id, {}).update(data)
+    return state, point
+
+
+def inventory_as_of(when, category=None, equipment_ids=None):
+    """
+    Equipment rows as they stood at `when`, by name: [{'id': ..., 'name': ...,
+    'category_id': ..., 'category': <its name>, ...}]. `category` is a Category id.
+    """
+    state, _ = state_as_of('equipment', when, equipment_ids)
+    names = {field: lookups.names(model) for field, model in
+             (('category', Category), ('location', Location), ('condition', Condition))}
+    items = []
+    for equipment_id, data in state.items():
+        if category is not None and data.get('category_id') != category:
+            continue
+        item = {'id': equipment_id, **data}
+        for field, by_id in names.items():
+            item[field] = by_id.get(data.get(f'{field}_id'))
+        items.append(item)
+    return sorted(items, key=lambda item: (item.get('name') or '', item['id']))
+
+
+def history(model, object_id, until=None):
+    """The events of one row, oldest first, with their users."""
+    events = AuditEvent.objects.filter(model=model, object_id=object_id).select_related('user')
+    if until is not None:
+        events = events.filter(created_at__lte=until)
+    return events.order_by('id')
@@ -0,0 +1,190 @@
+"""
+Reservation calendar: how many units of an item are free over a window.
+
+Everything that holds units is an interval [start, end) of dates:
+
+- an active Reservation holds its quantity over [starts_on, ends_on)
+- an open loan holds quantity_used from today through its due date, and an
+  overdue one through today (it may come back any time)
+
+An item owns its stock (Equipment.quantity, already net of loans) plus
+whatever is out on loan. free_units() is that capacity minus the peak of
+overlapping holds inside the window, found with a sweep over the
+intervals' start/end events, so the answer is O(k log k) in the k
+intervals that touch the window, never O(days) or O(all reservations).
+
+Fetching those k intervals is an index range scan: a reservation overlaps
+[t1, t2) iff starts_on < t2 and ends_on > t1, and because no reservation
+is longer than Reservation.MAX_DAYS, starts_on is also >= t1 - MAX_DAYS.
+Both bounds sit on reservation_active_idx (equipment, starts_on).
+
+Approving a loan (approvals.py, the staff dashboard) checks free units over
+loan_window(), so units booked for a window are never lent out over it.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Equipment, Reservation, UsageRecord
+
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class ReservationConflict(Exception):
+    def __init__(self, equipment_id, requested, free):
+        self.equipment_id = equipment_id
+        self.requested = requested
+        self.free = free
+        super().__init__(f"Only {free} unit(s) of equipment {equipment_id} free, {requested} requested.")
+
+
+def check_window(starts_on, ends_on, today=None):
+    """Raises ValueError unless [starts_on, ends_on) is a bookable window."""
+    today = today or timezone.localdate()
+    if starts_on < today:
+        raise ValueError("Reservations can't start in the past.")
+    if ends_on <= starts_on:
+        raise ValueError("The end date must be after the start date.")
+    if (ends_on - starts_on).days > Reservation.MAX_DAYS:
+        raise ValueError(f"Reservations can be at most {Reservation.MAX_DAYS} days long.")
+
+
+def peak(intervals, start, end):
+    """Largest total quantity held at any moment of [start, end)."""
+    events = []
+    for held_from, held_until, quantity in intervals:
+        held_from, held_until = max(held_from, start), min(held_until, end)
+        if held_from < held_until:
+            events.append((held_from, quantity))
+            events.append((held_until, -quantity))
+    # on the same date releases (negative) sort first: back-to-back bookings don't overlap
+    events.sort()
+    highest = current = 0
+    for _, delta in events:
+        current += delta
+        highest = max(highest, current)
+    return highest
+
+
+def segments(intervals, start, end):
+    """[(from, until, held)] covering [start, end), one entry per change in the held total."""
+    changes = defaultdict(int)
+    for held_from, held_until, quantity in intervals:
+        held_from, held_until = max(held_from, start), min(held_until, end)
+        if held_from < held_until:
+            changes[held_from] += quantity
+            changes[held_until] -= quantity
+    result, current, cursor = [], 0, start
+    for day in sorted(changes):
+        if day > cursor:
+            result.append((cursor, day, current))
+            cursor = day
+        current += changes[day]
+    if cursor < end:
+        result.append((cursor, end, current))
+    return result
+
+
+def holds(equipment_ids, start, end, today=None, exclude_reservation=None):
+    """
+    ({equipment_id: [(from, until, quantity)]}, {equipment_id: units on loan})
+    for everything holding units of these items during [start, end).
+    """
+    today = today or timezone.localdate()
+    intervals = defaultdict(list)
+
+    reservations = Reservation.objects.filter(
+        equipment_id__in=equipment_ids, status='active',
+        starts_on__lt=end, starts_on__gte=start - datetime.timedelta(days=Reservation.MAX_DAYS),
+        ends_on__gt=start,
+    )
+    if exclude_reservation:
+        reservations = reservations.exclude(pk=exclude_reservation)
+    for equipment_id, starts_on, ends_on, quantity in reservations.values_list(
+            'equipment_id', 'starts_on', 'ends_on', 'quantity'):
+        intervals[equipment_id].append((starts_on, ends_on, quantity))
+
+    on_loan = defaultdict(int)
+    loans = UsageRecord.objects.open().filter(equipment_id__in=equipment_ids).order_by()
+    for equipment_id, due_date, quantity in loans.values_list('equipment_id', 'due_date', 'quantity_used'):
+        on_loan[equipment_id] += quantity
+        until = max(due_date, today) + ONE_DAY if due_date else datetime.date.max
+        intervals[equipment_id].append((today, until, quantity))
+    return intervals, on_loan
+
+
+def free_units_many(equipment_ids, start, end, today=None, stock=None):
+    """
+    {equipment_id: units free for the whole of [start, end)} in three
+    queries; two when `stock` ({equipment_id: quantity}) was already read,
+    e.g. under the caller's row locks.
+    """
+    today = today or timezone.localdate()
+    start = max(start, today)
+    if stock is None:
+        stock = dict(Equipment.objects.filter(id__in=equipment_ids).values_list('id', 'quantity'))
+    if end <= start:
+        return {equipment_id: 0 for equipment_id in stock}
+    intervals, on_loan = holds(list(stock), start, end, today)
+    return {
+        equipment_id: max(quantity + on_loan[equipment_id] - peak(intervals[equipment_id], start, end), 0)
+        for equipment_id, quantity in stock.items()
+    }
+
+
+def free_units(equipment_id, start, end, today=None):
+    return free_units_many([equipment_id], start, end, today).get(equipment_id, 0)
+
+
+def loan_window(due_date, today=None):
+    """[start, end) a loan approved today holds its units over, as holds() counts it."""
+    today = today or timezone.localdate()
+    due_date = datetime.date.fromisoformat(str(due_date))
+    return today, max(due_date, today) + ONE_DAY
+
+
+def timeline(equipment, start, end, today=None):
+    """[(from, until, free)] for one item, for a calendar view."""
+    today = today or timezone.localdate()
+    start = max(start, today)
+    if end <= start:
+        return []
+    intervals, on_loan = holds([equipment.id], start, end, today)
+    capacity = equipment.quantity + on_loan[equipment.id]
+    return [(held_from, held_until, max(capacity - held, 0))
+            for held_from, held_until, held in segments(intervals[equipment.id], start, end)]
+
+
+def reserve(user, equipment_id, quantity, starts_on, ends_on, purpose=''):
+    """
+    Books `quantity` units over [starts_on, ends_on). Raises
+    ReservationConflict, with nothing saved, if they aren't free.
+    """
+    if quantity < 1:
+        raise ValueError("Reserve at least one unit.")
+    today = timezone.localdate()
+    check_window(starts_on, ends_on, today)
+    with transaction.atomic():
+        # the row lock serialises bookings of one item (PostgreSQL); on SQLite
+        # the INSERT takes the write lock, so everything is read after it
+        if not Equipment.objects.select_for_update().filter(pk=equipment_id).exists():
+            raise Equipment.DoesNotExist(equipment_id)
+        reservation = Reservation.objects.create(
+            user=user, equipment_id=equipment_id, quantity=quantity,
+            starts_on=starts_on, ends_on=ends_on, purpose=purpose,
+        )
+        stock = Equipment.objects.filter(pk=equipment_id).values_list('quantity', flat=True).get()
+        intervals, on_loan = holds([equipment_id], starts_on, ends_on, today,
+                                   exclude_reservation=reservation.pk)
+        free = max(stock + on_loan[equipment_id] - peak(intervals[equipment_id], starts_on, ends_on), 0)
+        if quantity > free:
+            raise ReservationConflict(equipment_id, quantity, free)
+    return reservation
+
+
+def cancel(reservation):
+    return Reservation.objects.filter(pk=reservation.pk, status='active').update(status='cancelled')
+
@@ -0,0 +1,70 @@
+"""
+Helpers shared by the benchmark management commands.
+Benchmarks never touch the configured database: they run inside a
+throw-away, fully migrated test database.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def scratch_database(verbosity=0, on_disk=False):
+    """
+    Also sets up the test environment, so the test client can be used inside.
+    SQLite's test database is in memory by default, where threads share one
+    cache and fail on table locks instead of waiting: pass on_disk=True when
+    several threads write.
+    """
+    test_settings = connection.settings_dict['TEST']
+    test_name = test_settings['NAME']
+    if on_disk and connection.vendor == 'sqlite' and not test_name:
+        test_settings['NAME'] = f"{connection.settings_dict['NAME']}.scratch"
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    setup_test_environment()
+    try:
+        yield
+    finally:
+        teardown_test_environment()
+        connection.creation.destroy_test_db(old_name, verbosity)
+        test_settings['NAME'] = test_name
+
+
+def timed(func, repeat=5):
+    """Best-of-`repeat` wall time of func() in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def insert_rows(model, columns, rows, batch_size=10_000):
+    """
+    Raw executemany() insert for seeding millions of rows quickly.
+    Skips save(), signals and auto_now_add so seeded dates are kept.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(model._meta.get_field(c).column) for c in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    sql = f"INSERT INTO {table} ({names}) VALUES ({placeholders})"
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                batch.clear()
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
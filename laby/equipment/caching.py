@@ -0,0 +1,108 @@
+"""
+Dashboard caching.
+
+Cache keys embed a version number per model ("equipment", "usagerecord",
+"alert", "equipmentrequest"). equipment.signals bumps a model's version
+whenever one of its rows changes, which orphans every entry built from
+the old data, so nothing ever has to be deleted by hand.
+"""
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+VERSIONED_MODELS = ('equipment', 'usagerecord', 'alert', 'equipmentrequest')
+
+_MISSING = object()
+
+
+def _version_key(name):
+    return f"laby:version:{name}"
+
+
+def get_versions(*names):
+    """Current version of each named model, e.g. {'equipment': 3}."""
+    names = names or VERSIONED_MODELS
+    keys = {name: _version_key(name) for name in names}
+    found = cache.get_many(keys.values())
+    missing = {key: time.time_ns() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {name: found[key] for name, key in keys.items()}
+
+
+def bump_version(name):
+    try:
+        cache.incr(_version_key(name))
+    except ValueError:
+        # unknown key (evicted or never read): start from a fresh, unused number
+        cache.set(_version_key(name), time.time_ns(), timeout=None)
+    cache.set(_changed_key(name), time.time(), timeout=None)
+
+
+def _changed_key(name):
+    return f"laby:version:{name}:changed"
+
+
+def get_last_modified(*names):
+    """Unix time of the latest change to any of the named models (as far as the cache knows)."""
+    keys = [_changed_key(name) for name in names or VERSIONED_MODELS]
+    found = cache.get_many(keys)
+    now = time.time()
+    missing = {key: now for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return max([*found.values(), *missing.values()])
+
+
+def cached(name, depends_on, build, timeout=600, vary_on=()):
+    """
+    Returns build() cached under `name`, invalidated whenever any model in
+    `depends_on` changes. `vary_on` adds extra key parts (filters, etc.).
+    """
+    versions = get_versions(*depends_on)
+    parts = [str(versions[model]) for model in depends_on] + [str(v) for v in vary_on]
+    key = f"laby:{name}:{':'.join(parts)}"
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+CACHE_STATS = {}
+
+
+class CacheStatsMixin:
+    """Counts hits and misses of a cache backend, per process (version keys excluded)."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if not str(key).startswith("laby:version:"):
+            stats = CACHE_STATS.setdefault(self.__class__.__name__, Counter())
+            stats['misses' if value is _MISSING else 'hits'] += 1
+        return default if value is _MISSING else value
+
+
+def cache_stats():
+    report = {}
+    for backend, counts in CACHE_STATS.items():
+        total = counts['hits'] + counts['misses']
+        report[backend] = {
+            'hits': counts['hits'],
+            'misses': counts['misses'],
+            'hit_rate': round(counts['hits'] / total, 3) if total else None,
+        }
+    return report
+
+
+class StatsLocMemCache(CacheStatsMixin, LocMemCache):
+    pass
+
+
+class StatsFileBasedCache(CacheStatsMixin, FileBasedCache):
+    pass
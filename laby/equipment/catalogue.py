@@ -0,0 +1,131 @@
+"""
+Catalogue snapshot and delta sync for viewer clients (/api/catalogue/).
+
+A client downloads the whole catalogue once, as one compact JSON document:
+
+    {"version": 812, "full": true, "fields": ["id", "name", ...],
+     "rows": [[1, "Oscilloscope", ...], ...]}
+
+filters it locally, and then asks for ?since=812. That answer has the same
+shape with "full": false and only the rows changed after version 812, plus
+the ids of removed items under "removed". If the log no longer reaches back
+to `since` (it was pruned), or too many items changed, the answer is the
+full snapshot again.
+
+Versions are ids of CatalogueChange rows. A row is written in the same
+transaction as the change it records: Equipment saves and deletes (signals),
+stock moves (StockLedger), availability changes (projection.apply_many) and
+the bulk paths that skip signals (importer, images, synthetic data). The
+snapshot is built once per version and kept in the cache gzip-compressed,
+and brotli-compressed too when the brotli package is installed.
+
+Settings: CATALOGUE_DELTA_LIMIT (changed items before a delta becomes a
+full snapshot), CATALOGUE_LOG_DAYS (how long the change log is kept).
+"""
+import datetime
+import gzip
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import CatalogueChange, Equipment
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+# logged in place of an item id when everything may have changed (bulk loads)
+EVERYTHING = 0
+
+FIELDS = ('id', 'name', 'category', 'location', 'condition', 'quantity', 'available', 'description', 'image')
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record(equipment_ids):
+    """Logs a change to each item; call inside the transaction making the change."""
+    CatalogueChange.objects.bulk_create([CatalogueChange(equipment_id=equipment_id)
+                                         for equipment_id in sorted(set(equipment_ids))])
+
+
+def record_everything():
+    """Sends every client holding an older version back to the full snapshot."""
+    record([EVERYTHING])
+
+
+def current_version():
+    return CatalogueChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def _row(equipment):
+    image = equipment.thumbnail_url if equipment.image else None
+    return [equipment.id, equipment.name, equipment.category.name, equipment.location.name, equipment.condition.name,
+            equipment.quantity, equipment.available, equipment.description, image]
+
+
+def _rows(equipment_ids=None):
+    items = Equipment.objects.with_lookups().with_availability().order_by('id')
+    if equipment_ids is not None:
+        items = items.filter(id__in=equipment_ids)
+    return [_row(equipment) for equipment in items.iterator(chunk_size=2000)]
+
+
+def _dump(payload):
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def encode(data):
+    """{content encoding: body} for a JSON document; '' is the uncompressed body."""
+    bodies = {'': data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(data, quality=11)
+    return bodies
+
+
+def snapshot(version=None):
+    """(version, encoded bodies) of the full catalogue, built once per version."""
+    version = current_version() if version is None else version
+    key = f"laby:catalogue:{version}"
+    bodies = cache.get(key)
+    if bodies is None:
+        data = _dump({'version': version, 'full': True, 'fields': FIELDS, 'rows': _rows()})
+        bodies = encode(data)
+        cache.set(key, bodies, timeout=None)
+    return version, bodies
+
+
+def delta(since):
+    """
+    (version, JSON bytes) with what changed after `since`, or None when the
+    client has to start over from snapshot().
+    """
+    bounds = CatalogueChange.objects.aggregate(oldest=Min('id'), version=Max('id'))
+    version = bounds['version'] or 0
+    if since > version or (bounds['oldest'] or 1) > since + 1:
+        # from before the retained log, or from another database
+        return None
+    changed = set(CatalogueChange.objects.filter(id__gt=since).values_list('equipment_id', flat=True)
+                  .distinct().order_by()[:setting('CATALOGUE_DELTA_LIMIT', 500) + 1])
+    if EVERYTHING in changed or len(changed) > setting('CATALOGUE_DELTA_LIMIT', 500):
+        return None
+    rows = _rows(changed)
+    removed = sorted(changed - {row[0] for row in rows})
+    return version, _dump({'version': version, 'full': False, 'fields': FIELDS, 'rows': rows,
+                           'removed': removed})
+
+
+def prune(today=None):
+    """Drops log rows older than CATALOGUE_LOG_DAYS, keeping the newest (it holds the version)."""
+    today = today or timezone.localdate()
+    cutoff = timezone.make_aware(datetime.datetime.combine(
+        today - datetime.timedelta(days=setting('CATALOGUE_LOG_DAYS', 30)), datetime.time.min))
+    newest = current_version()
+    deleted, _ = CatalogueChange.objects.filter(changed_at__lt=cutoff, id__lt=newest).delete()
+    return deleted
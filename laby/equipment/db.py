@@ -0,0 +1,29 @@
+"""
+Per-connection database tuning (see DATABASES in settings.py).
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            # journal_mode is stored in the file; the others last for this connection
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def sqlite_settings(connection):
+    """The pragmas actually in effect on `connection`, for benchmarks and diagnostics."""
+    with connection.cursor() as cursor:
+        current = {}
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+            cursor.execute(f"PRAGMA {name}")
+            current[name] = cursor.fetchone()[0]
+    return current
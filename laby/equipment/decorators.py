@@ -1,22 +1,42 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.views import redirect_to_login
 from django.shortcuts import redirect
 
-def admin_required(view_func):
-    def wrapper(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.role == 'Admin':
-            return view_func(request, *args, **kwargs)
-        return redirect('no_permission')
-    return wrapper
-
-def staff_required(view_func):
-    def wrapper(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.role in ['Admin', 'Staff']:
-            return view_func(request, *args, **kwargs)
-        return redirect('no_permission')
-    return wrapper
-
-def viewer_allowed(view_func):
-    def wrapper(request, *args, **kwargs):
-        if request.user.is_authenticated:
-            return view_func(request, *args, **kwargs)
-        return redirect('login')
-    return wrapper
+from .access import get_access, is_admin, is_staff_member
+
+
+def _role_check(allowed):
+    """
+    A view decorator that sends anonymous users to the login page and lets
+    through users whose access (equipment/access.py) passes `allowed`.
+    Works on sync and async views; the user itself is not loaded.
+    """
+    def decorator(view_func):
+        def check(request):
+            access = get_access(request)
+            if access is None:
+                return redirect_to_login(request.get_full_path())
+            if not allowed(access):
+                return redirect('no_permission')
+            return None
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                return await sync_to_async(check)(request) or await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return check(request) or view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+admin_required = _role_check(is_admin)
+
+staff_required = _role_check(is_staff_member)  # approved staff, or admins
+
+viewer_allowed = _role_check(lambda access: True)  # anyone logged in
@@ -0,0 +1,120 @@
+"""
+Live updates for the dashboards, streamed as Server-Sent Events by /events/.
+
+signals.py (and the alert service, for its signal-less writes) report
+changed rows through stock_changed(), alerts_changed() and
+requests_changed(). Once the transaction commits, and only while a stream
+is open in this process, their current state is read once and queued for
+every open stream:
+
+    event: stock     data: {"equipment": {"12": {"quantity": 4, "available": 3}}}
+    event: alert     data: {"alert_count": 7, "alerts": [{"id": .., "equipment": .., "type": ..,
+                                                          "occurrences": .., "is_active": ..}]}
+    event: request   data: {"pending": 3, "requests": [{"id": .., "equipment": .., "status": ..}]}
+
+Changes made in other processes (other workers, the scheduler) don't pass
+through this one, so each stream also watches the cache versions every
+EVENTS_POLL_SECONDS and sends
+
+    event: changed   data: {"alert": 1712..}   (the models that moved, with their new versions)
+
+when one moved for another reason. Across workers that needs the shared
+cache (LABY_CACHE=file).
+"""
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import Alert, DashboardStats, Equipment, EquipmentRequest
+
+
+# what each event already tells a stream about, so the version poll doesn't repeat it
+EVENT_MODELS = {'stock': 'equipment', 'alert': 'alert', 'request': 'equipmentrequest'}
+WATCHED_MODELS = tuple(EVENT_MODELS.values())
+
+QUEUE_SIZE = 100  # per stream; a client that stops reading loses its oldest events
+
+_subscribers = set()  # (loop, queue) per open stream
+_lock = threading.Lock()
+
+
+@contextmanager
+def subscribe():
+    """An asyncio.Queue receiving every event (as an SSE message) while the block runs."""
+    subscriber = (asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+    with _lock:
+        _subscribers.add(subscriber)
+    try:
+        yield subscriber[1]
+    finally:
+        with _lock:
+            _subscribers.discard(subscriber)
+
+
+def listening():
+    return bool(_subscribers)
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+def publish(event, data):
+    """Queues an event for every open stream; safe to call from any thread."""
+    message = format_event(event, data)
+    with _lock:
+        subscribers = list(_subscribers)
+    for loop, queue in subscribers:
+        try:
+            loop.call_soon_threadsafe(_put, queue, (event, message))
+        except RuntimeError:
+            pass  # its event loop has closed; the stream is going away
+
+
+def _put(queue, item):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+def _after_commit(build):
+    """Builds (event, data) once the transaction commits, unless nobody is listening."""
+    if not listening():
+        return
+
+    def send():
+        if listening():
+            publish(*build())
+    transaction.on_commit(send)
+
+
+def stock_changed(equipment_ids):
+    ids = list(equipment_ids)
+    _after_commit(lambda: ('stock', {
+        'equipment': {equipment_id: {'quantity': quantity, 'available': available}
+                      for equipment_id, quantity, available in Equipment.objects.with_availability()
+                      .filter(id__in=ids).values_list('id', 'quantity', 'available')},
+    }))
+
+
+def alerts_changed(alert_ids):
+    ids = list(alert_ids)
+    _after_commit(lambda: ('alert', {
+        'alert_count': DashboardStats.load().alert_count,
+        'alerts': [dict(zip(('id', 'equipment', 'type', 'occurrences', 'is_active'), row))
+                   for row in Alert.objects.filter(id__in=ids).values_list(
+                       'id', 'equipment_id', 'type', 'occurrences', 'is_active')],
+    }))
+
+
+def requests_changed(request_ids):
+    ids = list(request_ids)
+    _after_commit(lambda: ('request', {
+        'pending': EquipmentRequest.objects.pending().count(),
+        'requests': [dict(zip(('id', 'equipment', 'status'), row))
+                     for row in EquipmentRequest.objects.filter(id__in=ids).values_list(
+                         'id', 'equipment_id', 'status')],
+    }))
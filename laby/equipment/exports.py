@@ -0,0 +1,194 @@
+"""
+Streaming CSV / XLSX exports.
+
+Rows come from `values_list(...).iterator(chunk_size=...)`, so no model
+instances are built and only one chunk is held in memory at a time; the
+response starts sending as soon as the first chunk is encoded.
+"""
+import csv
+import datetime
+import io
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Alert, Equipment, UsageRecord
+
+
+CHUNK_SIZE = 2000
+
+# (header, values_list path) per export
+USAGE_RECORD_COLUMNS = [
+    ('ID', 'id'), ('User', 'user__username'), ('Equipment', 'equipment__name'),
+    ('Quantity', 'quantity_used'), ('Borrowed On', 'borrowed_on'), ('Due Date', 'due_date'),
+    ('Returned On', 'returned_on'), ('Approved By', 'approved_by__username'),
+    ('Collected By', 'collected_by__username'), ('Penalty', 'penalty_amount'),
+    ('Damaged', 'is_damaged'), ('Damage Report', 'damage_report'),
+]
+EQUIPMENT_COLUMNS = [
+    ('ID', 'id'), ('Asset Tag', 'asset_tag'), ('Name', 'name'), ('Category', 'category__name'),
+    ('Quantity', 'quantity'), ('Location', 'location__name'), ('Condition', 'condition__name'),
+    ('Added On', 'added_on'), ('Description', 'description'), ('Datasheet', 'datasheet'),
+]
+ALERT_COLUMNS = [
+    ('ID', 'id'), ('Equipment', 'equipment__name'), ('Type', 'type'), ('Message', 'message'),
+    ('Occurrences', 'occurrences'), ('Created At', 'created_at'), ('Last Seen', 'last_seen_at'),
+    ('Active', 'is_active'),
+]
+
+
+def usage_record_rows(user=None, equipment=None):
+    """Same filters as the admin borrowers page, newest first."""
+    records = UsageRecord.objects.matching(user=user, equipment=equipment)
+    return _rows(records.order_by('-borrowed_on', '-id'), USAGE_RECORD_COLUMNS)
+
+
+def equipment_rows():
+    return _rows(Equipment.objects.order_by('id'), EQUIPMENT_COLUMNS)
+
+
+def alert_rows(active_only=False):
+    alerts = Alert.objects.filter(is_active=True) if active_only else Alert.objects.all()
+    return _rows(alerts.order_by('-created_at'), ALERT_COLUMNS)
+
+
+def _rows(queryset, columns):
+    return queryset.values_list(*(path for _, path in columns)).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if timezone.is_aware(value) \
+            else value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    return str(value)
+
+
+class _Sink:
+    """Write-only byte sink: whatever was written since the last drain() is handed out."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def csv_stream(columns, rows, rows_per_chunk=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM, so Excel picks UTF-8
+    writer.writerow([header for header, _ in columns])
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_text(value) for value in row])
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# minimal SpreadsheetML package: one sheet, inline strings, no styles
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+# characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', _text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def xlsx_stream(columns, rows, rows_per_chunk=500):
+    buffer = _Sink()
+    # the zip is written to a non-seekable sink, so zipfile uses data descriptors
+    # and every compressed block can be sent as soon as it exists
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as book:
+        for name, xml in _XLSX_PARTS.items():
+            book.writestr(name, xml)
+        with book.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(header for header, _ in columns)
+            ).encode())
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) == rows_per_chunk:
+                    sheet.write(''.join(pending).encode())
+                    pending = []
+                    yield buffer.drain()
+            sheet.write((''.join(pending) + '</sheetData></worksheet>').encode())
+    yield buffer.drain()
+
+
+FORMATS = {
+    'csv': (csv_stream, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_stream, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def export_response(name, columns, rows, fmt='csv'):
+    stream, content_type = FORMATS.get(fmt, FORMATS['csv'])
+    extension = fmt if fmt in FORMATS else 'csv'
+    response = StreamingHttpResponse(stream(columns, rows), content_type=content_type)
+    filename = f"{name}-{timezone.localdate().isoformat()}.{extension}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,8 +1,11 @@
 from django import forms
+from django.core.validators import MinValueValidator
 from django.contrib.auth.forms import UserCreationForm
 from .models import User
-from .models import Equipment, Supplier
-from .models import EquipmentRequest
+from .models import Category, Condition, Equipment, Location, Supplier
+from .models import EquipmentRequest, Reservation
+from .availability import check_window
+from . import lookups
 
 class EquipmentRequestForm(forms.ModelForm):
     class Meta:
@@ -21,10 +24,37 @@ class RegisterForm(UserCreationForm):
         model = User
         fields = ['username', 'email', 'role', 'password1', 'password2']
 
+class LookupField(forms.CharField):
+    """
+    A lookup table row typed by name (equipment/lookups.py). A new name
+    cleans to an unsaved row; EquipmentForm.save_lookups() creates it.
+    """
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        super().__init__(max_length=100, **kwargs)
+
+    def prepare_value(self, value):
+        if isinstance(value, int):
+            return lookups.names(self.model).get(value, value)
+        return value
+
+    def clean(self, value):
+        value = super().clean(value)
+        if not value:
+            return None
+        return lookups.find(self.model, value) or self.model(name=lookups.canonical(value))
+
 class EquipmentForm(forms.ModelForm):
+    category = LookupField(Category, widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Category'}))
+    location = LookupField(Location, widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Location'}))
+    condition = LookupField(Condition, initial='Good',
+                            widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Condition'}))
+
     class Meta:
         model = Equipment
         fields = [
+            'asset_tag',
             'name',
             'category',
             'quantity',
@@ -35,16 +65,77 @@ class EquipmentForm(forms.ModelForm):
             'image'
         ]
         widgets = {
+            'asset_tag': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Asset tag (optional)'}),
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Equipment Name'}),
-            'category': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Category'}),
             'quantity': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Quantity'}),
-            'location': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Location'}),
-            'condition': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Condition'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'placeholder': 'Short description', 'rows': 4}),
             'datasheet': forms.URLInput(attrs={'class': 'form-control', 'placeholder': 'Datasheet URL'}),
         }
 
+    LOOKUP_FIELDS = ('category', 'location', 'condition')
+
+    def _get_validation_exclusions(self):
+        # LookupField already matched the rows (new ones are only created by save_lookups)
+        return super()._get_validation_exclusions() | set(self.LOOKUP_FIELDS)
+
+    def save_lookups(self):
+        """Creates the lookup rows for names seen for the first time; call once the form is valid."""
+        for field in self.LOOKUP_FIELDS:
+            row = getattr(self.instance, field, None)
+            if row is not None and row.pk is None:
+                setattr(self.instance, field, lookups.resolve(type(row), row.name))
+
+    def save(self, commit=True):
+        self.save_lookups()
+        return super().save(commit)
+
 class SupplierForm(forms.ModelForm):
     class Meta:
         model = Supplier
         fields = ['name', 'equipments_available','contact_no', 'email', 'street', 'city', 'pincode']
+
+
+class EquipmentImportForm(EquipmentForm):
+    """EquipmentForm rules for one imported row; images can't be imported."""
+
+    class Meta(EquipmentForm.Meta):
+        fields = [f for f in EquipmentForm.Meta.fields if f != 'image']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['quantity'].validators.append(MinValueValidator(0))
+        # the quantity >= 0 constraint is covered by the validator above (and still
+        # enforced by the database); validating it on the model costs a query per row
+        self.instance.validate_constraints = lambda exclude=None: None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # existing asset tags are expected: the importer upserts on them
+        self._validate_unique = False
+        return cleaned_data
+
+
+class EquipmentImportUploadForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or JSON Lines (.jsonl)")
+
+
+class ReservationForm(forms.ModelForm):
+    class Meta:
+        model = Reservation
+        fields = ['equipment', 'quantity', 'starts_on', 'ends_on', 'purpose']
+        labels = {'starts_on': 'From', 'ends_on': 'Until (free again on)'}
+        widgets = {
+            'starts_on': forms.DateInput(attrs={'type': 'date'}),
+            'ends_on': forms.DateInput(attrs={'type': 'date'}),
+            'purpose': forms.Textarea(attrs={'rows': 2}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        starts_on, ends_on = cleaned_data.get('starts_on'), cleaned_data.get('ends_on')
+        if starts_on and ends_on:
+            try:
+                check_window(starts_on, ends_on)
+            except ValueError as exc:
+                raise forms.ValidationError(str(exc))
+        return cleaned_data
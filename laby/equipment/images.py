@@ -0,0 +1,171 @@
+"""
+Thumbnails and WebP variants of Equipment.image.
+
+Uploads are processed off the request: save_form() hands the item to a
+small thread pool (IMAGE_WORKERS) once the transaction commits. Every
+variant is named after the SHA-256 of the source image,
+
+    equipment_images/variants/ab/ab12...ef-640w.webp
+
+so identical uploads share their files and re-processing an unchanged image
+writes nothing. What was made is recorded in Equipment.image_variants
+({'digest', 'size', 'webp': [[width, name], ...], 'jpeg': [...]}), which the
+templates turn into srcset. `manage.py process_images` backfills existing
+images and prunes variants nothing refers to any more.
+"""
+import datetime
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import catalogue
+from .caching import bump_version
+from .models import Equipment
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'equipment_images/variants'
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def storage():
+    return Equipment._meta.get_field('image').storage
+
+
+def variant_name(digest, width, kind):
+    return f"{VARIANT_DIR}/{digest[:2]}/{digest}-{width}w.{kind}"
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+                                           thread_name_prefix='laby-images')
+        return _executor
+
+
+def save_form(form):
+    """Saves an EquipmentForm; a new image gets its variants made in the background."""
+    equipment = form.save(commit=False)
+    new_image = 'image' in form.changed_data
+    if new_image:
+        equipment.image_variants = {}  # the old ones show the old picture
+    equipment.save()
+    if new_image and equipment.image:
+        schedule(equipment.pk)
+    return equipment
+
+
+def schedule(equipment_id):
+    if getattr(settings, 'IMAGE_WORKERS', 2) <= 0:
+        transaction.on_commit(lambda: process(equipment_id))
+    else:
+        transaction.on_commit(lambda: executor().submit(_run, equipment_id))
+
+
+def _run(equipment_id):
+    try:
+        process(equipment_id)
+    except Exception:
+        logger.exception("Making image variants for equipment %s failed", equipment_id)
+    finally:
+        connection.close()  # each pool thread has its own connection
+
+
+def process(equipment_id, force=False):
+    """Makes (or re-uses) the variants of one item's image; returns image_variants."""
+    row = Equipment.objects.filter(pk=equipment_id).values_list('image', 'image_variants').first()
+    if not row or not row[0]:
+        return None
+    name, current = row
+    with storage().open(name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if current.get('digest') == digest and not force:
+        return current
+
+    variants = make_variants(data, digest, getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 960)))
+    # skip the write if the image was replaced while this one was processed
+    if Equipment.objects.filter(pk=equipment_id, image=name).update(image_variants=variants):
+        # update() skips post_save, which is what bumps the cache version and logs the change
+        catalogue.record([equipment_id])
+        bump_version('equipment')
+    return variants
+
+
+def make_variants(data, digest, widths):
+    files = storage()
+    with Image.open(BytesIO(data)) as image:
+        # JPEGs can be decoded straight at a fraction of their size
+        image.draft('RGB', (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+        variants = {'digest': digest, 'size': list(image.size), 'webp': [], 'jpeg': []}
+        # never upscale: a small original gives one variant at its own width
+        for width in sorted({min(width, image.width) for width in widths}):
+            resized = image if width == image.width else image.resize(
+                (width, max(round(image.height * width / image.width), 1)), Image.LANCZOS)
+            for kind, (fmt, options) in FORMATS.items():
+                name = variant_name(digest, width, kind)
+                if not files.exists(name):
+                    output = BytesIO()
+                    (_flatten(resized) if kind == 'jpeg' else resized).save(output, fmt, **options)
+                    # another worker may have written it meanwhile; storage then picks a new name
+                    name = files.save(name, ContentFile(output.getvalue()))
+                variants[kind].append([width, name])
+    return variants
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: put transparent images on white."""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def referenced_variants():
+    names = set()
+    for variants in Equipment.objects.exclude(image_variants={}).values_list('image_variants', flat=True):
+        for kind in FORMATS:
+            names.update(name for _, name in variants.get(kind, []))
+    return names
+
+
+def prune_variants(grace=datetime.timedelta(hours=1)):
+    """
+    Deletes variant files no Equipment refers to; returns how many. Files
+    younger than `grace` are kept: their worker may not have recorded them yet.
+    """
+    files = storage()
+    if not files.exists(VARIANT_DIR):
+        return 0
+    keep = referenced_variants()
+    cutoff = timezone.now() - grace
+    removed = 0
+    for prefix in files.listdir(VARIANT_DIR)[0]:
+        for filename in files.listdir(f"{VARIANT_DIR}/{prefix}")[1]:
+            name = f"{VARIANT_DIR}/{prefix}/{filename}"
+            if name not in keep and files.get_modified_time(name) < cutoff:
+                files.delete(name)
+                removed += 1
+    return removed
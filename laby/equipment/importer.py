@@ -0,0 +1,152 @@
+"""
+Streaming bulk import of equipment from CSV or JSON Lines.
+
+Rows are read one at a time, validated with EquipmentImportForm (the
+EquipmentForm rules) and written in bulk_create batches that upsert on
+asset_tag. Memory stays bounded by the batch size whatever the file size;
+bad rows are reported through `on_error` and never abort the import.
+"""
+import codecs
+import csv
+import json
+
+from django.db import IntegrityError, transaction
+
+from . import alerts, audit, catalogue, rollups
+from .caching import bump_version
+from .forms import EquipmentImportForm
+from .models import Equipment
+from .search import get_search_backend
+from .stats import rebuild_dashboard_stats
+
+
+IMPORT_FIELDS = EquipmentImportForm.Meta.fields
+UPDATE_FIELDS = [f for f in IMPORT_FIELDS if f != 'asset_tag']
+
+
+def iter_csv(binary_file):
+    """Yields one dict per data row, or the csv.Error for a row that can't be parsed."""
+    reader = csv.DictReader(codecs.iterdecode(binary_file, 'utf-8-sig'))
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            yield exc
+            continue
+        yield {key.strip(): (value or '').strip() for key, value in row.items() if key}
+
+
+def iter_jsonl(binary_file):
+    """Yields one object per non-blank line, or the ValueError for a line that isn't JSON."""
+    for line in codecs.iterdecode(binary_file, 'utf-8-sig'):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield exc
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def iter_rows(binary_file, fmt):
+    return iter_jsonl(binary_file) if fmt == 'jsonl' else iter_csv(binary_file)
+
+
+class ImportResult:
+    def __init__(self):
+        self.saved = 0
+        self.failed = 0
+
+    def __str__(self):
+        return f"{self.saved} rows saved, {self.failed} rows rejected"
+
+
+def import_equipment(rows, batch_size=1000, on_error=None):
+    """
+    `rows` is any iterable of dicts keyed by EquipmentForm field names.
+    `on_error(line_number, errors)` is called for every rejected row.
+    """
+    result = ImportResult()
+    on_error = on_error or (lambda line, errors: None)
+    batch = {}
+
+    def flush():
+        _write_batch(list(batch.values()), result, on_error)
+        batch.clear()
+
+    for line, row in enumerate(_safe_rows(rows, result, on_error), start=1):
+        if row is None:
+            continue
+        form = EquipmentImportForm(data=row)
+        if not form.is_valid():
+            result.failed += 1
+            on_error(line, form.errors.get_json_data())
+            continue
+        form.save_lookups()
+        # rows repeating an asset tag in the same batch: the last one wins
+        key = form.instance.asset_tag or f"row-{line}"
+        batch[key] = (line, form.instance)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if result.saved:
+        # bulk_create skips the model signals: catch up once for the whole import
+        alerts.sync_low_stock()
+        rebuild_dashboard_stats()
+        get_search_backend().rebuild()
+        bump_version('equipment')
+    return result
+
+
+def _safe_rows(rows, result, on_error):
+    """Turns unparseable rows into rejected rows (None) instead of aborting."""
+    for line, row in enumerate(rows, start=1):
+        if isinstance(row, dict):
+            yield row
+            continue
+        message = f"Unreadable row: {row}" if isinstance(row, Exception) else "Row is not an object."
+        result.failed += 1
+        on_error(line, {'__all__': [{'message': message, 'code': 'parse'}]})
+        yield None
+
+
+def _write_batch(entries, result, on_error):
+    instances = [instance for _, instance in entries]
+    try:
+        with transaction.atomic():
+            _upsert(instances)
+            catalogue.record(instance.pk for instance in instances)
+            audit.record_many(instances)
+        result.saved += len(instances)
+    except IntegrityError:
+        # find the offending rows one by one so the rest of the batch still lands
+        for line, instance in entries:
+            try:
+                with transaction.atomic():
+                    _upsert([instance])
+                    catalogue.record([instance.pk])
+                    audit.record_many([instance])
+                result.saved += 1
+            except IntegrityError as exc:
+                result.failed += 1
+                on_error(line, {'__all__': [{'message': str(exc), 'code': 'integrity'}]})
+
+
+def _upsert(instances):
+    """bulk_create on asset_tag; the rollups of items changing category follow them (no signals here)."""
+    tags = [instance.asset_tag for instance in instances if instance.asset_tag]
+    before = dict(Equipment.objects.filter(asset_tag__in=tags).values_list('asset_tag', 'category_id'))
+    Equipment.objects.bulk_create(
+        instances, update_conflicts=True,
+        unique_fields=['asset_tag'], update_fields=UPDATE_FIELDS,
+    )
+    rollups.move_items({instance.pk: (before[instance.asset_tag], instance.category_id)
+                        for instance in instances if instance.asset_tag in before})
@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+from .models import Equipment, StockMovement
+
+
+# sent after quantities change; the updates bypass save(), so post_save never fires
+stock_changed = Signal()  # kwargs: equipment_ids
+
+
+class InsufficientStock(Exception):
+    def __init__(self, equipment_id, requested):
+        self.equipment_id = equipment_id
+        self.requested = requested
+        super().__init__(f"Not enough stock of equipment {equipment_id} to remove {requested}.")
+
+
+class StockLedger:
+    """
+    The only place Equipment.quantity is changed.
+
+    Every change is a conditional UPDATE ... SET quantity = quantity + delta
+    (guarded by quantity >= needed for removals), so concurrent staff can
+    never lose an update or oversell, plus one append-only StockMovement row.
+    """
+
+    @classmethod
+    def apply(cls, equipment_id, delta, reason, *, user=None, record=None,
+              equipment_request=None, clamp=False):
+        """
+        Moves `delta` units in or out of stock. Raises InsufficientStock on
+        removals that would go negative, unless `clamp` is set, in which case
+        only what is left is removed. Returns the saved StockMovement.
+        """
+        movement = StockMovement(
+            equipment_id=equipment_id, delta=delta, reason=reason, created_by=user,
+            usage_record=record, equipment_request=equipment_request,
+        )
+        with transaction.atomic():
+            if clamp and delta < 0:
+                available = (Equipment.objects.select_for_update()
+                             .filter(pk=equipment_id)
+                             .values_list('quantity', flat=True).first()) or 0
+                movement.delta = -min(-delta, max(available, 0))
+            cls._move(equipment_id, movement.delta)
+            movement.save()
+        stock_changed.send(sender=cls, equipment_ids=[equipment_id])
+        return movement
+
+    @classmethod
+    def apply_many(cls, movements):
+        """
+        Bulk version of apply() for batch approvals. `movements` are unsaved
+        StockMovement instances. Deltas are summed per equipment, so each
+        item is touched by one guarded UPDATE; either all movements apply or
+        InsufficientStock is raised and none do.
+        """
+        totals = defaultdict(int)
+        for movement in movements:
+            totals[movement.equipment_id] += movement.delta
+
+        with transaction.atomic():
+            # fixed lock order so two batches can't deadlock each other
+            for equipment_id in sorted(totals):
+                cls._move(equipment_id, totals[equipment_id])
+            created = StockMovement.objects.bulk_create(movements)
+        stock_changed.send(sender=cls, equipment_ids=sorted(totals))
+        return created
+
+    @staticmethod
+    def _move(equipment_id, delta):
+        if delta == 0:
+            return
+        rows = Equipment.objects.filter(pk=equipment_id)
+        if delta < 0:
+            rows = rows.filter(quantity__gte=-delta)
+        if not rows.update(quantity=F('quantity') + delta):
+            if delta > 0:
+                raise Equipment.DoesNotExist(f"Equipment {equipment_id} does not exist.")
+            raise InsufficientStock(equipment_id, -delta)
@@ -0,0 +1,67 @@
+"""
+Category, Location and Condition lookup tables behind the Equipment foreign keys.
+
+Names are canonical (whitespace collapsed) and unique ignoring case, so
+"optics ", "Optics" and "OPTICS" are one row. Forms match typed names with
+find() and create new ones with resolve() once valid (see
+EquipmentForm.save_lookups); the seed data resolves them up front. The
+dropdowns read options(), cached until a row of that table changes (equipment.signals
+bumps a version named after the model).
+"""
+from django.db import IntegrityError, transaction
+
+from .caching import cached
+from .models import Category, Condition, Location
+
+LOOKUP_MODELS = (Category, Location, Condition)
+
+
+def canonical(name):
+    return ' '.join((name or '').split()) or 'Unknown'
+
+
+def _version(model):
+    return model._meta.model_name
+
+
+def options(model):
+    """[(id, name), ...] of one lookup table, by name."""
+    return cached(f'lookup:{_version(model)}', [_version(model)],
+                  lambda: list(model.objects.order_by('name').values_list('id', 'name')), timeout=None)
+
+
+def names(model):
+    """{id: name} of one lookup table."""
+    return dict(options(model))
+
+
+def _by_key(model):
+    return {name.casefold(): (pk, name) for pk, name in options(model)}
+
+
+def find(model, name):
+    """The row named `name` (any case or spacing), or None; from the cache when known."""
+    name = canonical(name)
+    known = _by_key(model).get(name.casefold())
+    if known is None:
+        return model.objects.filter(name__iexact=name).first()
+    return model.from_db(None, ['id', 'name'], known)
+
+
+def resolve(model, name):
+    """find(), creating the row when the name is new."""
+    row = find(model, name)
+    if row is not None:
+        return row
+    try:
+        with transaction.atomic():
+            return model.objects.create(name=canonical(name))
+    except IntegrityError:
+        # created concurrently
+        return model.objects.get(name__iexact=canonical(name))
+
+
+def parse_id(value):
+    """A lookup id from a query parameter, or None for anything else."""
+    value = (value or '').strip()
+    return int(value) if value.isdigit() else None
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.projection import find_drift, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the equipment availability projection, or check it for drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only compare the stored counts with a recount; exit non-zero on drift.",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_drift()
+            if not drift:
+                self.stdout.write(self.style.SUCCESS("Equipment availability is in sync."))
+                return
+            for equipment_id, (stored, actual) in sorted(drift.items()):
+                self.stdout.write(f"equipment {equipment_id}: stored={stored!r} actual={actual!r}")
+            raise CommandError(f"Availability drifted on {len(drift)} item(s); run without --check to rebuild.")
+
+        written = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt availability for {written} equipment."))
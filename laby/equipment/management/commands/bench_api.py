@@ -0,0 +1,84 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from equipment import lookups
+from equipment.bench import scratch_database
+from equipment.models import Alert, Category, Equipment, EquipmentRequest, Location, UsageRecord, User
+
+
+# (label, HTML page, equivalent API call) for the pages we currently scrape
+PAIRS = [
+    ("catalogue", "/viewer-dashboard/", "/api/equipment/?page_size=100"),
+    ("loan history", "/admin-dashboard/borrowers/", "/api/usage-records/?page_size=100"),
+    ("open loans", "/staff-dashboard/", "/api/usage-records/?returned_on__isnull=true&page_size=100"),
+    ("active alerts", "/admin-dashboard/", "/api/alerts/?is_active=true&page_size=100"),
+]
+
+
+class Command(BaseCommand):
+    help = "Load test: the /api/ endpoints against the HTML pages they replace, on a scratch database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--equipment', type=int, default=2000)
+        parser.add_argument('--records', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=50, help="Requests per endpoint.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            admin = self.seed(options['equipment'], options['records'])
+            html = Client()
+            html.force_login(admin)
+            api = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+            self.stdout.write("%-14s %-5s %9s %9s %9s %10s" % ("page", "via", "req/s", "ms/req", "queries", "bytes"))
+            for label, page, endpoint in PAIRS:
+                self.report(label, "html", self.run(html, page, options['requests']))
+                self.report(label, "api", self.run(api, endpoint, options['requests']))
+                etag = api.get(endpoint)['ETag']
+                self.report(label, "304", self.run(api, endpoint, options['requests'], HTTP_IF_NONE_MATCH=etag))
+
+    def seed(self, equipment_count, records):
+        rng = random.Random(3)
+        today = timezone.now().date()
+        self.stdout.write(f"Seeding {equipment_count:,} items and {records:,} usage records...")
+        with transaction.atomic():
+            admin = User.objects.create_user('bench-admin', password='x', role='Admin', is_approved=True)
+            users = User.objects.bulk_create(User(username=f"bench{n}", role='Viewer') for n in range(200))
+            categories = [lookups.resolve(Category, f"Category {n}") for n in range(12)]
+            locations = [lookups.resolve(Location, f"Lab {n}") for n in range(20)]
+            items = Equipment.objects.bulk_create(
+                Equipment(name=f"Item {n}", category=categories[n % 12], location=locations[n % 20],
+                          quantity=rng.randint(0, 30)) for n in range(equipment_count))
+            UsageRecord.objects.bulk_create((
+                UsageRecord(user=rng.choice(users), equipment=rng.choice(items), approved_by=admin,
+                            due_date=today + timedelta(days=rng.randint(-10, 20)),
+                            returned_on=None if rng.random() < 0.05 else today)
+                for _ in range(records)), batch_size=5000)
+            EquipmentRequest.objects.bulk_create(
+                EquipmentRequest(user=rng.choice(users), equipment=rng.choice(items), quantity=1)
+                for _ in range(200))
+            # one active alert per item at most (alert_active_key_uniq)
+            Alert.objects.bulk_create(
+                Alert(equipment=item, message="bench", type="Damaged")
+                for item in rng.sample(items, min(200, len(items))))
+        return admin
+
+    def run(self, client, url, count, **headers):
+        client.get(url, **headers)  # warm up caches
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                response = client.get(url, **headers)
+            elapsed = time.perf_counter() - started
+        return count / elapsed, elapsed * 1000 / count, len(queries) / count, len(response.content)
+
+    def report(self, label, via, result):
+        self.stdout.write("%-14s %-5s %9.1f %9.2f %9.1f %10d" % (label, via, *result))
@@ -0,0 +1,187 @@
+import http.client
+import importlib.util
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.synthetic import PASSWORD
+
+
+USERS = {'admin': 'admin0_42', 'staff': 'staff1_42', 'viewer': 'viewer2_42'}
+PAGES = [
+    ('viewer', '/viewer-dashboard/'),
+    ('viewer', '/viewer-dashboard/?name=digital'),
+    ('viewer', '/equipment/1/'),
+    ('staff', '/staff-dashboard/'),
+    ('admin', '/admin-dashboard/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a freshly seeded scratch database with uvicorn (laby.asgi), once with the sync views "
+        "(LABY_ASYNC_VIEWS=0) and once with the async ones, and load each dashboard from --concurrency "
+        "client threads for --seconds while --streams /events/ streams stay open. "
+        "Needs uvicorn (pip install uvicorn); the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--streams', type=int, default=20)
+        parser.add_argument('--equipment', type=int, default=500)
+        parser.add_argument('--records', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("uvicorn is not installed (pip install uvicorn).")
+        with tempfile.TemporaryDirectory() as workdir:
+            env = {**os.environ, 'LABY_DB_NAME': os.path.join(workdir, 'bench.sqlite3'),
+                   'LABY_CACHE': 'locmem', 'LABY_PROFILING': '0'}
+            self.seed(env, options)
+            results = {}
+            for mode in ('sync', 'async'):
+                with self.server({**env, 'LABY_ASYNC_VIEWS': '1' if mode == 'async' else '0'}) as port:
+                    results[mode] = self.load(port, options)
+
+        self.stdout.write("\n%-32s %6s %10s %10s %10s %7s" % ("page", "views", "req/s", "p50", "p95", "errors"))
+        for role, path in PAGES:
+            for mode in ('sync', 'async'):
+                timings, errors, elapsed = results[mode][path]
+                self.stdout.write("%-32s %6s %10.1f %7.1f ms %7.1f ms %7d" % (
+                    path if mode == 'sync' else '', mode, len(timings) / elapsed,
+                    *self.percentiles(timings), errors))
+
+    def seed(self, env, options):
+        self.stdout.write(f"Seeding a scratch database ({options['equipment']:,} items, "
+                          f"{options['records']:,} loans)...")
+        manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+        for command in (['migrate', '-v0'],
+                        ['seed_lab_data', '--equipment', str(options['equipment']),
+                         '--usage-records', str(options['records']), '--requests', '200', '--alerts', '50']):
+            subprocess.run(manage + command, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    @contextmanager
+    def server(self, env):
+        """Runs uvicorn on a free port; yields the port once it accepts connections."""
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'laby.asgi:application', '--port', str(port),
+             '--log-level', 'warning', '--no-access-log'],
+            cwd=settings.BASE_DIR, env=env)
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline or process.poll() is not None:
+                        raise CommandError("uvicorn did not start")
+                    time.sleep(0.2)
+            yield port
+        finally:
+            process.terminate()
+            process.wait(10)
+
+    def load(self, port, options):
+        cookies = {role: self.login(port, username) for role, username in USERS.items()}
+        stop_streams = threading.Event()
+        streams = [threading.Thread(target=self.hold_stream, args=(port, cookies['viewer'], stop_streams))
+                   for _ in range(options['streams'])]
+        for stream in streams:
+            stream.start()
+
+        results = {}
+        for role, path in PAGES:
+            self.get(port, path, cookies[role])  # warm the caches
+            timings, errors, lock, stop = [], [0], threading.Lock(), threading.Event()
+
+            def client():
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                mine, failed = [], 0
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    try:
+                        status = self.get(port, path, cookies[role], connection)
+                    except (OSError, http.client.HTTPException):
+                        connection.close()
+                        status = None
+                    if status == 200:
+                        mine.append((time.perf_counter() - started) * 1000)
+                    else:
+                        failed += 1
+                connection.close()
+                with lock:
+                    timings.extend(mine)
+                    errors[0] += failed
+
+            threads = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(options['seconds'])
+            stop.set()
+            for thread in threads:
+                thread.join()
+            results[path] = (timings, errors[0], time.perf_counter() - started)
+
+        stop_streams.set()
+        for stream in streams:
+            stream.join()
+        return results
+
+    def login(self, port, username):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        connection.request('GET', '/login/')
+        response = connection.getresponse()
+        page = response.read().decode()
+        csrf = re.search(r'csrftoken=([^;]+)', response.getheader('Set-Cookie', '')).group(1)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+        connection.request('POST', '/login/', body=urlencode({
+            'username': username, 'password': PASSWORD, 'csrfmiddlewaretoken': token}),
+            headers={'Cookie': f'csrftoken={csrf}', 'Content-Type': 'application/x-www-form-urlencoded'})
+        response = connection.getresponse()
+        response.read()
+        session = re.search(r'sessionid=([^;]+)', response.getheader('Set-Cookie', ''))
+        if session is None:
+            raise CommandError(f"Could not log in as {username}")
+        return f'sessionid={session.group(1)}; csrftoken={csrf}'
+
+    def get(self, port, path, cookie, connection=None):
+        connection = connection or http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        connection.request('GET', path, headers={'Cookie': cookie})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def hold_stream(self, port, cookie, stop):
+        """An open /events/ stream, like a dashboard left open in a browser tab."""
+        with socket.create_connection(('127.0.0.1', port)) as stream:
+            stream.sendall(f"GET /events/ HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n\r\n".encode())
+            stream.settimeout(0.5)
+            while not stop.is_set():
+                try:
+                    if not stream.recv(65536):
+                        return
+                except socket.timeout:
+                    pass
+
+    def percentiles(self, timings):
+        if not timings:
+            return 0.0, 0.0
+        timings = sorted(timings)
+        return statistics.median(timings), timings[max(int(len(timings) * 0.95) - 1, 0)]
@@ -0,0 +1,124 @@
+import time
+
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from equipment.access import AccessTokenAuthentication, AccessTokenObtainPairSerializer
+from equipment.bench import scratch_database
+from equipment.decorators import staff_required
+from equipment.models import User
+
+
+def ok(request):
+    return HttpResponse("ok")
+
+
+@login_required
+def legacy_staff_required(request):
+    # what staff_required did before: load the user, check the role, ignore approval
+    if request.user.role in ['Admin', 'Staff']:
+        return ok(request)
+    return redirect('no_permission')
+
+
+class Command(BaseCommand):
+    help = (
+        "Authorization overhead per request on a scratch database: the role decorators loading the "
+        "user (before) against the role and approval kept in the session (now), and the JWT user "
+        "lookup against token claims; then checks that approvals and role changes take effect."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with scratch_database():
+            staff = User.objects.create_user('bench-staff', password='x', role='Staff', is_approved=True)
+            pending = User.objects.create_user('bench-pending', password='x', role='Staff')
+
+            self.stdout.write("%-38s %10s %9s" % ("per request", "us", "queries"))
+            session = self.session_for(staff)
+            self.report("session: login_required + user.role", self.time_view(legacy_staff_required, session, count))
+            self.report("session: staff_required (cached)", self.time_view(staff_required(ok), session, count))
+
+            legacy_token = str(RefreshToken.for_user(staff).access_token)
+            token = str(AccessTokenObtainPairSerializer.get_token(staff).access_token)
+            self.report("JWT: JWTAuthentication", self.time_api(JWTAuthentication(), legacy_token, count))
+            self.report("JWT: AccessTokenAuthentication", self.time_api(AccessTokenAuthentication(), token, count))
+
+            self.check_invalidation(pending)
+
+    def session_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.cookies['sessionid'].value
+
+    def request(self, session_key):
+        request = RequestFactory().get('/staff-dashboard/', HTTP_COOKIE=f'sessionid={session_key}')
+        SessionMiddleware(lambda r: None).process_request(request)
+        AuthenticationMiddleware(lambda r: None).process_request(request)
+        return request
+
+    def time_view(self, view, session_key, count):
+        """Session load + authorization; the session query is paid either way."""
+        view(self.request(session_key))  # warm up
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                response = view(self.request(session_key))
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f"{view.__name__} refused an approved staff member")
+        return elapsed * 1e6 / count, len(queries) / count
+
+    def time_api(self, authenticator, token, count):
+        factory = RequestFactory()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                user, _ = authenticator.authenticate(
+                    Request(factory.get('/api/usage-records/', HTTP_AUTHORIZATION=f'Bearer {token}')))
+            elapsed = time.perf_counter() - started
+        if user.role != 'Staff':
+            raise CommandError(f"{type(authenticator).__name__} lost the role")
+        return elapsed * 1e6 / count, len(queries) / count
+
+    def report(self, label, result):
+        self.stdout.write("%-38s %10.1f %9.1f" % (label, *result))
+
+    def check_invalidation(self, user):
+        view = staff_required(ok)
+        session = self.session_for(user)
+        token = str(AccessTokenObtainPairSerializer.get_token(user).access_token)
+
+        def outcome():
+            allowed = view(self.request(session)).status_code == 200
+            api_user, _ = AccessTokenAuthentication().authenticate(
+                Request(RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')))
+            return allowed, api_user.is_approved
+
+        steps = [("unapproved staff", lambda: None, (False, False))]
+        steps.append(("after approve_staff", lambda: self.save(user, is_approved=True), (True, True)))
+        steps.append(("after a role change to Viewer", lambda: self.save(user, role='Viewer'), (False, True)))
+        for label, change, expected in steps:
+            change()
+            result = outcome()
+            if result != expected:
+                raise CommandError(f"{label}: staff_required / token approval gave {result}, expected {expected}")
+        self.stdout.write("Approval is enforced; approving and role changes apply on the next request.")
+
+    def save(self, user, **fields):
+        for name, value in fields.items():
+            setattr(user, name, value)
+        user.save()
@@ -0,0 +1,150 @@
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from equipment import lookups
+from equipment.availability import ReservationConflict, free_units, free_units_many, reserve
+from equipment.bench import analyze, insert_rows, scratch_database, timed
+from equipment.models import Category, Condition, Equipment, Location, Reservation, UsageRecord, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with reservations (default 100k) and open loans, check the "
+        "availability engine against a day-by-day count, and time availability queries and bookings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=100_000)
+        parser.add_argument('--equipment', type=int, default=1_000)
+        parser.add_argument('--loans', type=int, default=5_000)
+        parser.add_argument('--queries', type=int, default=500, help="Random windows to check and time.")
+        parser.add_argument('--bookings', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        today = timezone.localdate()
+        with scratch_database():
+            user, equipment_ids = self.seed(rng, today, options)
+            analyze()
+            self.explain(equipment_ids[0], today)
+
+            windows = [self.window(rng, today, equipment_ids) for _ in range(options['queries'])]
+            mismatches = [w for w in windows if free_units(*w, today=today) != self.day_by_day(*w, today)]
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} window(s) disagree with the day-by-day count, "
+                                   f"e.g. {mismatches[0]}")
+            self.stdout.write(f"{len(windows)} random windows match the day-by-day count.")
+
+            self.report("free_units (engine)", [self.time_once(lambda w=w: free_units(*w, today=today))
+                                                for w in windows])
+            self.report("day-by-day count", [self.time_once(lambda w=w: self.day_by_day(*w, today))
+                                             for w in windows])
+            week = (today + timedelta(days=7), today + timedelta(days=14))
+            self.stdout.write("%-28s %10.2f ms  (%s items, one week)" % (
+                "free_units_many (all items)", timed(lambda: free_units_many(equipment_ids, *week, today=today)),
+                f"{len(equipment_ids):,}"))
+
+            self.book(rng, today, user, equipment_ids, options['bookings'])
+
+    def seed(self, rng, today, options):
+        self.stdout.write(f"Seeding {options['reservations']:,} reservations and {options['loans']:,} open "
+                          f"loans over {options['equipment']:,} items...")
+        with transaction.atomic():
+            user = User.objects.create(username='bench-reserver', role='Viewer', is_approved=True)
+            rows = {'category': lookups.resolve(Category, "bench"), 'location': lookups.resolve(Location, "Lab 1"),
+                    'condition': lookups.resolve(Condition, "Good")}
+            Equipment.objects.bulk_create(
+                Equipment(name=f"Item {n}", quantity=rng.randint(5, 60), **rows) for n in range(options['equipment'])
+            )
+            equipment_ids = list(Equipment.objects.values_list('id', flat=True))
+            # a few popular items carry most of the bookings
+            weights = [1 / rank for rank in range(1, len(equipment_ids) + 1)]
+
+            def reservations():
+                now = timezone.now()
+                for item in rng.choices(equipment_ids, weights=weights, k=options['reservations']):
+                    starts_on = today + timedelta(days=rng.randint(0, 365))
+                    ends_on = starts_on + timedelta(days=rng.randint(1, 14))
+                    status = 'cancelled' if rng.random() < 0.1 else 'active'
+                    yield user.id, item, rng.randint(1, 2), starts_on, ends_on, '', status, now
+
+            insert_rows(Reservation, ['user', 'equipment', 'quantity', 'starts_on', 'ends_on', 'purpose',
+                                      'status', 'created_at'], reservations())
+            insert_rows(UsageRecord, ['user', 'equipment', 'quantity_used', 'borrowed_on', 'due_date',
+                                      'is_damaged', 'damage_processed', 'penalty_amount'], (
+                (user.id, rng.choice(equipment_ids), 1, today - timedelta(days=rng.randint(0, 20)),
+                 today + timedelta(days=rng.randint(-5, 21)), False, False, 0)
+                for _ in range(options['loans'])
+            ))
+        return user, equipment_ids
+
+    def window(self, rng, today, equipment_ids):
+        start = today + timedelta(days=rng.randint(0, 380))
+        # a third of the lookups go to the busiest items
+        item = rng.choice(equipment_ids[:10]) if rng.random() < 0.33 else rng.choice(equipment_ids)
+        return item, start, start + timedelta(days=rng.randint(1, 30))
+
+    def day_by_day(self, equipment_id, start, end, today):
+        """The obvious answer: load every booking of the item and count each day."""
+        equipment = Equipment.objects.get(pk=equipment_id)
+        held = defaultdict(int)
+        start = max(start, today)
+        for starts_on, ends_on, quantity in Reservation.objects.filter(
+                equipment_id=equipment_id, status='active').values_list('starts_on', 'ends_on', 'quantity'):
+            day = max(starts_on, start)
+            while day < min(ends_on, end):
+                held[day] += quantity
+                day += timedelta(days=1)
+        on_loan = 0
+        for due_date, quantity in UsageRecord.objects.open().filter(
+                equipment_id=equipment_id).values_list('due_date', 'quantity_used'):
+            on_loan += quantity
+            day = start
+            while day <= max(due_date, today) and day < end:
+                held[day] += quantity
+                day += timedelta(days=1)
+        return max(equipment.quantity + on_loan - max(held.values(), default=0), 0)
+
+    def time_once(self, func):
+        started = time.perf_counter()
+        func()
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, label, timings):
+        timings.sort()
+        self.stdout.write("%-28s %10.2f ms median %10.2f ms p95" % (
+            label, statistics.median(timings), timings[max(int(len(timings) * 0.95) - 1, 0)]))
+
+    def explain(self, equipment_id, today):
+        reservations = Reservation.objects.filter(
+            equipment_id=equipment_id, status='active', starts_on__lt=today + timedelta(days=7),
+            starts_on__gte=today - timedelta(days=Reservation.MAX_DAYS), ends_on__gt=today,
+        ).values_list('starts_on', 'ends_on', 'quantity')
+        sql, params = reservations.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}" if connection.vendor == 'sqlite' else f"EXPLAIN {sql}",
+                           params)
+            plan = "; ".join(str(row[-1]) for row in cursor.fetchall())
+        self.stdout.write(f"Range query plan: {plan}")
+
+    def book(self, rng, today, user, equipment_ids, count):
+        booked = conflicts = 0
+        timings = []
+        for _ in range(count):
+            item, start, _ = self.window(rng, today, equipment_ids)
+            started = time.perf_counter()
+            try:
+                reserve(user, item, rng.randint(1, 20), start, start + timedelta(days=rng.randint(1, 7)))
+                booked += 1
+            except ReservationConflict:
+                conflicts += 1
+            timings.append((time.perf_counter() - started) * 1000)
+        self.report("reserve (with conflict check)", timings)
+        self.stdout.write(f"  {booked} booked, {conflicts} refused as conflicts")
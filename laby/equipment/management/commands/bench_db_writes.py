@@ -0,0 +1,125 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from equipment.db import sqlite_settings
+from equipment import lookups
+from equipment.ledger import StockLedger
+from equipment.models import Category, Equipment, Location, UsageRecord
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent write throughput of the configured database: writer threads move stock "
+        "through StockLedger while reader threads load dashboard counts, for --seconds. "
+        "Compare backends/settings by running it under different LABY_DB* variables, e.g. "
+        "LABY_SQLITE_TUNING=0 for stock SQLite. Its rows are removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--items', type=int, default=20, help="Rows the writers spread over.")
+        parser.add_argument('--read-interval', type=float, default=10.0,
+                            help="Milliseconds each reader waits between page loads.")
+
+    def handle(self, *args, **options):
+        self.describe()
+        category, location = lookups.resolve(Category, "bench"), lookups.resolve(Location, "-")
+        items = [
+            Equipment.objects.create(name=f"__db_bench__ {n}", category=category, quantity=1000, location=location)
+            for n in range(options['items'])
+        ]
+        ids = [item.id for item in items]
+        stop = threading.Event()
+        lock = threading.Lock()
+        results = {'write': [], 'read': [], 'locked': 0, 'errors': []}
+
+        def writer(offset):
+            timings, locked, n = [], 0, offset
+            try:
+                while not stop.is_set():
+                    equipment_id = ids[n % len(ids)]
+                    n += 1
+                    started = time.perf_counter()
+                    try:
+                        # like a view: look at the stock, then lend a unit and take it back
+                        # (read-then-write is what makes DEFERRED transactions fail on upgrade)
+                        with transaction.atomic():
+                            Equipment.objects.filter(pk=equipment_id).values_list('quantity', flat=True).get()
+                            StockLedger.apply(equipment_id, -1, 'adjust')
+                            StockLedger.apply(equipment_id, 1, 'adjust')
+                    except OperationalError:
+                        locked += 1
+                        continue
+                    timings.append((time.perf_counter() - started) * 1000)
+            except Exception as exc:
+                with lock:
+                    results['errors'].append(repr(exc))
+            finally:
+                connection.close()
+                with lock:
+                    results['write'] += timings
+                    results['locked'] += locked
+
+        def reader():
+            timings = []
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    Equipment.objects.filter(quantity__lte=5).count()
+                    UsageRecord.objects.open().count()
+                    timings.append((time.perf_counter() - started) * 1000)
+                    stop.wait(options['read_interval'] / 1000)
+            finally:
+                connection.close()
+                with lock:
+                    results['read'] += timings
+
+        threads = ([threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+                   + [threading.Thread(target=reader) for _ in range(options['readers'])])
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        consistent = all(item.quantity == 1000 for item in Equipment.objects.filter(id__in=ids))
+        # cascades to their StockMovements; post_delete keeps counters and the search index in step
+        Equipment.objects.filter(id__in=ids).delete()
+
+        self.report("writes", results['write'], elapsed)
+        self.report("reads", results['read'], elapsed)
+        self.stdout.write(f"{results['locked']} write(s) failed on database locks")
+        for error in results['errors'][:5]:
+            self.stderr.write(f"  {error}")
+        if not consistent:
+            self.stderr.write(self.style.ERROR("Stock drifted: a loan/return pair was only half applied."))
+
+    def describe(self):
+        db = settings.DATABASES['default']
+        self.stdout.write(f"Backend: {connection.vendor} ({db['NAME']})")
+        if connection.vendor == 'sqlite':
+            self.stdout.write(f"  {sqlite_settings(connection)}, "
+                              f"transaction_mode={db.get('OPTIONS', {}).get('transaction_mode', 'DEFERRED')}")
+        else:
+            self.stdout.write(f"  CONN_MAX_AGE={db.get('CONN_MAX_AGE')}, "
+                              f"CONN_HEALTH_CHECKS={db.get('CONN_HEALTH_CHECKS')}, "
+                              f"pool={db.get('OPTIONS', {}).get('pool', False)}")
+
+    def report(self, label, timings, elapsed):
+        if not timings:
+            self.stdout.write(f"{label:<7} none completed")
+            return
+        timings.sort()
+        self.stdout.write("%-7s %8d ops %9.1f ops/s   p50 %7.2f ms   p95 %7.2f ms   p99 %7.2f ms" % (
+            label, len(timings), len(timings) / elapsed, statistics.median(timings),
+            timings[max(int(len(timings) * 0.95) - 1, 0)], timings[max(int(len(timings) * 0.99) - 1, 0)]))
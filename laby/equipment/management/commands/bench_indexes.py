@@ -0,0 +1,145 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from equipment import lookups
+from equipment.bench import analyze, insert_rows, scratch_database, timed
+from equipment.models import Alert, Category, Equipment, EquipmentRequest, Location, UsageRecord, User
+
+
+# the indexes added for the dashboard predicates, by model
+BENCH_INDEXES = {
+    UsageRecord: ['usage_open_due_idx'],
+    EquipmentRequest: ['request_pending_idx'],
+    Alert: ['alert_active_seen_idx'],
+    # the location filter alone uses the index of the location foreign key, which stays
+    Equipment: ['equipment_quantity_idx', 'equipment_cat_loc_idx'],
+}
+
+CATEGORIES = ['Optics', 'Electrical', 'Chemistry', 'Mechanical', 'Biology', 'Computing']
+LOCATIONS = [f"Lab {n}" for n in range(1, 21)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database (default 1M usage records) and show EXPLAIN plans "
+        "and timings of the dashboard filters with and without their indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=1_000_000)
+        parser.add_argument('--equipment', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--no-explain', action='store_true', help="Only print timings.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options['records'], options['equipment'])
+            queries = self.queries()
+
+            self.drop_indexes()
+            analyze()
+            before = self.measure(queries, options, "without indexes")
+
+            self.create_indexes()
+            analyze()
+            after = self.measure(queries, options, "with indexes")
+
+        self.stdout.write("\n%-34s %12s %12s %8s" % ("query", "before ms", "after ms", "speedup"))
+        for label in before:
+            speedup = before[label] / after[label] if after[label] else float('inf')
+            self.stdout.write("%-34s %12.2f %12.2f %7.1fx" % (label, before[label], after[label], speedup))
+
+    def seed(self, records, equipment_count):
+        rng = random.Random(42)
+        today = timezone.now().date()
+        self.stdout.write(f"Seeding {records:,} usage records over {equipment_count:,} items...")
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(username=f"bench{n}", role='Viewer', is_approved=True) for n in range(1000)
+            )
+            categories = [lookups.resolve(Category, name) for name in CATEGORIES]
+            locations = [lookups.resolve(Location, name) for name in LOCATIONS]
+            Equipment.objects.bulk_create(
+                Equipment(name=f"Item {n}", category=rng.choice(categories),
+                          location=rng.choice(locations), quantity=rng.randint(0, 50))
+                for n in range(equipment_count)
+            )
+            user_ids = [u.pk for u in users]
+            equipment_ids = list(Equipment.objects.values_list('id', flat=True))
+
+            def loans():
+                for _ in range(records):
+                    borrowed = today - timedelta(days=rng.randint(0, 3 * 365))
+                    due = borrowed + timedelta(days=rng.randint(3, 30))
+                    # ~2% of the history is still out on loan
+                    returned = None if rng.random() < 0.02 else min(due + timedelta(days=rng.randint(-3, 5)), today)
+                    yield (rng.choice(user_ids), rng.choice(equipment_ids), rng.randint(1, 3),
+                           borrowed, due, returned, False, False, 0)
+
+            insert_rows(UsageRecord, ['user', 'equipment', 'quantity_used', 'borrowed_on', 'due_date',
+                                      'returned_on', 'is_damaged', 'damage_processed', 'penalty_amount'], loans())
+
+            now = timezone.now()
+            insert_rows(EquipmentRequest, ['user', 'equipment', 'quantity', 'purpose', 'status', 'requested_at'], (
+                (rng.choice(user_ids), rng.choice(equipment_ids), 1, '',
+                 'pending' if rng.random() < 0.05 else 'approved', now - timedelta(minutes=n))
+                for n in range(records // 10)
+            ))
+            insert_rows(Alert, ['equipment', 'message', 'type', 'created_at', 'last_seen_at', 'occurrences',
+                                'is_active'], self.alerts(rng, equipment_ids, records // 20, now))
+
+    def alerts(self, rng, equipment_ids, count, now):
+        # ~5% active, at most one active alert per item (alert_active_key_uniq)
+        active = set()
+        for n in range(count):
+            equipment_id = rng.choice(equipment_ids)
+            is_active = equipment_id not in active and rng.random() < 0.05
+            if is_active:
+                active.add(equipment_id)
+            seen = now - timedelta(minutes=n)
+            yield equipment_id, 'bench', 'Damaged', seen, seen, 1, is_active
+
+    def queries(self):
+        today = timezone.now().date()
+        category = lookups.resolve(Category, CATEGORIES[0]).pk
+        location = lookups.resolve(Location, LOCATIONS[0]).pk
+        return {
+            "open loans (staff dashboard)": lambda: UsageRecord.objects.open().order_by('due_date')[:100],
+            "overdue loans": lambda: UsageRecord.objects.overdue(today).order_by('due_date')[:100],
+            "pending requests": lambda: EquipmentRequest.objects.pending()[:100],
+            "active alerts": lambda: Alert.objects.filter(is_active=True).order_by('-last_seen_at')[:100],
+            "low stock": lambda: Equipment.objects.filter(quantity__lt=2),
+            "viewer category+location filter": lambda: Equipment.objects.filter(
+                category_id=category, location_id=location),
+            "viewer location filter": lambda: Equipment.objects.filter(location_id=location),
+        }
+
+    def measure(self, queries, options, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {title} =="))
+        results = {}
+        for label, build in queries.items():
+            if not options['no_explain']:
+                self.stdout.write(f"-- {label}\n{build().explain()}")
+            results[label] = timed(lambda: list(build()), options['repeat'])
+        return results
+
+    def _indexes(self):
+        for model, names in BENCH_INDEXES.items():
+            for index in model._meta.indexes:
+                if index.name in names:
+                    yield model, index
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self._indexes():
+                editor.remove_index(model, index)
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self._indexes():
+                editor.add_index(model, index)
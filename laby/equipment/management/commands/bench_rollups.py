@@ -0,0 +1,146 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from equipment import lookups, rollups
+from equipment.bench import analyze, insert_rows, scratch_database, timed
+from equipment.models import Category, CategoryRollup, Equipment, EquipmentRollup, Location, UsageRecord, User
+
+
+CATEGORIES = ['Optics', 'Electrical', 'Chemistry', 'Mechanical', 'Biology', 'Computing']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with three years of loans, build the analytics rollups, time the "
+        "dashboard queries against the same numbers computed from UsageRecord, and check that the "
+        "incremental path (signals, close_days, compact) agrees with a rebuild."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=300_000)
+        parser.add_argument('--equipment', type=int, default=1_000)
+        parser.add_argument('--years', type=int, default=3)
+        parser.add_argument('--changes', type=int, default=300,
+                            help="Loans created, returned and deleted through the ORM for the drift check.")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        with scratch_database():
+            user = self.seed(options, today)
+
+            # rebuild as of a month ago, then let the nightly job catch up
+            started = time.perf_counter()
+            rows = rollups.rebuild(today - timedelta(days=30))
+            self.stdout.write(f"rebuild: {rows:,} rows in {time.perf_counter() - started:.1f}s")
+            started = time.perf_counter()
+            closed = rollups.close_days(today)
+            merged = rollups.compact(today)
+            self.stdout.write(f"close_days + compact: {closed} day(s) closed, {merged:,} row(s) merged "
+                              f"in {time.perf_counter() - started:.1f}s")
+            self.stdout.write(f"Rollup rows: {EquipmentRollup.objects.count():,} per item, "
+                              f"{CategoryRollup.objects.count():,} per category")
+            self.compare_with_rebuild(today)
+            analyze()
+
+            self.timings(today, options['years'])
+            self.changes(user, today, options['changes'])
+
+    def seed(self, options, today):
+        rng = random.Random(42)
+        span = options['years'] * 365
+        self.stdout.write(f"Seeding {options['records']:,} loans over {span} days and "
+                          f"{options['equipment']:,} items...")
+        with transaction.atomic():
+            user = User.objects.create(username='bench-borrower', role='Viewer', is_approved=True)
+            categories = [lookups.resolve(Category, name) for name in CATEGORIES]
+            location = lookups.resolve(Location, "Lab 1")
+            Equipment.objects.bulk_create(
+                Equipment(name=f"Item {n}", category=rng.choice(categories), location=location,
+                          quantity=rng.randint(1, 40))
+                for n in range(options['equipment'])
+            )
+            equipment_ids = list(Equipment.objects.values_list('id', flat=True))
+
+            def loans():
+                for _ in range(options['records']):
+                    borrowed = today - timedelta(days=rng.randint(0, span))
+                    due = borrowed + timedelta(days=rng.randint(3, 30))
+                    returned = None if rng.random() < 0.02 else min(due + timedelta(days=rng.randint(-3, 6)), today)
+                    damaged = returned is not None and rng.random() < 0.03
+                    penalty = Decimal(rng.choice([10, 25, 50])) if damaged else Decimal(0)
+                    yield (user.id, rng.choice(equipment_ids), rng.randint(1, 3), borrowed, due, returned,
+                           damaged, damaged, penalty)
+
+            insert_rows(UsageRecord, ['user', 'equipment', 'quantity_used', 'borrowed_on', 'due_date',
+                                      'returned_on', 'is_damaged', 'damage_processed', 'penalty_amount'], loans())
+        return user
+
+    def compare_with_rebuild(self, today):
+        """The nightly path has to end up with the same totals as a rebuild as of today."""
+        window = (today - timedelta(days=4000), today + timedelta(days=1))
+        incremental = rollups.category_summary(*window)
+        rollups.rebuild(today)
+        rebuilt = rollups.category_summary(*window)
+        if incremental != rebuilt:
+            raise CommandError(f"close_days/compact disagree with rebuild:\n{incremental}\n{rebuilt}")
+        self.stdout.write("close_days + compact match a rebuild.")
+
+    def timings(self, today, years):
+        self.stdout.write("\n%-34s %12s %12s" % ("query", "rollups", "UsageRecord"))
+        for days in (30, 90, 365, years * 365):
+            start, end = rollups.parse_range({'days': str(days)}, today)
+            self.stdout.write("%-34s %9.2f ms %9.2f ms" % (
+                f"full report, {days} days", timed(lambda: rollups.report(start, end)),
+                timed(lambda: self.from_records(start, end), repeat=1)))
+        start, end = rollups.parse_range({'days': str(years * 365)}, today)
+        for name, func in (('totals', rollups.totals), ('category_summary', rollups.category_summary),
+                           ('trend', rollups.trend), ('top_equipment', rollups.top_equipment)):
+            self.stdout.write("%-34s %9.2f ms" % (f"  {name}, {years * 365} days", timed(lambda: func(start, end))))
+
+    def from_records(self, start, end):
+        """What the dashboard would cost without rollups (events only, no utilization)."""
+        returned = Q(returned_on__gte=start, returned_on__lt=end)
+        records = UsageRecord.objects.order_by()
+        per_category = list(records.values('equipment__category_id').annotate(
+            loans=Count('id', filter=Q(borrowed_on__gte=start, borrowed_on__lt=end)),
+            returns=Count('id', filter=returned),
+            damaged=Count('id', filter=returned & Q(is_damaged=True)),
+            penalty=Sum('penalty_amount', filter=returned),
+        ))
+        top = list(records.filter(borrowed_on__gte=start, borrowed_on__lt=end).values('equipment_id')
+                   .annotate(units=Sum('quantity_used'), avg=Avg('quantity_used')).order_by('-units')[:20])
+        return per_category, top
+
+    def changes(self, user, today, count):
+        """Loans made, returned and removed through the ORM keep the rollups exact via the signals."""
+        rng = random.Random(7)
+        equipment_ids = list(Equipment.objects.values_list('id', flat=True)[:200])
+        started = time.perf_counter()
+        records = [UsageRecord.objects.create(user=user, equipment_id=rng.choice(equipment_ids),
+                                              quantity_used=rng.randint(1, 3), due_date=today + timedelta(days=7))
+                   for _ in range(count)]
+        for record in records[: count // 2]:
+            record.returned_on = today
+            record.is_damaged = rng.random() < 0.2
+            record.penalty_amount = Decimal(25) if record.is_damaged else Decimal(0)
+            record.save()
+        for record in records[-count // 5:]:
+            record.delete()
+        # older history changes too, e.g. an admin correcting a return date
+        for record in UsageRecord.objects.filter(returned_on__isnull=False, borrowed_on__lt=today - timedelta(days=400))[:50]:
+            record.returned_on = record.borrowed_on + timedelta(days=2)
+            record.save()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(f"\n{count} creates, {count // 2} returns, {count // 5} deletes, 50 edits: "
+                          f"{elapsed / (count + count // 2 + count // 5 + 50):.2f} ms per write")
+        drift = rollups.find_drift()
+        if drift:
+            raise CommandError(f"Rollups drifted after ORM writes: {drift}")
+        self.stdout.write("No drift after the writes.")
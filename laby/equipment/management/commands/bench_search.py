@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from equipment import lookups
+from equipment.bench import scratch_database
+from equipment.models import Category, Equipment, Location
+from equipment.search import SearchBackend, get_search_backend
+
+
+NOUNS = ['oscilloscope', 'multimeter', 'microscope', 'centrifuge', 'pipette', 'spectrometer',
+         'soldering station', 'motor driver', 'power supply', 'thermocycler', 'incubator',
+         'signal generator', 'laser', 'beaker', 'hot plate', 'logic analyzer']
+ADJECTIVES = ['digital', 'analog', 'portable', 'benchtop', 'high precision', 'dual channel',
+              'compact', 'refurbished', 'industrial', 'optical']
+CATEGORIES = ['Optics', 'Electrical', 'Chemistry', 'Mechanical', 'Biology', 'Computing']
+QUERIES = ['osc', 'oscilloscope', 'digital multimeter', 'optics lab 3', 'centrifuge biology',
+           'pipe', 'high precision laser', 'nonexistentthing']
+
+
+class Command(BaseCommand):
+    help = "Benchmark equipment search latency (icontains vs. full-text backend) on a scratch database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100_000)
+        parser.add_argument('--runs', type=int, default=20, help="Timed runs per query.")
+        parser.add_argument('--limit', type=int, default=50, help="Rows fetched per search, like one page of cards.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options['items'])
+            backend = get_search_backend()
+            backend.rebuild()
+
+            self.stdout.write("%-24s %8s | %10s %10s | %10s %10s" % (
+                "query", "hits", "like p50", "like p95", "fts p50", "fts p95"))
+            for query in QUERIES:
+                hits = backend.filter(Equipment.objects.all(), query).count()
+                like = self.latencies(SearchBackend(), query, options)
+                fts = self.latencies(backend, query, options)
+                self.stdout.write("%-24s %8d | %9.2fms %9.2fms | %9.2fms %9.2fms" % (
+                    query, hits, *self.percentiles(like), *self.percentiles(fts)))
+            self.stdout.write(f"full-text backend: {type(backend).__name__}")
+
+    def seed(self, count):
+        rng = random.Random(7)
+        self.stdout.write(f"Seeding {count:,} equipment items...")
+        categories = {name: lookups.resolve(Category, name) for name in CATEGORIES}
+        locations = [lookups.resolve(Location, f"Lab {n}") for n in range(1, 21)]
+        Equipment.objects.bulk_create((
+            Equipment(
+                name=f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS).title()} {n}",
+                category=categories[rng.choice(CATEGORIES)],
+                location=rng.choice(locations),
+                quantity=rng.randint(0, 20),
+                description=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} for {rng.choice(CATEGORIES).lower()} work",
+            )
+            for n in range(count)
+        ), batch_size=5000)
+
+    def latencies(self, backend, query, options):
+        samples = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            list(backend.filter(Equipment.objects.all(), query)[:options['limit']])
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def percentiles(self, samples):
+        cuts = statistics.quantiles(samples, n=20)
+        return statistics.median(samples), cuts[18]
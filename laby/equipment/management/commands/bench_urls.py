@@ -0,0 +1,183 @@
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from equipment import urls as equipment_urls
+from equipment.bench import scratch_database
+from equipment.synthetic import DEFAULT_VOLUMES, generate
+
+
+ROLES = ['anonymous', 'Viewer', 'Staff', 'Admin']
+
+# GET on these changes data (or logs out), or they only accept POST
+SKIP = {'logout', 'resolve_alert', 'approve_staff', 'api_token', 'api_token_refresh', 'cancel_reservation'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every URL in equipment/urls.py per role on synthetic data (scratch database) and "
+        "writes JSON results; with --compare, fails on regressions against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per URL and role.")
+        parser.add_argument('--only', help="Only URL names containing this text.")
+        parser.add_argument('--output', help="JSON file to write (default: bench-results/<commit>.json).")
+        parser.add_argument('--compare', help="Earlier results JSON to compare against.")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Allowed median slowdown as a fraction (default 0.25 = 25%%).")
+        parser.add_argument('--min-ms', type=float, default=2.0,
+                            help="Ignore slowdowns smaller than this many ms (timer noise).")
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        # 4xx/5xx are expected (roles without access) and show up in the results
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        with scratch_database():
+            self.stdout.write("Seeding " + ", ".join(f"{n:,} {name}" for name, n in volumes.items()) + "...")
+            samples = generate(volumes, seed=options['seed'])
+            results = {}
+            for name, url in self.urls(samples, options['only']):
+                for role in ROLES:
+                    key = f"{name} [{role}]"
+                    results[key] = self.measure(self.client_for(role, samples, url), url, options['repeat'])
+                    results[key].update(url=url, role=role)
+                    self.stdout.write("%-48s %4d %9.2f ms %9.2f ms %6d q" % (
+                        key, results[key]['status'], results[key]['median_ms'],
+                        results[key]['p95_ms'], results[key]['queries']))
+
+        report = {
+            'commit': self.git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'volumes': volumes,
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        output = Path(options['output'] or f"bench-results/{report['commit'] or 'working-tree'}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, sort_keys=True))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {output}"))
+
+        if options['compare']:
+            self.compare(json.loads(Path(options['compare']).read_text()), report, options)
+
+    def urls(self, samples, only=None):
+        """(name, path) for every benchmarkable GET route, with sample ids filled in."""
+        params = {
+            'equipment_detail': {'id': samples['equipment'].id},
+            'equipment_edit': {'id': samples['equipment'].id},
+            'equipment_delete': {'id': samples['equipment'].id},
+            'equipment_availability': {'id': samples['equipment'].id},
+            'return_equipment': {'id': samples['usage_record'].id},
+        }
+        detail_pk = {
+            'api-equipment-detail': samples['equipment'].id,
+            'api-usage-record-detail': samples['usage_record'].id,
+            'api-request-detail': samples['request'].id,
+            'api-alert-detail': samples['alert'].id,
+        }
+        for pattern in self.walk(equipment_urls.urlpatterns):
+            name = pattern.name
+            groups = set(pattern.pattern.regex.groupindex)
+            if not name or name in SKIP or 'format' in groups or (only and only not in name):
+                continue
+            if name in detail_pk:
+                kwargs = {'pk': detail_pk[name]}
+            else:
+                kwargs = params.get(name, {})
+            if groups - set(kwargs):
+                self.stderr.write(f"Skipping {name}: no sample value for {sorted(groups - set(kwargs))}")
+                continue
+            yield name, reverse(name, kwargs=kwargs or None)
+
+    def walk(self, patterns):
+        seen = set()
+        for entry in patterns:
+            if isinstance(entry, URLResolver):
+                yield from self.walk(entry.url_patterns)
+            elif isinstance(entry, URLPattern) and entry.name not in seen:
+                seen.add(entry.name)
+                yield entry
+
+    def client_for(self, role, samples, url):
+        # a broken view is recorded as a 500, not allowed to abort the run
+        if role == 'anonymous':
+            return Client(raise_request_exception=False)
+        user = samples[role]
+        if url.startswith('/api/'):
+            return Client(raise_request_exception=False,
+                          HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        return client
+
+    def measure(self, client, url, repeat):
+        self.fetch(client, url)  # warm-up: fills caches, not timed
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = self.fetch(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'status': response.status_code,
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[max(int(len(timings) * 0.95) - 1, 0)], 3),
+            'queries': len(queries) // repeat,
+        }
+
+    def fetch(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, baseline, current, options):
+        if baseline.get('volumes') != current['volumes'] or baseline.get('seed') != current['seed']:
+            self.stderr.write("Warning: baseline was seeded with different volumes/seed.")
+        regressions = []
+        for key, now in current['results'].items():
+            before = baseline['results'].get(key)
+            if not before:
+                continue
+            if now['status'] != before['status']:
+                regressions.append(f"{key}: status {before['status']} -> {now['status']}")
+            if now['queries'] > before['queries']:
+                regressions.append(f"{key}: queries {before['queries']} -> {now['queries']}")
+            slower = now['median_ms'] - before['median_ms']
+            if slower > options['min_ms'] and slower > before['median_ms'] * options['threshold']:
+                regressions.append(f"{key}: median {before['median_ms']:.2f} -> {now['median_ms']:.2f} ms")
+
+        self.stdout.write(f"Compared with {baseline.get('commit') or 'baseline'}: {len(regressions)} regression(s).")
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR("  " + line))
+            raise CommandError(f"{len(regressions)} benchmark regression(s) above the threshold.")
@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment import lookups, rollups
+from equipment.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Nightly analytics job: close the days since the last run, then merge old day rows into "
+        "weeks and old week rows into months. --rebuild recomputes every rollup from the loans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recompute all rollups from UsageRecord.")
+        parser.add_argument('--check', action='store_true',
+                            help="Only compare the rollups with the loans; exit non-zero on drift.")
+        parser.add_argument('--today', type=datetime.date.fromisoformat,
+                            help="Run as if it were this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        today = options['today']
+        if options['check']:
+            drift = rollups.find_drift()
+            if not drift:
+                self.stdout.write(self.style.SUCCESS("Rollups are in sync."))
+                return
+            names = lookups.names(Category)
+            for category, fields in sorted(drift.items()):
+                for field, (stored, actual) in fields.items():
+                    self.stdout.write(f"{names.get(category, category)} {field}: stored={stored!r} actual={actual!r}")
+            raise CommandError(f"Rollups drifted in {len(drift)} categor(y/ies); run with --rebuild.")
+
+        if options['rebuild']:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rollups.rebuild(today)} rollup row(s)."))
+            return
+
+        closed = rollups.close_days(today)
+        removed = rollups.compact(today)
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {closed} day(s); merged {removed} old row(s) into weeks and months."
+        ))
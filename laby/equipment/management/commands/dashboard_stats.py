@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.stats import find_drift, rebuild_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DashboardStats snapshot, or check it for drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only compare the snapshot with live counts; exit non-zero on drift.",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_drift()
+            if not drift:
+                self.stdout.write(self.style.SUCCESS("Dashboard stats are in sync."))
+                return
+            for field, (stored, actual) in drift.items():
+                self.stdout.write(f"{field}: stored={stored!r} actual={actual!r}")
+            raise CommandError(f"Dashboard stats drifted on {len(drift)} field(s); run without --check to rebuild.")
+
+        stats = rebuild_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt dashboard stats: {stats.equipment_count} equipment, "
+            f"{stats.borrowed_count} open loans, {stats.alert_count} active alerts."
+        ))
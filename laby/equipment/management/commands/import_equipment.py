@@ -0,0 +1,42 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+
+from equipment.importer import detect_format, import_equipment, iter_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import/update equipment from a CSV (header row = EquipmentForm field names) "
+        "or JSON Lines file. Rows with an existing asset_tag update that item."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--errors-file', help="Write rejected rows to this CSV instead of stdout.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        errors_out = open(options['errors_file'], 'w', newline='') if options['errors_file'] else None
+        writer = csv.writer(errors_out) if errors_out else None
+        if writer:
+            writer.writerow(['row', 'errors'])
+
+        def report(line, errors):
+            if writer:
+                writer.writerow([line, json.dumps(errors)])
+            else:
+                self.stderr.write(f"row {line}: {json.dumps(errors)}")
+
+        try:
+            with open(options['path'], 'rb') as source:
+                result = import_equipment(iter_rows(source, fmt), options['batch_size'], on_error=report)
+        finally:
+            if errors_out:
+                errors_out.close()
+
+        style = self.style.SUCCESS if not result.failed else self.style.WARNING
+        self.stdout.write(style(f"Import finished: {result}."))
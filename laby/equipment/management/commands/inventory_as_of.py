@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment import audit, lookups
+from equipment.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Inventory as it stood at a date or time, from the audit log: "
+        "`inventory_as_of 2026-03-31 [--category Optics]`, or one item with who changed it: "
+        "`inventory_as_of 2026-03-31 --equipment 12`. --checkpoint takes an audit checkpoint now."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('at', nargs='?', help="ISO date (end of that day) or datetime.")
+        parser.add_argument('--category', help="Category name or id.")
+        parser.add_argument('--equipment', type=int, help="One item, with its change history.")
+        parser.add_argument('--checkpoint', action='store_true',
+                            help="Copy the current state into a new checkpoint instead.")
+
+    def handle(self, *args, **options):
+        if options['checkpoint']:
+            point = audit.checkpoint()
+            self.stdout.write(self.style.SUCCESS(
+                f"Checkpoint {point.id}: {point.rows.count()} row(s), events up to #{point.last_event_id}."))
+            return
+        if not options['at']:
+            raise CommandError("Give a date or datetime, or --checkpoint.")
+        try:
+            when = audit.parse_when(options['at'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        category = options['category']
+        if category and not category.isdigit():
+            ids = {name.casefold(): pk for pk, name in lookups.options(Category)}
+            if lookups.canonical(category).casefold() not in ids:
+                raise CommandError(f"No category named {category!r}.")
+            category = ids[lookups.canonical(category).casefold()]
+        equipment_id = options['equipment']
+        items = audit.inventory_as_of(when, int(category) if category else None,
+                                      [equipment_id] if equipment_id else None)
+        self.stdout.write(f"Inventory as of {when:%Y-%m-%d %H:%M %Z}")
+        self.stdout.write("%8s  %-40s %-15s %-15s %-10s %8s" % ("id", "name", "category", "location", "condition",
+                                                               "quantity"))
+        for item in items:
+            self.stdout.write("%8s  %-40s %-15s %-15s %-10s %8s" % (
+                item['id'], (item.get('name') or '')[:40], item.get('category'), item.get('location'),
+                item.get('condition'), item.get('quantity')))
+        self.stdout.write(f"{len(items)} item(s), {sum(item.get('quantity') or 0 for item in items)} unit(s).")
+
+        if equipment_id:
+            self.stdout.write(f"\nChanges to equipment {equipment_id} up to then:")
+            for event in audit.history('equipment', equipment_id, until=when):
+                who = event.user.username if event.user else "-"
+                self.stdout.write(f"{event.created_at:%Y-%m-%d %H:%M}  {event.action:<8} {who:<16} {event.data}")
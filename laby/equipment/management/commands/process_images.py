@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from equipment import images
+from equipment.models import Equipment
+
+
+class Command(BaseCommand):
+    help = (
+        "Make the thumbnail / WebP variants of every equipment image that doesn't have them yet "
+        "(all of them with --force), then optionally delete variants nothing refers to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Redo items that already have variants.")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--prune', action='store_true', help="Delete unreferenced variant files afterwards.")
+
+    def handle(self, *args, **options):
+        items = Equipment.objects.exclude(Q(image='') | Q(image__isnull=True))
+        if not options['force']:
+            items = items.exclude(image_variants__has_key='digest')
+        ids = list(items.order_by('id').values_list('id', flat=True))
+        self.stdout.write(f"Processing {len(ids)} image(s) with {options['workers']} worker(s)...")
+
+        started = time.perf_counter()
+        done, failed = 0, []
+
+        def work(equipment_id):
+            try:
+                images.process(equipment_id, force=options['force'])
+                return equipment_id, None
+            except Exception as exc:  # a missing or corrupt file shouldn't stop the rest
+                return equipment_id, exc
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for equipment_id, error in pool.map(work, ids):
+                if error:
+                    failed.append((equipment_id, error))
+                else:
+                    done += 1
+
+        for equipment_id, error in failed[:20]:
+            self.stderr.write(f"  equipment {equipment_id}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Made variants for {done} image(s) in {time.perf_counter() - started:.1f}s"
+            + (f", {len(failed)} failed" if failed else "") + "."
+        ))
+        if options['prune']:
+            self.stdout.write(f"Pruned {images.prune_variants()} unreferenced variant file(s).")
@@ -0,0 +1,45 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from equipment.profiling import profile_report, prune_profiles
+
+
+class Command(BaseCommand):
+    help = "p50/p95/p99 wall time, SQL and template cost per view, from ProfilingMiddleware samples."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help="Only samples from the last N hours.")
+        parser.add_argument('--view', help="Only this view name, e.g. staff_dashboard.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+        parser.add_argument('--prune-days', type=int, help="Delete samples older than N days first.")
+
+    def handle(self, *args, **options):
+        if options['prune_days'] is not None:
+            deleted = prune_profiles(timedelta(days=options['prune_days']))
+            self.stdout.write(f"Pruned {deleted} old samples.")
+
+        rows = profile_report(since=timezone.now() - timedelta(hours=options['hours']),
+                              view_name=options['view'])
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        if not rows:
+            self.stdout.write("No samples (is LABY_PROFILING=1 set on the server?).")
+            return
+
+        header = f"{'view':<32}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'sql p95':>9}{'queries':>9}{'tmpl':>8}{'dups':>6}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in rows:
+            self.stdout.write(
+                f"{row['view_name'][:31]:<32}{row['count']:>7}{row['p50']:>9.1f}{row['p95']:>9.1f}"
+                f"{row['p99']:>9.1f}{row['sql_p95']:>9.1f}{row['avg_sql']:>9.1f}"
+                f"{row['avg_template']:>8.1f}{row['max_duplicates']:>6}"
+            )
+        for row in rows:
+            if row['top_duplicate_sql']:
+                self.stdout.write(f"\n{row['view_name']}: up to {row['max_duplicates']} repeated queries, e.g.\n"
+                                  f"  {row['top_duplicate_sql'][:300]}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from equipment.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the equipment full-text search index from the Equipment table."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {type(backend).__name__} index ({count} equipment items)."
+        ))
@@ -0,0 +1,52 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from equipment.scheduler import MailWorker, run_pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Background overdue scanner: alerts newly overdue loans, accrues penalties and "
+        "sends reminder emails every OVERDUE_SCAN_INTERVAL seconds until stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single pass and exit.")
+        parser.add_argument('--interval', type=int, default=settings.OVERDUE_SCAN_INTERVAL)
+        parser.add_argument('--batch-size', type=int, default=settings.OVERDUE_SCAN_BATCH_SIZE)
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Ignore the checkpoint and rescan every open loan on the first pass "
+                 "(catches loans approved with a due date already in the past).",
+        )
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        if not options['once']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stopping.set())
+
+        worker = MailWorker()
+        worker.start()
+        full = options['full']
+        try:
+            while not stopping.is_set():
+                close_old_connections()
+                result = run_pass(timezone.localdate(), worker, options['batch_size'], full=full)
+                full = False
+                self.stdout.write(
+                    f"[{timezone.now():%Y-%m-%d %H:%M:%S}] "
+                    + ", ".join(f"{name}={count}" for name, count in result.items())
+                )
+                if options['once']:
+                    break
+                stopping.wait(options['interval'])
+        finally:
+            # let queued reminders go out before exiting
+            worker.stop()
+            self.stdout.write(f"Mail worker stopped: {worker.sent} sent, {worker.failed} failed.")
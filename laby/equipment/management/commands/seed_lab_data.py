@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.models import Equipment, User
+from equipment.synthetic import DEFAULT_VOLUMES, PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = "Fill the configured (development) database with synthetic lab data."
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--force', action='store_true', help="Seed even if the database already has data (use a new --seed each time).")
+
+    def handle(self, *args, **options):
+        if not options['force'] and (User.objects.exists() or Equipment.objects.exists()):
+            raise CommandError("The database already has users or equipment; use --force to add synthetic data anyway.")
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        samples = generate(volumes, seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(f"{n:,} {name}" for name, n in volumes.items()) + ". "
+            f"Log in as {samples['Admin'].username} / {samples['Staff'].username} / "
+            f"{samples['Viewer'].username} with password '{PASSWORD}'."
+        ))
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from equipment import lookups
+from equipment.bench import scratch_database
+from equipment.ledger import InsufficientStock, StockLedger
+from equipment.models import Category, Equipment, Location, StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency stress test for StockLedger: parallel threads withdraw from one "
+        "equipment row of a scratch database and the final stock is checked against the movement log."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=50, help="Withdrawals per thread.")
+        parser.add_argument('--stock', type=int, default=200, help="Starting quantity (keep it below threads*iterations).")
+        parser.add_argument('--batch', type=int, default=1, help="Movements per apply_many() call; 1 uses apply().")
+
+    def handle(self, *args, **options):
+        with scratch_database(on_disk=True):
+            self.stress(options)
+
+    def stress(self, options):
+        threads, iterations = options['threads'], options['iterations']
+        batch = max(1, options['batch'])
+        equipment = Equipment.objects.create(
+            name="__ledger_stress__", category=lookups.resolve(Category, "stress"), quantity=options['stock'],
+            location=lookups.resolve(Location, "-"),
+        )
+        results = {'ok': 0, 'insufficient': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def worker():
+            counts = {'ok': 0, 'insufficient': 0, 'locked': 0}
+            try:
+                for _ in range(0, iterations, batch):
+                    try:
+                        if batch == 1:
+                            StockLedger.apply(equipment.id, -1, 'adjust')
+                        else:
+                            StockLedger.apply_many([
+                                StockMovement(equipment_id=equipment.id, delta=-1, reason='adjust')
+                                for _ in range(batch)
+                            ])
+                        counts['ok'] += batch
+                    except InsufficientStock:
+                        counts['insufficient'] += batch
+                    except OperationalError:
+                        counts['locked'] += batch
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in counts.items():
+                        results[key] += value
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        equipment.refresh_from_db()
+        logged = StockMovement.objects.filter(equipment=equipment).aggregate(total=Sum('delta'))['total'] or 0
+        expected = options['stock'] - results['ok']
+
+        self.stdout.write(
+            f"{threads} threads x {iterations} withdrawals in {elapsed:.2f}s: "
+            f"{results['ok']} applied, {results['insufficient']} refused (no stock), "
+            f"{results['locked']} failed on database locks"
+        )
+        self.stdout.write(f"final quantity={equipment.quantity} expected={expected} ledger sum={logged}")
+
+        if equipment.quantity < 0 or equipment.quantity != expected or logged != -results['ok']:
+            raise CommandError("Stock ledger is inconsistent under concurrency.")
+        self.stdout.write(self.style.SUCCESS("Stock ledger stayed consistent."))
@@ -0,0 +1,71 @@
+from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+class EquipmentQuerySet(models.QuerySet):
+
+    def with_lookups(self):
+        """Joins the category, location and condition rows the listings print."""
+        return self.select_related('category', 'location', 'condition')
+
+    def with_availability(self):
+        """
+        Adds reserved_pending, on_loan and available (shelf stock not yet
+        promised to a pending request) from the availability projection
+        (equipment/projection.py): one LEFT JOIN, no subqueries.
+        """
+        return self.annotate(
+            reserved_pending=Coalesce(F('availability__reserved_pending'), Value(0)),
+            on_loan=Coalesce(F('availability__on_loan'), Value(0)),
+        ).annotate(available=Greatest(F('quantity') - F('reserved_pending'), Value(0)))
+
+
+class UsageRecordQuerySet(models.QuerySet):
+    """
+    Loan listings used by the dashboards.
+    Chain with_related() onto any listing so every row renders without
+    extra queries for user / equipment / approved_by / collected_by.
+    """
+
+    # columns the loan tables actually render
+    LISTING_FIELDS = (
+        'quantity_used', 'borrowed_on', 'due_date', 'returned_on',
+        'is_damaged', 'damage_report', 'penalty_amount',
+        'user__username', 'equipment__name',
+        'approved_by__username', 'collected_by__username',
+    )
+
+    def open(self):
+        return self.filter(returned_on__isnull=True)
+
+    def overdue(self, today):
+        return self.open().filter(due_date__lt=today).annotate(
+            days_overdue=F('due_date') - today
+        )
+
+    def matching(self, user=None, equipment=None):
+        """The borrowers page / export filters: substring of username, equipment name."""
+        records = self
+        if user:
+            records = records.filter(user__username__icontains=user)
+        if equipment:
+            records = records.filter(equipment__name__icontains=equipment)
+        return records
+
+    def with_related(self):
+        return self.select_related(
+            'user', 'equipment', 'approved_by', 'collected_by'
+        ).only(*self.LISTING_FIELDS)
+
+
+class EquipmentRequestQuerySet(models.QuerySet):
+
+    def pending(self):
+        return self.filter(status='pending').order_by('requested_at')
+
+    def with_related(self):
+        return self.select_related('user', 'equipment').only(
+            'quantity', 'purpose', 'status', 'requested_at', 'processed_at',
+            'user__username', 'equipment__name',
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_supplier_equipments_available'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usagerecord',
+            index=models.Index(fields=['-borrowed_on', '-id'], name='usage_borrowed_on_id_idx'),
+        ),
+    ]
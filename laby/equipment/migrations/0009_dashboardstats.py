@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_usagerecord_borrowed_on_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier_count', models.IntegerField(default=0)),
+                ('equipment_count', models.IntegerField(default=0)),
+                ('borrowed_count', models.IntegerField(default=0)),
+                ('alert_count', models.IntegerField(default=0)),
+                ('category_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+def clamp_invalid_quantities(apps, schema_editor):
+    # rows that would violate the new check constraints
+    apps.get_model('equipment', 'Equipment').objects.filter(quantity__lt=0).update(quantity=0)
+    apps.get_model('equipment', 'UsageRecord').objects.filter(quantity_used__lt=1).update(quantity_used=1)
+    apps.get_model('equipment', 'EquipmentRequest').objects.filter(quantity__lt=1).update(quantity=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_stockmovement'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_invalid_quantities, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='alert_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['quantity'], name='equipment_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['category', 'location'], name='equipment_cat_loc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['location'], name='equipment_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['requested_at'], name='request_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usagerecord',
+            index=models.Index(condition=models.Q(('returned_on__isnull', True)), fields=['due_date'], name='usage_open_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipment',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 0)), name='equipment_quantity_gte_0'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentrequest',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 1)), name='request_quantity_gte_1'),
+        ),
+        migrations.AddConstraint(
+            model_name='usagerecord',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity_used__gte', 1)), name='usage_quantity_used_gte_1'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS equipment_search USING fts5("
+    "name, description, category, location, "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+)
+SQLITE_FILL = (
+    "INSERT INTO equipment_search (rowid, name, description, category, location) "
+    "SELECT id, name, description, category, location FROM equipment_equipment"
+)
+
+POSTGRES_CREATE = (
+    "CREATE INDEX IF NOT EXISTS equipment_search_gin ON equipment_equipment USING gin (("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(location, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_FILL)
+    elif vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_CREATE)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS equipment_search")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS equipment_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0011_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
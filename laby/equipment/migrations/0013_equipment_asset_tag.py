@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0012_equipment_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='asset_tag',
+            field=models.CharField(blank=True, help_text='Lab inventory tag; bulk imports update rows by this tag', max_length=50, null=True, unique=True),
+        ),
+    ]
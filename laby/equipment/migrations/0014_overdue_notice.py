@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0013_equipment_asset_tag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OverdueNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('overdue_since', models.DateField()),
+                ('next_reminder_on', models.DateField(blank=True, null=True)),
+                ('reminders_sent', models.PositiveIntegerField(default=0)),
+                ('closed_on', models.DateField(blank=True, null=True)),
+                ('alert', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='equipment.alert')),
+                ('usage_record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='overdue_notice', to='equipment.usagerecord')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('closed_on__isnull', True)), fields=['next_reminder_on'], name='notice_open_reminder_idx')],
+            },
+        ),
+    ]
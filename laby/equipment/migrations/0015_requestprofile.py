@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0014_overdue_notice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=100)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=300)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('wall_ms', models.FloatField()),
+                ('sql_count', models.PositiveIntegerField()),
+                ('sql_ms', models.FloatField()),
+                ('duplicate_sql_count', models.PositiveIntegerField()),
+                ('top_duplicate_sql', models.TextField(blank=True)),
+                ('template_ms', models.FloatField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['view_name', 'created_at'], name='profile_view_created_idx'), models.Index(fields=['created_at'], name='profile_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0015_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('starts_on', models.DateField()),
+                ('ends_on', models.DateField(help_text='First day the units are free again')),
+                ('purpose', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('cancelled', 'Cancelled')], default='active', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='equipment.equipment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'active')), fields=['equipment', 'starts_on'], name='reservation_active_idx'), models.Index(fields=['user', '-starts_on'], name='reservation_user_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('ends_on__gt', models.F('starts_on'))), name='reservation_ends_after_start'), models.CheckConstraint(condition=models.Q(('quantity__gte', 1)), name='reservation_quantity_gte_1')],
+            },
+        ),
+    ]
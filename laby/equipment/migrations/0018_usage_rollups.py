@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0017_equipment_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], default='day', max_length=5)),
+                ('start', models.DateField()),
+                ('loans', models.IntegerField(default=0)),
+                ('units_borrowed', models.IntegerField(default=0)),
+                ('returns', models.IntegerField(default=0)),
+                ('loan_days', models.IntegerField(default=0)),
+                ('overdue_returns', models.IntegerField(default=0)),
+                ('damaged', models.IntegerField(default=0)),
+                ('penalty_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('unit_days', models.IntegerField(default=0)),
+                ('capacity_days', models.IntegerField(default=0)),
+                ('active_days', models.IntegerField(default=0)),
+                ('category', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EquipmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], default='day', max_length=5)),
+                ('start', models.DateField()),
+                ('loans', models.IntegerField(default=0)),
+                ('units_borrowed', models.IntegerField(default=0)),
+                ('returns', models.IntegerField(default=0)),
+                ('loan_days', models.IntegerField(default=0)),
+                ('overdue_returns', models.IntegerField(default=0)),
+                ('damaged', models.IntegerField(default=0)),
+                ('penalty_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('unit_days', models.IntegerField(default=0)),
+                ('capacity_days', models.IntegerField(default=0)),
+                ('active_days', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='usagerecord',
+            index=models.Index(condition=models.Q(('returned_on__isnull', False)), fields=['returned_on'], name='usage_returned_on_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categoryrollup',
+            index=models.Index(fields=['start', 'category'], name='category_rollup_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoryrollup',
+            constraint=models.UniqueConstraint(fields=('category', 'period', 'start'), name='category_rollup_bucket_uniq'),
+        ),
+        migrations.AddField(
+            model_name='equipmentrollup',
+            name='equipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='equipment.equipment'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrollup',
+            index=models.Index(fields=['equipment', 'start', 'unit_days'], name='equipment_rollup_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentrollup',
+            constraint=models.UniqueConstraint(fields=('equipment', 'period', 'start'), name='equipment_rollup_bucket_uniq'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:17
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def coalesce_duplicate_alerts(apps, schema_editor):
+    """Types the untyped damage alerts and merges active duplicates per (equipment, type)."""
+    Alert = apps.get_model('equipment', 'Alert')
+    OverdueNotice = apps.get_model('equipment', 'OverdueNotice')
+    DashboardStats = apps.get_model('equipment', 'DashboardStats')
+
+    # the old damage signal created its alerts without a type
+    Alert.objects.filter(type='').update(type='Damaged')
+    Alert.objects.update(last_seen_at=F('created_at'))
+
+    keep = {}
+    for alert in Alert.objects.filter(is_active=True).order_by('-created_at', '-id'):
+        key = (alert.equipment_id, alert.type)
+        if key not in keep:
+            keep[key] = alert
+            continue
+        survivor = keep[key]
+        survivor.occurrences += alert.occurrences
+        OverdueNotice.objects.filter(alert_id=alert.id).update(alert_id=survivor.id)
+        Alert.objects.filter(pk=alert.pk).update(is_active=False)
+    for alert in keep.values():
+        Alert.objects.filter(pk=alert.pk).update(occurrences=alert.occurrences)
+    DashboardStats.objects.update(alert_count=Alert.objects.filter(is_active=True).count())
+
+
+def raise_low_stock(apps, schema_editor):
+    """Low stock is now only counted from active alerts: raise them for items already low."""
+    Alert = apps.get_model('equipment', 'Alert')
+    Equipment = apps.get_model('equipment', 'Equipment')
+    DashboardStats = apps.get_model('equipment', 'DashboardStats')
+
+    threshold = getattr(settings, 'LOW_STOCK_THRESHOLD', 2)
+    alerted = Alert.objects.filter(type='Low Stock', is_active=True).values('equipment_id')
+    low = Equipment.objects.filter(quantity__lte=threshold).exclude(id__in=alerted)
+    now = django.utils.timezone.now()
+    Alert.objects.bulk_create([
+        Alert(equipment_id=equipment_id, type='Low Stock', message=f"Only {quantity} units left", last_seen_at=now)
+        for equipment_id, quantity in low.values_list('id', 'quantity')
+    ], batch_size=1000)
+    DashboardStats.objects.update(alert_count=Alert.objects.filter(is_active=True).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0018_usage_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='alert_active_idx',
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='last_seen_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(coalesce_duplicate_alerts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='alert',
+            name='type',
+            field=models.CharField(choices=[('Damaged', 'Damaged'), ('Low Stock', 'Low Stock'), ('Overdue', 'Overdue')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-last_seen_at'], name='alert_active_seen_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('equipment', 'type'), name='alert_active_key_uniq'),
+        ),
+        migrations.RunPython(raise_low_stock, migrations.RunPython.noop),
+    ]
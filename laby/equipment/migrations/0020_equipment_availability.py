@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def count_availability(apps, schema_editor):
+    """One row per item with its pending-request and open-loan units."""
+    Equipment = apps.get_model('equipment', 'Equipment')
+    EquipmentAvailability = apps.get_model('equipment', 'EquipmentAvailability')
+    EquipmentRequest = apps.get_model('equipment', 'EquipmentRequest')
+    UsageRecord = apps.get_model('equipment', 'UsageRecord')
+
+    pending = dict(EquipmentRequest.objects.filter(status='pending').order_by()
+                   .values_list('equipment_id').annotate(Sum('quantity')))
+    on_loan = dict(UsageRecord.objects.filter(returned_on__isnull=True).order_by()
+                   .values_list('equipment_id').annotate(Sum('quantity_used')))
+    EquipmentAvailability.objects.bulk_create([
+        EquipmentAvailability(equipment_id=equipment_id, reserved_pending=pending.get(equipment_id, 0),
+                              on_loan=on_loan.get(equipment_id, 0))
+        for equipment_id in Equipment.objects.values_list('id', flat=True).iterator()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0019_alert_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentAvailability',
+            fields=[
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='availability', serialize=False, to='equipment.equipment')),
+                ('reserved_pending', models.IntegerField(default=0)),
+                ('on_loan', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_availability, migrations.RunPython.noop),
+    ]
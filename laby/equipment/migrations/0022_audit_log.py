@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:45
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# equipment.audit.AUDITED as of this migration
+AUDITED = {
+    'equipment': ('Equipment', ('name', 'category', 'location', 'condition', 'quantity')),
+    'usagerecord': ('UsageRecord', ('user_id', 'equipment_id', 'quantity_used', 'borrowed_on', 'due_date',
+                                    'returned_on', 'is_damaged')),
+    'equipmentrequest': ('EquipmentRequest', ('user_id', 'equipment_id', 'quantity', 'status')),
+    'alert': ('Alert', ('equipment_id', 'type', 'is_active')),
+}
+
+
+def first_checkpoint(apps, schema_editor):
+    """The state the log starts from: as-of queries before it only know this."""
+    AuditCheckpoint = apps.get_model('equipment', 'AuditCheckpoint')
+    AuditSnapshot = apps.get_model('equipment', 'AuditSnapshot')
+    point = AuditCheckpoint.objects.create(last_event_id=0)
+    for name, (model_name, fields) in AUDITED.items():
+        rows = apps.get_model('equipment', model_name).objects.values_list('pk', *fields).iterator()
+        AuditSnapshot.objects.bulk_create((
+            AuditSnapshot(checkpoint=point, model=name, object_id=pk, data=dict(zip(fields, values)))
+            for pk, *values in rows
+        ), batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0021_catalogue_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id', 'id'], name='audit_object_idx'), models.Index(fields=['created_at'], name='audit_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='equipment.auditcheckpoint')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('checkpoint', 'model', 'object_id'), name='audit_snapshot_row_uniq')],
+            },
+        ),
+        migrations.RunPython(first_checkpoint, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def lookup_model(name, **options):
+    return migrations.CreateModel(
+        name=name,
+        fields=[
+            ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ('name', models.CharField(max_length=100)),
+        ],
+        options={
+            'ordering': ['name'],
+            'abstract': False,
+            'constraints': [models.UniqueConstraint(django.db.models.functions.text.Lower('name'),
+                                                    name=f'{name.lower()}_name_uniq')],
+            **options,
+        },
+    )
+
+
+def reference(model, related_name):
+    # filled by 0024, renamed over the text column by 0025
+    return models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name=related_name,
+                             to=f'equipment.{model}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0022_audit_log'),
+    ]
+
+    operations = [
+        lookup_model('Category', verbose_name_plural='categories'),
+        lookup_model('Location'),
+        lookup_model('Condition'),
+        migrations.AddField(model_name='equipment', name='category_ref', field=reference('Category', '+')),
+        migrations.AddField(model_name='equipment', name='location_ref', field=reference('Location', '+')),
+        migrations.AddField(model_name='equipment', name='condition_ref', field=reference('Condition', '+')),
+        migrations.AddField(model_name='categoryrollup', name='category_ref', field=reference('Category', '+')),
+    ]
@@ -0,0 +1,107 @@
+from collections import Counter, defaultdict
+
+from django.db import migrations
+
+# the text columns each lookup table replaces: {lookup model: [(model, column), ...]}
+SOURCES = {
+    'Category': [('Equipment', 'category'), ('CategoryRollup', 'category')],
+    'Location': [('Equipment', 'location')],
+    'Condition': [('Equipment', 'condition')],
+}
+ROLLUP_METRICS = ('loans', 'units_borrowed', 'returns', 'loan_days', 'overdue_returns', 'damaged',
+                  'penalty_total', 'unit_days', 'capacity_days', 'active_days')
+
+
+def canonical(name):
+    # same rule as equipment.lookups.canonical
+    return ' '.join((name or '').split()) or 'Unknown'
+
+
+def fill_lookups(apps, schema_editor):
+    """
+    One lookup row per spelling that differs only in case or spacing; it
+    takes the most common of those spellings as its name.
+    """
+    for lookup_name, sources in SOURCES.items():
+        spellings = defaultdict(Counter)
+        for model_name, column in sources:
+            model = apps.get_model('equipment', model_name)
+            for value, in model.objects.values_list(column).iterator():
+                spellings[canonical(value).casefold()][canonical(value)] += 1
+        lookup = apps.get_model('equipment', lookup_name)
+        ids = {key: lookup.objects.create(name=counts.most_common(1)[0][0]).pk
+               for key, counts in sorted(spellings.items())}
+        if lookup_name == 'Condition' and 'good' not in ids:
+            lookup.objects.create(name='Good')
+
+        for model_name, column in sources:
+            model = apps.get_model('equipment', model_name)
+            for value in model.objects.values_list(column, flat=True).distinct().order_by():
+                model.objects.filter(**{column: value}).update(
+                    **{f'{column}_ref': ids[canonical(value).casefold()]})
+
+    merge_category_rollups(apps)
+    recount_categories(apps)
+    rewrite_audit_log(apps)
+
+
+def merge_category_rollups(apps):
+    """Buckets of spellings that now share a category become one bucket."""
+    CategoryRollup = apps.get_model('equipment', 'CategoryRollup')
+    buckets = defaultdict(list)
+    for rollup in CategoryRollup.objects.order_by('id'):
+        buckets[rollup.category_ref_id, rollup.period, rollup.start].append(rollup)
+    for kept, *merged in buckets.values():
+        if not merged:
+            continue
+        for rollup in merged:
+            for field in ROLLUP_METRICS:
+                setattr(kept, field, getattr(kept, field) + getattr(rollup, field))
+        kept.save(update_fields=ROLLUP_METRICS)
+        CategoryRollup.objects.filter(id__in=[rollup.id for rollup in merged]).delete()
+
+
+def recount_categories(apps):
+    DashboardStats = apps.get_model('equipment', 'DashboardStats')
+    Equipment = apps.get_model('equipment', 'Equipment')
+    counts = Counter(Equipment.objects.values_list('category_ref_id', flat=True))
+    DashboardStats.objects.update(category_counts={str(key): count for key, count in counts.items()})
+
+
+def rewrite_audit_log(apps):
+    """Logged equipment values become lookup ids, as equipment.audit now records them."""
+    lookups = {column: apps.get_model('equipment', lookup_name)
+               for lookup_name, column in (('Category', 'category'), ('Location', 'location'),
+                                           ('Condition', 'condition'))}
+    names = {column: {lookup.name.casefold(): lookup.pk for lookup in model.objects.all()}
+             for column, model in lookups.items()}
+
+    def rewrite(data):
+        for column, ids in names.items():
+            if column in data:
+                name = canonical(data.pop(column))
+                if name.casefold() not in ids:
+                    # only in the history of deleted items: keep it nameable
+                    ids[name.casefold()] = lookups[column].objects.create(name=name).pk
+                data[f'{column}_id'] = ids[name.casefold()]
+        return data
+
+    for model_name in ('AuditEvent', 'AuditSnapshot'):
+        model = apps.get_model('equipment', model_name)
+        rows = []
+        for row in model.objects.filter(model='equipment').only('id', 'data').iterator(chunk_size=5000):
+            if any(column in row.data for column in names):
+                row.data = rewrite(row.data)
+                rows.append(row)
+        model.objects.bulk_update(rows, ['data'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0023_lookup_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_lookups, migrations.RunPython.noop),
+    ]
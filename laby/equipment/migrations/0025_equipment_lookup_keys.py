@@ -0,0 +1,64 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+import equipment.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0024_canonicalize_lookups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(model_name='equipment', name='equipment_cat_loc_idx'),
+        migrations.RemoveIndex(model_name='equipment', name='equipment_location_idx'),
+        migrations.RemoveConstraint(model_name='categoryrollup', name='category_rollup_bucket_uniq'),
+        migrations.RemoveIndex(model_name='categoryrollup', name='category_rollup_start_idx'),
+        migrations.RemoveField(model_name='equipment', name='category'),
+        migrations.RemoveField(model_name='equipment', name='location'),
+        migrations.RemoveField(model_name='equipment', name='condition'),
+        migrations.RemoveField(model_name='categoryrollup', name='category'),
+        migrations.RenameField(model_name='equipment', old_name='category_ref', new_name='category'),
+        migrations.RenameField(model_name='equipment', old_name='location_ref', new_name='location'),
+        migrations.RenameField(model_name='equipment', old_name='condition_ref', new_name='condition'),
+        migrations.RenameField(model_name='categoryrollup', old_name='category_ref', new_name='category'),
+        migrations.AlterField(
+            model_name='equipment',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='equipment', to='equipment.category'),
+        ),
+        migrations.AlterField(
+            model_name='equipment',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='equipment',
+                                    to='equipment.location'),
+        ),
+        migrations.AlterField(
+            model_name='equipment',
+            name='condition',
+            field=models.ForeignKey(default=equipment.models.default_condition,
+                                    on_delete=django.db.models.deletion.PROTECT, related_name='equipment',
+                                    to='equipment.condition'),
+        ),
+        migrations.AlterField(
+            model_name='categoryrollup',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='rollups', to='equipment.category'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['category', 'location'], name='equipment_cat_loc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoryrollup',
+            constraint=models.UniqueConstraint(fields=('category', 'period', 'start'),
+                                               name='category_rollup_bucket_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='categoryrollup',
+            index=models.Index(fields=['start', 'category'], name='category_rollup_start_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# the search documents now take category and location names from the lookup tables
+SQLITE_REFILL = (
+    "INSERT INTO equipment_search (rowid, name, description, category, location) "
+    "SELECT e.id, e.name, e.description, c.name, l.name FROM equipment_equipment e "
+    "JOIN equipment_category c ON c.id = e.category_id JOIN equipment_location l ON l.id = e.location_id"
+)
+
+# an expression index cannot reach into other tables, so the documents move to
+# a side table kept current by equipment.search (the old index went with the columns)
+POSTGRES_CREATE = (
+    "CREATE TABLE IF NOT EXISTS equipment_search ("
+    "equipment_id bigint PRIMARY KEY REFERENCES equipment_equipment (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS equipment_search_gin ON equipment_search USING gin (document)",
+)
+POSTGRES_FILL = (
+    "INSERT INTO equipment_search (equipment_id, document) "
+    "SELECT e.id, "
+    "setweight(to_tsvector('simple', coalesce(e.name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(c.name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(l.name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(e.description, '')), 'C') "
+    "FROM equipment_equipment e "
+    "JOIN equipment_category c ON c.id = e.category_id JOIN equipment_location l ON l.id = e.location_id"
+)
+
+
+def refill_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DELETE FROM equipment_search")
+        schema_editor.execute(SQLITE_REFILL)
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+        schema_editor.execute(POSTGRES_FILL)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS equipment_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0025_equipment_lookup_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(refill_search_index, drop_search_table),
+    ]
@@ -1,5 +1,10 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .managers import EquipmentQuerySet, UsageRecordQuerySet, EquipmentRequestQuerySet
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -25,20 +30,97 @@ class Supplier(models.Model):
     def __str__(self):
         return self.name
 
+class Lookup(models.Model):
+    """A dropdown value shared by many items; names are unique ignoring case (see equipment/lookups.py)."""
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        abstract = True
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+class Category(Lookup):
+    class Meta(Lookup.Meta):
+        verbose_name_plural = 'categories'
+        constraints = [models.UniqueConstraint(Lower('name'), name='category_name_uniq')]
+
+class Location(Lookup):
+    class Meta(Lookup.Meta):
+        constraints = [models.UniqueConstraint(Lower('name'), name='location_name_uniq')]
+
+class Condition(Lookup):
+    class Meta(Lookup.Meta):
+        constraints = [models.UniqueConstraint(Lower('name'), name='condition_name_uniq')]
+
+def default_condition():
+    condition = Condition.objects.filter(name__iexact='Good').first()
+    return (condition or Condition.objects.create(name='Good')).pk
+
 class Equipment(models.Model):
+    asset_tag = models.CharField(max_length=50, unique=True, null=True, blank=True,
+                                 help_text="Lab inventory tag; bulk imports update rows by this tag")
     name = models.CharField(max_length=100)
-    category = models.CharField(max_length=50)
+    # the composite index below leads with category, so it needs none of its own
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='equipment', db_index=False)
     quantity = models.IntegerField()
-    location = models.CharField(max_length=100)
-    condition = models.CharField(max_length=50, default='Good')
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='equipment')
+    condition = models.ForeignKey(Condition, on_delete=models.PROTECT, related_name='equipment',
+                                  default=default_condition)
     added_on = models.DateField(auto_now_add=True)
     description = models.TextField(blank=True, help_text="Short description or usage of the equipment")
     datasheet = models.URLField(max_length=300, blank=True, null=True)
     image = models.ImageField(upload_to='equipment_images/', blank=True, null=True)
-    
+    # thumbnails / WebP made from `image` in the background, see equipment/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = EquipmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quantity'], name='equipment_quantity_idx'),  # low stock
+            models.Index(fields=['category', 'location'], name='equipment_cat_loc_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(quantity__gte=0), name='equipment_quantity_gte_0'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def image_srcset(self, kind):
+        return ", ".join(f"{self.image.storage.url(name)} {width}w"
+                         for width, name in self.image_variants.get(kind, []))
+
+    @property
+    def webp_srcset(self):
+        return self.image_srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.image_srcset('jpeg')
+
+    @property
+    def thumbnail_url(self):
+        """Smallest JPEG variant, or the original until the variants exist."""
+        variants = self.image_variants.get('jpeg')
+        return self.image.storage.url(variants[0][1]) if variants else self.image.url
+
+class EquipmentAvailability(models.Model):
+    """
+    Per-item counts behind Equipment.objects.with_availability(), kept in
+    step with requests and loans by equipment/projection.py.
+    """
+    equipment = models.OneToOneField(Equipment, on_delete=models.CASCADE, primary_key=True,
+                                     related_name='availability')
+    reserved_pending = models.IntegerField(default=0)  # units in pending requests
+    on_loan = models.IntegerField(default=0)  # units out on open loans
+
+    def __str__(self):
+        return f"{self.equipment_id}: {self.reserved_pending} requested, {self.on_loan} on loan"
+
+
 class UsageRecord(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE)
@@ -58,19 +140,61 @@ class UsageRecord(models.Model):
     penalty_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     damage_processed = models.BooleanField(default=False)
 
+    objects = UsageRecordQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination on admin_borrowers
+            models.Index(fields=['-borrowed_on', '-id'], name='usage_borrowed_on_id_idx'),
+            # open loans / overdue scans only ever look at unreturned rows
+            models.Index(fields=['due_date'], condition=models.Q(returned_on__isnull=True),
+                         name='usage_open_due_idx'),
+            # nightly rollup close: loans returned since a given day
+            models.Index(fields=['returned_on'], condition=models.Q(returned_on__isnull=False),
+                         name='usage_returned_on_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(quantity_used__gte=1), name='usage_quantity_used_gte_1'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.equipment.name}"
 
 
 
 class Alert(models.Model):
+    """
+    Raised and coalesced by equipment/alerts.py: at most one active alert per
+    (equipment, type); repeats bump `occurrences` and `last_seen_at`.
+    """
+    DAMAGED = 'Damaged'
+    LOW_STOCK = 'Low Stock'
+    OVERDUE = 'Overdue'
+    TYPE_CHOICES = [
+        (DAMAGED, 'Damaged'),
+        (LOW_STOCK, 'Low Stock'),
+        (OVERDUE, 'Overdue'),
+    ]
+
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE)
     message = models.TextField()
-    type = models.CharField(max_length=20)
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(default=timezone.now)
+    occurrences = models.PositiveIntegerField(default=1)
     is_active = models.BooleanField(default=True)
 
-    
+    class Meta:
+        constraints = [
+            # the dedup key: a repeat updates the active alert instead of adding one
+            models.UniqueConstraint(fields=['equipment', 'type'], condition=models.Q(is_active=True),
+                                    name='alert_active_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['-last_seen_at'], condition=models.Q(is_active=True),
+                         name='alert_active_seen_idx'),
+        ]
+
 
 class EquipmentRequest(models.Model):
     STATUS_CHOICES = [
@@ -86,7 +210,295 @@ class EquipmentRequest(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     requested_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
-    
+
+    objects = EquipmentRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['requested_at'], condition=models.Q(status='pending'),
+                         name='request_pending_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(quantity__gte=1), name='request_quantity_gte_1'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} requested {self.quantity} {self.equipment.name}"
 
+
+class Reservation(models.Model):
+    """
+    Units of an item booked for a future window [starts_on, ends_on).
+    Created through equipment.availability.reserve(), which refuses
+    bookings that would exceed what is free over the window.
+    """
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('cancelled', 'Cancelled'),
+    ]
+    # bounds every range query: a reservation overlapping a window must start
+    # at most this many days before it
+    MAX_DAYS = 60
+
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField(default=1)
+    starts_on = models.DateField()
+    ends_on = models.DateField(help_text="First day the units are free again")
+    purpose = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['equipment', 'starts_on'], condition=models.Q(status='active'),
+                         name='reservation_active_idx'),
+            models.Index(fields=['user', '-starts_on'], name='reservation_user_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(ends_on__gt=models.F('starts_on')),
+                                   name='reservation_ends_after_start'),
+            models.CheckConstraint(condition=models.Q(quantity__gte=1), name='reservation_quantity_gte_1'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.equipment_id} {self.starts_on} -> {self.ends_on}"
+
+
+class StockMovement(models.Model):
+    """
+    Append-only log of every change to Equipment.quantity.
+    Rows are written by equipment.ledger.StockLedger, never edited.
+    """
+    REASON_CHOICES = [
+        ('approve', 'Loan approved'),
+        ('return', 'Returned'),
+        ('damage', 'Damage write-off'),
+        ('add_back', 'Added back'),
+        ('adjust', 'Adjustment'),
+    ]
+
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='stock_movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    usage_record = models.ForeignKey(UsageRecord, on_delete=models.SET_NULL, null=True, blank=True)
+    equipment_request = models.ForeignKey(EquipmentRequest, on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(User, related_name='stock_movements',
+                                   on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.equipment_id}: {self.delta:+d} ({self.reason})"
+
+
+class DashboardStats(models.Model):
+    """
+    Single-row snapshot of the dashboard counters.
+    Kept current incrementally by equipment.signals; rebuild or check it for
+    drift with `manage.py dashboard_stats`.
+    """
+    supplier_count = models.IntegerField(default=0)
+    equipment_count = models.IntegerField(default=0)
+    borrowed_count = models.IntegerField(default=0)
+    alert_count = models.IntegerField(default=0)
+    category_counts = models.JSONField(default=dict)  # {str(category id): items}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    SINGLETON_ID = 1
+
+    @classmethod
+    def load(cls):
+        stats = cls.objects.filter(pk=cls.SINGLETON_ID).first()
+        if stats is None:
+            from .stats import rebuild_dashboard_stats
+            stats = rebuild_dashboard_stats()
+        return stats
+
+    def __str__(self):
+        return f"Dashboard stats @ {self.updated_at}"
+
+
+class OverdueNotice(models.Model):
+    """
+    One row per loan that went overdue, opened by the overdue scanner
+    (`manage.py run_scheduler`). The one-to-one link is what makes the scan
+    idempotent: a loan is alerted at most once however often it runs.
+    """
+    usage_record = models.OneToOneField(UsageRecord, on_delete=models.CASCADE, related_name='overdue_notice')
+    alert = models.ForeignKey(Alert, on_delete=models.SET_NULL, null=True, blank=True)
+    overdue_since = models.DateField()
+    next_reminder_on = models.DateField(null=True, blank=True)
+    reminders_sent = models.PositiveIntegerField(default=0)
+    closed_on = models.DateField(null=True, blank=True)  # set once the loan is returned
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_reminder_on'], condition=models.Q(closed_on__isnull=True),
+                         name='notice_open_reminder_idx'),
+        ]
+
+    def __str__(self):
+        return f"Loan {self.usage_record_id} overdue since {self.overdue_since}"
+
+
+class ScanCheckpoint(models.Model):
+    """How far a background job has got, one row per job name."""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class RequestProfile(models.Model):
+    """One sampled request, recorded by equipment.profiling.ProfilingMiddleware."""
+    view_name = models.CharField(max_length=100)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=300)
+    status_code = models.PositiveSmallIntegerField()
+    wall_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField()
+    sql_ms = models.FloatField()
+    duplicate_sql_count = models.PositiveIntegerField()  # queries repeating an earlier statement's shape
+    top_duplicate_sql = models.TextField(blank=True)
+    template_ms = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['view_name', 'created_at'], name='profile_view_created_idx'),
+            models.Index(fields=['created_at'], name='profile_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.view_name} {self.wall_ms:.1f}ms"
+
+
+class RollupMetrics(models.Model):
+    """
+    Loan metrics of one time bucket, summed so buckets can be merged.
+    Maintained by equipment/rollups.py; see there for what each field counts.
+    """
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES, default='day')
+    start = models.DateField()
+    loans = models.IntegerField(default=0)
+    units_borrowed = models.IntegerField(default=0)
+    returns = models.IntegerField(default=0)
+    loan_days = models.IntegerField(default=0)
+    overdue_returns = models.IntegerField(default=0)
+    damaged = models.IntegerField(default=0)
+    penalty_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    unit_days = models.IntegerField(default=0)
+    capacity_days = models.IntegerField(default=0)
+    active_days = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class EquipmentRollup(RollupMetrics):
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='rollups')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['equipment', 'period', 'start'], name='equipment_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            # covers the "most used over a range" ranking, grouped by item without a sort
+            models.Index(fields=['equipment', 'start', 'unit_days'], name='equipment_rollup_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_id} {self.period} {self.start}"
+
+
+class CategoryRollup(RollupMetrics):
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='rollups', db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'period', 'start'], name='category_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['start', 'category'], name='category_rollup_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} {self.period} {self.start}"
+
+
+class CatalogueChange(models.Model):
+    """
+    One row per change to an item as the viewer catalogue shows it (see
+    equipment/catalogue.py). The id is the catalogue version; a client that
+    holds version N asks for everything changed after N. No foreign key, so
+    deletions are logged too.
+    """
+    id = models.BigAutoField(primary_key=True)
+    equipment_id = models.IntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} equipment {self.equipment_id}"
+
+
+class AuditEvent(models.Model):
+    """
+    One change to an audited row, with the audited fields it wrote. Only
+    ever inserted, by equipment/audit.py.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)  # model_name: equipment, usagerecord, ...
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='audit_events')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # one object's history, and the replay after a checkpoint
+            models.Index(fields=['model', 'object_id', 'id'], name='audit_object_idx'),
+            models.Index(fields=['created_at'], name='audit_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.model} {self.object_id} {self.action}"
+
+
+class AuditCheckpoint(models.Model):
+    """The audited fields of every row as of `taken_at`; events up to `last_event_id` are in it."""
+    taken_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"checkpoint {self.id} at {self.taken_at:%Y-%m-%d %H:%M}"
+
+
+class AuditSnapshot(models.Model):
+    checkpoint = models.ForeignKey(AuditCheckpoint, on_delete=models.CASCADE, related_name='rows')
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['checkpoint', 'model', 'object_id'], name='audit_snapshot_row_uniq'),
+        ]
@@ -0,0 +1,87 @@
+import base64
+from datetime import date
+
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(borrowed_on, pk):
+    raw = f"{borrowed_on.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (borrowed_on, id) or None if the cursor is missing/garbled."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def paginate_usage_records(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Keyset pagination over UsageRecord, newest first, ordered by (borrowed_on, id).
+    `after` walks towards older rows, `before` walks back towards newer rows.
+    Each page is a single indexed range scan, so deep pages cost the same as page 1.
+    """
+    before_key = decode_cursor(before)
+    after_key = decode_cursor(after)
+
+    if before_key:
+        day, pk = before_key
+        rows = list(
+            queryset.filter(Q(borrowed_on__gt=day) | Q(borrowed_on=day, id__gt=pk))
+            .order_by('borrowed_on', 'id')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        if after_key:
+            day, pk = after_key
+            queryset = queryset.filter(Q(borrowed_on__lt=day) | Q(borrowed_on=day, id__lt=pk))
+        rows = list(queryset.order_by('-borrowed_on', '-id')[:page_size + 1])
+        has_older = len(rows) > page_size
+        rows = rows[:page_size]
+        has_newer = after_key is not None
+
+    if not rows:
+        return KeysetPage(rows)
+
+    first, last = rows[0], rows[-1]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(last.borrowed_on, last.id) if has_older else None,
+        prev_cursor=encode_cursor(first.borrowed_on, first.id) if has_newer else None,
+    )
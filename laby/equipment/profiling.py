@@ -0,0 +1,192 @@
+"""
+Opt-in request profiling.
+
+ProfilingMiddleware (enabled with LABY_PROFILING=1) samples a fraction of
+requests (PROFILING_SAMPLE_RATE) and records, per request: wall time, SQL
+query count and time, repeated statements (same SQL with different
+parameters, the usual N+1 signature) and template render time. Samples are
+buffered in memory and written in bulk, so an unsampled request costs one
+random() call and a sampled one no extra query.
+
+`manage.py profile_report` and /admin-dashboard/profiling/ aggregate the
+samples into p50/p95/p99 per view.
+"""
+import contextvars
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Avg, Max
+from django.template.backends.django import Template as DjangoTemplate
+from django.utils import timezone
+
+from .models import RequestProfile
+
+
+_current = contextvars.ContextVar('laby_profile', default=None)
+
+_NUMBERS = re.compile(r"\b\d+\b")
+
+
+class RequestSample:
+    def __init__(self):
+        self.queries = Counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        # gather_reads() workers of the same request count into it concurrently
+        self.lock = threading.Lock()
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            # inlined literals would hide repeats, so fold numbers too
+            statement = _NUMBERS.sub('?', sql)
+            with self.lock:
+                self.sql_ms += elapsed
+                self.sql_count += 1
+                self.queries[statement] += 1
+
+    def duplicates(self):
+        repeated = {sql: n for sql, n in self.queries.items() if n > 1}
+        top = max(repeated, key=repeated.get) if repeated else ''
+        return sum(n - 1 for n in repeated.values()), top
+
+
+def profiled_queries():
+    """
+    Counts the queries run on this thread's connections into the request's
+    sample, if it is sampled; threads other than the request's (async_views
+    workers) enter it themselves.
+    """
+    stack = ExitStack()
+    sample = _current.get()
+    if sample is not None:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(sample.sql_wrapper))
+    return stack
+
+
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    sample = _current.get()
+    if sample is None:
+        return _original_render(self, context, request)
+    # render_to_string() inside a rendering template is counted once, by the outer call
+    sample.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        sample.template_depth -= 1
+        if not sample.template_depth:
+            sample.template_ms += (time.perf_counter() - start) * 1000
+
+
+class ProfilingMiddleware:
+    """Put it first in MIDDLEWARE so wall time covers the whole stack."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 1.0)
+        self.flush_size = getattr(settings, 'PROFILING_FLUSH_SIZE', 20)
+        self.buffer = []
+        self.lock = threading.Lock()
+        DjangoTemplate.render = _timed_render
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        sample = RequestSample()
+        token = _current.set(sample)
+        start = time.perf_counter()
+        try:
+            with profiled_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        duplicate_count, top_duplicate = sample.duplicates()
+        self.record(RequestProfile(
+            view_name=(match.view_name if match else '<unresolved>')[:100],
+            method=request.method[:10],
+            path=request.path[:300],
+            status_code=response.status_code,
+            wall_ms=wall_ms,
+            sql_count=sample.sql_count,
+            sql_ms=sample.sql_ms,
+            duplicate_sql_count=duplicate_count,
+            top_duplicate_sql=top_duplicate[:2000],
+            template_ms=sample.template_ms,
+        ))
+        return response
+
+    def record(self, profile):
+        with self.lock:
+            self.buffer.append(profile)
+            if len(self.buffer) < self.flush_size:
+                return
+            batch, self.buffer = self.buffer, []
+        RequestProfile.objects.bulk_create(batch)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def profile_report(since=None, view_name=None):
+    """Per-view aggregates, slowest p95 first."""
+    profiles = RequestProfile.objects.all()
+    if since:
+        profiles = profiles.filter(created_at__gte=since)
+    if view_name:
+        profiles = profiles.filter(view_name=view_name)
+
+    rows = []
+    summary = profiles.values('view_name').annotate(
+        avg_sql=Avg('sql_count'), max_sql=Max('sql_count'), avg_template=Avg('template_ms'),
+        max_duplicates=Max('duplicate_sql_count'),
+    )
+    for entry in summary:
+        per_view = profiles.filter(view_name=entry['view_name'])
+        timings = list(per_view.values_list('wall_ms', 'sql_ms'))
+        wall = sorted(t[0] for t in timings)
+        sql_ms = sorted(t[1] for t in timings)
+        worst = per_view.filter(duplicate_sql_count__gt=0).order_by('-duplicate_sql_count').first()
+        rows.append({
+            'view_name': entry['view_name'],
+            'count': len(wall),
+            'p50': percentile(wall, 0.50),
+            'p95': percentile(wall, 0.95),
+            'p99': percentile(wall, 0.99),
+            'sql_p95': percentile(sql_ms, 0.95),
+            'avg_sql': entry['avg_sql'],
+            'max_sql': entry['max_sql'],
+            'avg_template': entry['avg_template'],
+            'max_duplicates': entry['max_duplicates'],
+            'top_duplicate_sql': worst.top_duplicate_sql if worst else '',
+        })
+    rows.sort(key=lambda row: row['p95'], reverse=True)
+    return rows
+
+
+def prune_profiles(older_than):
+    return RequestProfile.objects.filter(created_at__lt=timezone.now() - older_than).delete()[0]
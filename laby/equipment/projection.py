@@ -0,0 +1,134 @@
+"""
+Availability projection: what the equipment listings show per item.
+
+Equipment.quantity is the stock on the shelf (loans are already taken out
+of it by StockLedger), but part of that shelf stock is promised to pending
+requests. EquipmentAvailability keeps, per item,
+
+- reserved_pending: units asked for by pending EquipmentRequests
+- on_loan: units out on open loans
+
+and Equipment.objects.with_availability() joins it in, adding
+`available` = quantity - reserved_pending (never below 0), so a listing of
+any size is still one query.
+
+The counts change in the same transaction as the requests and loans they
+count: signals.py applies each saved or deleted row's change, and the bulk
+paths (approvals.py) call apply_many(). Items without a row yet (bulk
+created) count as zero until their first change, which builds their row
+from scratch. `manage.py availability --check` compares every row with a
+recount; without --check it rebuilds them.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from . import catalogue, events
+from .caching import bump_version
+from .models import Equipment, EquipmentAvailability, EquipmentRequest, UsageRecord
+
+
+PENDING = 'pending'
+
+
+def request_state(req):
+    """The part of a request the projection counts: (equipment_id, units) while pending, else None."""
+    return (req['equipment_id'], req['quantity']) if req and req['status'] == PENDING else None
+
+
+def loan_state(record):
+    """(equipment_id, units) while a loan is open, else None."""
+    return (record['equipment_id'], record['quantity_used']) if record and record['returned_on'] is None else None
+
+
+def request_change(old, new):
+    """Deltas {equipment_id: (reserved_pending, on_loan)} for a request going from `old` to `new`."""
+    return _change(request_state(old), request_state(new), 0)
+
+
+def loan_change(old, new):
+    return _change(loan_state(old), loan_state(new), 1)
+
+
+def _change(old, new, column):
+    deltas = defaultdict(lambda: [0, 0])
+    if old:
+        deltas[old[0]][column] -= old[1]
+    if new:
+        deltas[new[0]][column] += new[1]
+    return {equipment_id: tuple(delta) for equipment_id, delta in deltas.items() if any(delta)}
+
+
+def apply_many(deltas):
+    """Adds {equipment_id: (reserved_pending, on_loan)} to the projection, one UPDATE per item."""
+    missing = []
+    for equipment_id, (reserved_pending, on_loan) in deltas.items():
+        if not (reserved_pending or on_loan):
+            continue
+        updated = EquipmentAvailability.objects.filter(equipment_id=equipment_id).update(
+            reserved_pending=F('reserved_pending') + reserved_pending, on_loan=F('on_loan') + on_loan)
+        if not updated:
+            missing.append(equipment_id)
+    if missing:
+        # no row yet: count everything (this change included) from scratch
+        rebuild(missing)
+    if deltas:
+        catalogue.record(deltas)
+        # the listings cache their cards per equipment version
+        transaction.on_commit(lambda: bump_version('equipment'))
+        events.stock_changed(deltas)
+
+
+def merge(*changes):
+    total = defaultdict(lambda: [0, 0])
+    for change in changes:
+        for equipment_id, (reserved_pending, on_loan) in change.items():
+            total[equipment_id][0] += reserved_pending
+            total[equipment_id][1] += on_loan
+    return {equipment_id: tuple(delta) for equipment_id, delta in total.items()}
+
+
+def compute(equipment_ids=None):
+    """Counts from the requests and loans themselves: {equipment_id: (reserved_pending, on_loan)}."""
+    pending = EquipmentRequest.objects.filter(status=PENDING)
+    loans = UsageRecord.objects.open()
+    if equipment_ids is not None:
+        pending = pending.filter(equipment_id__in=equipment_ids)
+        loans = loans.filter(equipment_id__in=equipment_ids)
+    counts = defaultdict(lambda: [0, 0])
+    for equipment_id, units in pending.order_by().values_list('equipment_id').annotate(Sum('quantity')):
+        counts[equipment_id][0] = units
+    for equipment_id, units in loans.order_by().values_list('equipment_id').annotate(Sum('quantity_used')):
+        counts[equipment_id][1] = units
+    return {equipment_id: tuple(count) for equipment_id, count in counts.items()}
+
+
+def rebuild(equipment_ids=None):
+    """Recounts the rows of `equipment_ids` (every item when None); returns how many were written."""
+    with transaction.atomic():
+        rows = EquipmentAvailability.objects.all()
+        items = Equipment.objects.all()
+        if equipment_ids is not None:
+            rows = rows.filter(equipment_id__in=equipment_ids)
+            items = items.filter(id__in=equipment_ids)
+        rows.delete()
+        counts = compute(equipment_ids)
+        created = EquipmentAvailability.objects.bulk_create([
+            EquipmentAvailability(equipment_id=equipment_id, reserved_pending=reserved_pending, on_loan=on_loan)
+            for equipment_id in items.values_list('id', flat=True).iterator()
+            for reserved_pending, on_loan in [counts.get(equipment_id, (0, 0))]
+        ], batch_size=5000)
+    return len(created)
+
+
+def find_drift():
+    """{equipment_id: (stored, actual)} for every item whose counts disagree with a recount."""
+    stored = {row[0]: row[1:] for row in EquipmentAvailability.objects.values_list(
+        'equipment_id', 'reserved_pending', 'on_loan')}
+    actual = compute()
+    return {
+        equipment_id: (stored.get(equipment_id, (0, 0)), actual.get(equipment_id, (0, 0)))
+        for equipment_id in set(stored) | set(actual)
+        if stored.get(equipment_id, (0, 0)) != actual.get(equipment_id, (0, 0))
+    }
@@ -0,0 +1,472 @@
+"""
+Pre-aggregated loan analytics, so the analytics dashboard and API never
+scan UsageRecord.
+
+EquipmentRollup (per item) and CategoryRollup (per category) hold one row
+per time bucket:
+
+  loans, units_borrowed     loans that started in the bucket (borrowed_on)
+  returns, loan_days,       loans returned in the bucket: how many, their
+  overdue_returns,          summed length in days, how many came back late
+  damaged, penalty_total    or damaged, and the penalties charged
+  unit_days                 units on loan, summed over the bucket's days
+  capacity_days             units owned (stock + on loan), summed likewise;
+                            item rows only count the days it had units out
+  active_days               days the item had units out (item rows only)
+
+Maintenance:
+  - every UsageRecord save/delete moves its contribution between day rows
+    (signals.py, apply_change), so loans and returns show up immediately;
+  - close_days(), nightly, fills unit/capacity/active days of each day since
+    its last run from the open loans and the returned_on index;
+  - compact() merges whole weeks of day rows older than ROLLUP_DAY_RETENTION
+    days into week rows, and whole months of week rows older than
+    ROLLUP_WEEK_RETENTION days into month rows (a week counts towards the
+    month it starts in), so three years are ~35 rows per item and category;
+  - move_items() takes an item's history out of its category's rows when
+    the item is deleted, or moves it to the new category's rows when it
+    changes category (signals.py, importer.py). Category rows thus always
+    count the loans of the items now in the category, which is what
+    rebuild() recomputes and find_drift() checks. capacity_days, owned
+    stock per day, is left as it was;
+  - rebuild() recomputes everything from UsageRecord.
+
+Range queries count the buckets that start inside the range.
+`manage.py compact_rollups` runs close + compact, or --rebuild.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import CategoryRollup, Equipment, EquipmentRollup, ScanCheckpoint, UsageRecord
+
+
+EVENT_FIELDS = ('loans', 'units_borrowed', 'returns', 'loan_days', 'overdue_returns', 'damaged', 'penalty_total')
+CLOSE_FIELDS = ('unit_days', 'capacity_days', 'active_days')
+METRICS = EVENT_FIELDS + CLOSE_FIELDS
+# category rows hold the sum of their items' rows for these
+ITEM_FIELDS = EVENT_FIELDS + ('unit_days',)
+
+# what apply_change() needs to know about a UsageRecord
+RECORD_FIELDS = ('equipment_id', 'quantity_used', 'borrowed_on', 'due_date', 'returned_on',
+                 'is_damaged', 'penalty_amount')
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def bucket_start(period, day):
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def cutoffs(today):
+    """Day rows before the first date are weeks, week rows before the second are months."""
+    day_cutoff = bucket_start('week', today - datetime.timedelta(days=setting('ROLLUP_DAY_RETENTION', 90)))
+    week_cutoff = bucket_start('month', today - datetime.timedelta(days=setting('ROLLUP_WEEK_RETENTION', 365)))
+    return day_cutoff, min(week_cutoff, day_cutoff)
+
+
+# ---------------------------------------------------------------------------
+# Incremental maintenance
+# ---------------------------------------------------------------------------
+
+def contribution(state):
+    """{day: {metric: value}} that one loan adds to its item's day rows."""
+    if state is None:
+        return {}
+    result = defaultdict(dict)
+    result[state['borrowed_on']] = {'loans': 1, 'units_borrowed': state['quantity_used']}
+    returned_on = state['returned_on']
+    if returned_on:
+        due_date = state['due_date']
+        result[returned_on].update({
+            'returns': 1,
+            'loan_days': (returned_on - state['borrowed_on']).days,
+            'overdue_returns': int(bool(due_date) and returned_on > due_date),
+            'damaged': int(bool(state['is_damaged'])),
+            'penalty_total': Decimal(state['penalty_amount'] or 0),
+        })
+    return result
+
+
+def record_state(record):
+    return {field: getattr(record, field) for field in RECORD_FIELDS}
+
+
+def apply_change(old, new):
+    """
+    Moves the rollups from the `old` to the `new` state of one record
+    (dicts of RECORD_FIELDS; None for "didn't exist" / "was deleted").
+    """
+    apply_many([(old, new)])
+
+
+def apply_many(changes):
+    """apply_change() for many records at once: two UPDATEs per day touched, per table."""
+    deltas = defaultdict(lambda: defaultdict(dict))  # day -> equipment_id -> metric -> delta
+    for old, new in changes:
+        for sign, state in ((-1, old), (1, new)):
+            for day, metrics in contribution(state).items():
+                per_item = deltas[day][state['equipment_id']]
+                for field, value in metrics.items():
+                    per_item[field] = per_item.get(field, 0) + sign * value
+    if not deltas:
+        return
+    equipment_ids = {equipment_id for per_day in deltas.values() for equipment_id in per_day}
+    categories = dict(Equipment.objects.filter(id__in=equipment_ids).values_list('id', 'category_id'))
+
+    for day, per_item in deltas.items():
+        per_category = defaultdict(dict)
+        for equipment_id, metrics in per_item.items():
+            if equipment_id not in categories:
+                continue  # item deleted; its rows went with it
+            totals = per_category[categories[equipment_id]]
+            for field, value in metrics.items():
+                totals[field] = totals.get(field, 0) + value
+        _add(EquipmentRollup, 'equipment_id', day, {k: v for k, v in per_item.items() if k in categories})
+        _add(CategoryRollup, 'category_id', day, per_category)
+
+
+def move_items(moves):
+    """
+    Moves the history of items to other categories: {equipment_id: (old
+    category id, new category id)}; a new category of None takes it out
+    (the item is being deleted). Two UPDATEs per bucket touched.
+    """
+    moves = {equipment_id: pair for equipment_id, pair in moves.items() if pair[0] != pair[1]}
+    if not moves:
+        return
+    deltas = defaultdict(lambda: defaultdict(dict))  # (period, start) -> category -> metric -> delta
+    rows = EquipmentRollup.objects.filter(equipment_id__in=list(moves)).values_list(
+        'equipment_id', 'period', 'start', *ITEM_FIELDS)
+    for equipment_id, period, start, *values in rows:
+        old, new = moves[equipment_id]
+        for sign, category in ((-1, old), (1, new)):
+            if category is None:
+                continue
+            totals = deltas[(period, start)][category]
+            for field, value in zip(ITEM_FIELDS, values):
+                totals[field] = totals.get(field, 0) + sign * value
+    for (period, start), per_category in deltas.items():
+        _add(CategoryRollup, 'category_id', start, per_category, period=period)
+
+
+def _add(model, key_field, day, deltas, period='day'):
+    """
+    Adds {key: {metric: delta}} to the `period` rows starting on `day`. Missing rows are
+    created empty first (racing creators are ignored), then one UPDATE adds
+    every delta with F(), so concurrent writers never lose an increment.
+    """
+    deltas = {key: {f: v for f, v in metrics.items() if v} for key, metrics in deltas.items()}
+    deltas = {key: metrics for key, metrics in deltas.items() if metrics}
+    if not deltas:
+        return
+    model.objects.bulk_create(
+        [model(period=period, start=day, **{key_field: key}) for key in deltas], ignore_conflicts=True,
+    )
+    changes = {}
+    for field in {f for metrics in deltas.values() for f in metrics}:
+        output_field = model._meta.get_field(field)
+        whens = [When(**{key_field: key}, then=Value(metrics[field], output_field=output_field))
+                 for key, metrics in deltas.items() if field in metrics]
+        changes[field] = F(field) + Case(*whens, default=Value(0, output_field=output_field),
+                                         output_field=output_field)
+    model.objects.filter(period=period, start=day, **{f"{key_field}__in": list(deltas)}).update(**changes)
+
+
+# ---------------------------------------------------------------------------
+# Nightly jobs
+# ---------------------------------------------------------------------------
+
+def _checkpoint():
+    checkpoint, _ = ScanCheckpoint.objects.get_or_create(name='rollup_close')
+    return checkpoint
+
+
+def close_days(today=None):
+    """Fills unit/capacity/active days of every day from the last close up to yesterday."""
+    today = today or timezone.localdate()
+    checkpoint = _checkpoint()
+    day = checkpoint.position or today - ONE_DAY
+    closed = 0
+    while day < today:
+        with transaction.atomic():
+            _close_day(day)
+            checkpoint.position = day + ONE_DAY
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        day += ONE_DAY
+        closed += 1
+    return closed
+
+
+def _close_day(day):
+    units_out = defaultdict(int)
+    # everything borrowed by `day` and not returned before it
+    covering = UsageRecord.objects.filter(borrowed_on__lte=day).order_by()
+    for loans in (covering.open(), covering.filter(returned_on__gte=day)):
+        for equipment_id, units in loans.values('equipment_id').annotate(
+                units=Sum('quantity_used')).values_list('equipment_id', 'units'):
+            units_out[equipment_id] += units
+
+    on_loan_now = dict(UsageRecord.objects.open().order_by().values('equipment_id').annotate(
+        units=Sum('quantity_used')).values_list('equipment_id', 'units'))
+    item_rows, per_category = [], defaultdict(lambda: [0, 0])
+    for equipment_id, category, quantity in Equipment.objects.values_list('id', 'category_id', 'quantity'):
+        capacity = quantity + on_loan_now.get(equipment_id, 0)
+        out = units_out.get(equipment_id, 0)
+        per_category[category][0] += out
+        per_category[category][1] += capacity
+        if out:
+            item_rows.append(EquipmentRollup(equipment_id=equipment_id, period='day', start=day,
+                                             unit_days=out, capacity_days=capacity, active_days=1))
+
+    # close() owns these three fields, so it sets them rather than adding
+    EquipmentRollup.objects.bulk_create(
+        item_rows, batch_size=2000, update_conflicts=True,
+        unique_fields=['equipment', 'period', 'start'], update_fields=list(CLOSE_FIELDS),
+    )
+    CategoryRollup.objects.bulk_create(
+        [CategoryRollup(category_id=category, period='day', start=day, unit_days=out, capacity_days=capacity)
+         for category, (out, capacity) in per_category.items()],
+        update_conflicts=True, unique_fields=['category', 'period', 'start'], update_fields=list(CLOSE_FIELDS),
+    )
+
+
+def compact(today=None):
+    """Merges old day rows into weeks and old week rows into months; returns rows removed."""
+    day_cutoff, week_cutoff = cutoffs(today or timezone.localdate())
+    removed = 0
+    for model, key_field in ((EquipmentRollup, 'equipment_id'), (CategoryRollup, 'category_id')):
+        removed += _merge(model, key_field, 'day', 'week', day_cutoff)
+        removed += _merge(model, key_field, 'week', 'month', week_cutoff)
+    return removed
+
+
+def _merge(model, key_field, source, target, cutoff):
+    trunc = TruncWeek if target == 'week' else TruncMonth
+    with transaction.atomic():
+        rows = model.objects.filter(period=source, start__lt=cutoff)
+        # lock what is merged; rows created meanwhile have higher ids and wait for the next run
+        max_id = max(rows.select_for_update().values_list('id', flat=True), default=None)
+        if max_id is None:
+            return 0
+        rows = rows.filter(id__lte=max_id)
+        sums = {}
+        for start, key, *values in (
+                rows.annotate(bucket=trunc('start')).values('bucket', key_field)
+                .annotate(*[Sum(f) for f in METRICS])
+                .values_list('bucket', key_field, *[f"{f}__sum" for f in METRICS])):
+            sums[(start, key)] = {field: value or 0 for field, value in zip(METRICS, values)}
+
+        existing = {
+            (row.start, getattr(row, key_field)): row
+            for row in model.objects.select_for_update().filter(period=target, start__lt=cutoff)
+        }
+        created, updated = [], []
+        for (start, key), metrics in sums.items():
+            row = existing.get((start, key))
+            if row is None:
+                created.append(model(period=target, start=start, **{key_field: key}, **metrics))
+            else:
+                for field, value in metrics.items():
+                    setattr(row, field, getattr(row, field) + value)
+                updated.append(row)
+        model.objects.bulk_create(created, batch_size=2000)
+        model.objects.bulk_update(updated, list(METRICS), batch_size=2000)
+        return rows.delete()[0]
+
+
+def rebuild(today=None):
+    """Recomputes every rollup from UsageRecord, straight into the right buckets."""
+    today = today or timezone.localdate()
+    day_cutoff, week_cutoff = cutoffs(today)
+
+    def bucket(day):
+        period = 'day' if day >= day_cutoff else 'week' if day >= week_cutoff else 'month'
+        return period, bucket_start(period, day)
+
+    equipment = {equipment_id: [category, quantity] for equipment_id, category, quantity
+                 in Equipment.objects.values_list('id', 'category_id', 'quantity')}
+    items = defaultdict(lambda: dict.fromkeys(METRICS, 0))  # (equipment_id, period, start)
+    changes = defaultdict(lambda: defaultdict(int))  # equipment_id -> day -> units out delta
+    first_day = today
+
+    records = UsageRecord.objects.order_by().values_list(*RECORD_FIELDS)
+    for values in records.iterator(chunk_size=5000):
+        state = dict(zip(RECORD_FIELDS, values))
+        equipment_id = state['equipment_id']
+        for day, metrics in contribution(state).items():
+            row = items[(equipment_id, *bucket(day))]
+            for field, value in metrics.items():
+                row[field] += value
+        # units are out from borrowed_on through returned_on (or still out)
+        changes[equipment_id][state['borrowed_on']] += state['quantity_used']
+        if state['returned_on']:
+            changes[equipment_id][state['returned_on'] + ONE_DAY] -= state['quantity_used']
+        else:
+            equipment[equipment_id][1] += state['quantity_used']  # capacity = stock + on loan
+        first_day = min(first_day, state['borrowed_on'])
+
+    # closed days only, like close_days(): today is closed tomorrow
+    for equipment_id, deltas in changes.items():
+        capacity = equipment[equipment_id][1]
+        out, day = 0, min(deltas)
+        while day < today:
+            out += deltas.get(day, 0)
+            if out:
+                row = items[(equipment_id, *bucket(day))]
+                row['unit_days'] += out
+                row['capacity_days'] += capacity
+                row['active_days'] += 1
+            day += ONE_DAY
+
+    categories = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for (equipment_id, period, start), metrics in items.items():
+        row = categories[(equipment[equipment_id][0], period, start)]
+        for field in ITEM_FIELDS:
+            row[field] += metrics[field]
+    # category capacity counts every item on every closed day, idle or not
+    days_per_bucket = defaultdict(int)
+    day = first_day
+    while day < today:
+        days_per_bucket[bucket(day)] += 1
+        day += ONE_DAY
+    category_capacity = defaultdict(int)
+    for category, capacity in equipment.values():
+        category_capacity[category] += capacity
+    for category, capacity in category_capacity.items():
+        for (period, start), days in days_per_bucket.items():
+            categories[(category, period, start)]['capacity_days'] = capacity * days
+
+    with transaction.atomic():
+        EquipmentRollup.objects.all().delete()
+        CategoryRollup.objects.all().delete()
+        EquipmentRollup.objects.bulk_create(
+            (EquipmentRollup(equipment_id=equipment_id, period=period, start=start, **metrics)
+             for (equipment_id, period, start), metrics in items.items()), batch_size=2000)
+        CategoryRollup.objects.bulk_create(
+            (CategoryRollup(category_id=category, period=period, start=start, **metrics)
+             for (category, period, start), metrics in categories.items()), batch_size=2000)
+        checkpoint = _checkpoint()
+        checkpoint.position = today
+        checkpoint.save(update_fields=['position', 'updated_at'])
+    return len(items) + len(categories)
+
+
+# ---------------------------------------------------------------------------
+# Queries: the dashboard and API read only these
+# ---------------------------------------------------------------------------
+
+def _sums():
+    return {field: Sum(field) for field in METRICS}
+
+
+def _ratio(numerator, denominator):
+    return float(numerator) / float(denominator) if denominator else None
+
+
+def with_rates(row, days=None):
+    row = {key: (value or 0) if key in METRICS else value for key, value in row.items()}
+    row['avg_loan_days'] = _ratio(row['loan_days'], row['returns'])
+    row['overdue_rate'] = _ratio(row['overdue_returns'], row['returns'])
+    row['damage_rate'] = _ratio(row['damaged'], row['returns'])
+    if days and row['active_days']:
+        # an item only has capacity recorded on days it was in use: spread its average over the range
+        row['utilization'] = _ratio(row['unit_days'], row['capacity_days'] / row['active_days'] * days)
+    else:
+        row['utilization'] = _ratio(row['unit_days'], row['capacity_days'])
+    return row
+
+
+def totals(start, end):
+    return with_rates(CategoryRollup.objects.filter(start__gte=start, start__lt=end).aggregate(**_sums()))
+
+
+def category_summary(start, end):
+    rows = (CategoryRollup.objects.filter(start__gte=start, start__lt=end)
+            .values('category_id', 'category__name').annotate(**_sums()).order_by('category__name'))
+    return [with_rates(row) for row in rows]
+
+
+def trend(start, end, category=None):
+    """One row per bucket in the range, of one category id or all; buckets get coarser the older they are."""
+    rows = CategoryRollup.objects.filter(start__gte=start, start__lt=end)
+    if category:
+        rows = rows.filter(category_id=category)
+    return [with_rates(row) for row in
+            rows.values('period', 'start').annotate(**_sums()).order_by('start', 'period')]
+
+
+def top_equipment(start, end, limit=20):
+    """Items with the most unit-days in the range: ranked on the covering index, then summed."""
+    in_range = EquipmentRollup.objects.filter(start__gte=start, start__lt=end)
+    ranked = list(in_range.values('equipment_id').annotate(total=Sum('unit_days'))
+                  .order_by('-total', 'equipment_id').values_list('equipment_id', flat=True)[:limit])
+    rows = {row['equipment_id']: row for row in
+            in_range.filter(equipment_id__in=ranked)
+            .values('equipment_id', 'equipment__name', 'equipment__category__name').annotate(**_sums())}
+    days = (end - start).days
+    return [with_rates(rows[equipment_id], days) for equipment_id in ranked]
+
+
+RANGE_PRESETS = (30, 90, 365, 1095)
+
+
+def parse_range(params, today=None):
+    """(start, end) from ?start=&end= (end inclusive) or ?days= (default 90), ending today."""
+    today = today or timezone.localdate()
+    try:
+        start = datetime.date.fromisoformat(params.get('start', ''))
+        end = datetime.date.fromisoformat(params.get('end', '')) + ONE_DAY
+        if start < end:
+            return start, end
+    except ValueError:
+        pass
+    days = params.get('days', '')
+    days = min(int(days), 3660) if days.isdigit() and int(days) > 0 else 90
+    return today + ONE_DAY - datetime.timedelta(days=days), today + ONE_DAY
+
+
+def report(start, end, category=None, limit=20):
+    return {
+        'start': start,
+        'end': end,
+        'totals': totals(start, end),
+        'categories': category_summary(start, end),
+        'trend': trend(start, end, category),
+        'top_equipment': top_equipment(start, end, limit),
+    }
+
+
+def find_drift():
+    """Event metrics that disagree with a fresh count, per category: {category id: {field: (stored, actual)}}."""
+    actual = defaultdict(lambda: defaultdict(int))
+    categories = dict(Equipment.objects.values_list('id', 'category_id'))
+    for values in UsageRecord.objects.order_by().values_list(*RECORD_FIELDS).iterator(chunk_size=5000):
+        state = dict(zip(RECORD_FIELDS, values))
+        for metrics in contribution(state).values():
+            for field, value in metrics.items():
+                actual[categories[state['equipment_id']]][field] += value
+    stored = {row['category_id']: row for row in
+              CategoryRollup.objects.values('category_id').annotate(**{f: Sum(f) for f in EVENT_FIELDS})}
+    drift = {}
+    for category in set(actual) | set(stored):
+        diffs = {field: ((stored.get(category) or {}).get(field) or 0, actual[category][field])
+                 for field in EVENT_FIELDS}
+        diffs = {field: pair for field, pair in diffs.items() if pair[0] != pair[1]}
+        if diffs:
+            drift[category] = diffs
+    return drift
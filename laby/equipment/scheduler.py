@@ -0,0 +1,259 @@
+"""
+Overdue-loan scanner, run by `manage.py run_scheduler`.
+
+Every pass:
+  1. scan_overdue     opens an OverdueNotice + "Overdue" Alert for each loan
+                      that went overdue since the previous pass. Only due
+                      dates between the stored checkpoint and today are read
+                      (partial index usage_open_due_idx), so a pass costs
+                      O(newly overdue loans), not O(all loans).
+                      An item's overdue loans share its one "Overdue" alert.
+  2. close_returned   closes notices of loans since returned, and their
+                      alert once no open notice of the item is left.
+  3. accrue_penalties once a day, penalty_amount = days overdue x quantity x rate.
+  4. queue_reminders  hands due reminder emails to the in-process MailWorker.
+  5. alerts           writes coalesced alert repeats held in memory and
+                      re-syncs low-stock alerts (equipment/alerts.py).
+  6. catalogue        prunes the catalogue change log (equipment/catalogue.py).
+  7. audit            takes an audit checkpoint once enough events piled up
+                      (equipment/audit.py).
+
+Settings: OVERDUE_SCAN_INTERVAL (seconds), OVERDUE_SCAN_BATCH_SIZE,
+OVERDUE_PENALTY_PER_DAY, OVERDUE_REMINDER_EVERY_DAYS.
+"""
+import datetime
+import logging
+import queue
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.utils import timezone
+
+from . import alerts, audit, catalogue
+from .caching import bump_version
+from .models import Alert, OverdueNotice, ScanCheckpoint, UsageRecord
+
+
+logger = logging.getLogger(__name__)
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _checkpoint(name):
+    checkpoint, _ = ScanCheckpoint.objects.get_or_create(name=name)
+    return checkpoint
+
+
+def scan_overdue(today, batch_size=500, full=False):
+    """Opens notices for loans due in [checkpoint, today); returns how many."""
+    checkpoint = _checkpoint('overdue_scan')
+    candidates = UsageRecord.objects.open().filter(due_date__lt=today, overdue_notice__isnull=True)
+    if checkpoint.position and not full:
+        candidates = candidates.filter(due_date__gte=checkpoint.position)
+    candidates = candidates.select_related('user', 'equipment').only(
+        'due_date', 'quantity_used', 'user__username', 'equipment__name', 'equipment_id',
+    ).order_by('due_date', 'id')
+
+    opened, last = 0, None
+    while True:
+        page = candidates
+        if last:
+            # keyset over (due_date, id): no OFFSET, no re-reading earlier rows
+            page = page.filter(due_date__gte=last[0]).exclude(due_date=last[0], id__lte=last[1])
+        batch = list(page[:batch_size])
+        if not batch:
+            break
+        opened += _open_notices(batch, today)
+        last = (batch[-1].due_date, batch[-1].id)
+
+    checkpoint.position = today
+    checkpoint.save(update_fields=['position', 'updated_at'])
+    return opened
+
+
+def _open_notices(records, today):
+    """Opens a notice per loan and alerts it; returns how many were opened here."""
+    try:
+        with transaction.atomic():
+            _open_batch(records, today)
+        return len(records)
+    except IntegrityError:
+        pass
+    # another scanner opened some of them: one at a time, skipping those it has
+    opened = 0
+    for record in records:
+        try:
+            with transaction.atomic():
+                _open_batch([record], today)
+            opened += 1
+        except IntegrityError:
+            if not OverdueNotice.objects.filter(usage_record_id=record.id).exists():
+                raise
+    return opened
+
+
+def _open_batch(records, today):
+    alert_ids = alerts.raise_many(Alert.OVERDUE, [
+        (record.equipment_id, f"{record.user.username} has {record.quantity_used} x "
+                              f"{record.equipment.name} overdue since {record.due_date}")
+        for record in records
+    ])
+    OverdueNotice.objects.bulk_create([
+        OverdueNotice(usage_record=record, alert_id=alert_ids[record.equipment_id],
+                      overdue_since=record.due_date, next_reminder_on=today)
+        for record in records
+    ])
+
+
+def close_returned(today):
+    """Closes open notices whose loan has been returned and retires their alerts."""
+    notices = OverdueNotice.objects.filter(closed_on__isnull=True, usage_record__returned_on__isnull=False)
+    with transaction.atomic():
+        alert_ids = list(notices.filter(alert__is_active=True).values_list('alert_id', flat=True).distinct())
+        closed = notices.update(closed_on=today)
+        if alert_ids:
+            # excludes alerts that still cover another open notice of the item
+            alerts.resolve(Alert.objects.filter(id__in=alert_ids)
+                           .exclude(overduenotice__closed_on__isnull=True))
+    return closed
+
+
+def accrue_penalties(today, rate):
+    """
+    Sets penalty_amount on every open overdue loan, at most once a day.
+    One UPDATE per distinct due date, since the day count is constant within it.
+    """
+    checkpoint = _checkpoint('penalty_accrual')
+    if not rate or checkpoint.position == today:
+        return 0
+    overdue = UsageRecord.objects.open().filter(due_date__lt=today)
+    updated = 0
+    with transaction.atomic():
+        for due_date in overdue.order_by().values_list('due_date', flat=True).distinct():
+            per_unit = Decimal(rate) * (today - due_date).days
+            updated += overdue.filter(due_date=due_date).update(penalty_amount=ExpressionWrapper(
+                F('quantity_used') * Value(per_unit),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ))
+        checkpoint.position = today
+        checkpoint.save(update_fields=['position', 'updated_at'])
+        if updated:
+            transaction.on_commit(lambda: bump_version('usagerecord'))
+    return updated
+
+
+def reminder_message(notice, today):
+    record = notice.usage_record
+    days = (today - record.due_date).days
+    return EmailMessage(
+        subject=f"Overdue: {record.equipment.name}",
+        body=(
+            f"Hello {record.user.username},\n\n"
+            f"{record.quantity_used} x {record.equipment.name} borrowed on {record.borrowed_on} "
+            f"was due back on {record.due_date} ({days} day{'s' if days != 1 else ''} ago).\n"
+            f"Penalty accrued so far: Rs. {record.penalty_amount}.\n\n"
+            "Please return it to the lab as soon as possible.\n"
+        ),
+        to=[record.user.email],
+    )
+
+
+def queue_reminders(today, worker, batch_size=500, every_days=3):
+    """
+    Hands every due reminder to `worker`. A notice is moved to its next
+    reminder date as it is queued; the worker puts it back if sending fails.
+    """
+    due = OverdueNotice.objects.filter(
+        closed_on__isnull=True, next_reminder_on__lte=today,
+    ).select_related('usage_record__user', 'usage_record__equipment').order_by('id')
+    next_date = today + datetime.timedelta(days=every_days)
+    queued = 0
+    while True:
+        batch = list(due[:batch_size])
+        if not batch:
+            break
+        ids = [notice.id for notice in batch]
+        OverdueNotice.objects.filter(id__in=ids).update(
+            next_reminder_on=next_date, reminders_sent=F('reminders_sent') + 1,
+        )
+        for notice in batch:
+            if notice.usage_record.user.email:
+                worker.submit(notice.id, reminder_message(notice, today))
+                queued += 1
+    return queued
+
+
+class MailWorker(threading.Thread):
+    """
+    Sends queued emails in the background so a slow mail server never holds
+    up the scan loop. No broker: the queue lives in this process, and
+    stop() drains it before returning.
+    """
+
+    def __init__(self, batch_size=50):
+        super().__init__(name='laby-mail', daemon=True)
+        self.queue = queue.Queue()
+        self.batch_size = batch_size
+        self.sent = 0
+        self.failed = 0
+
+    def submit(self, notice_id, message):
+        self.queue.put((notice_id, message))
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+    def run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._send(batch)
+                        return
+                    batch.append(item)
+                self._send(batch)
+        finally:
+            connection.close()
+
+    def _send(self, batch):
+        try:
+            # one SMTP session per batch
+            get_connection(fail_silently=False).send_messages([message for _, message in batch])
+            self.sent += len(batch)
+        except Exception:
+            logger.exception("Sending %d reminder(s) failed; they will be retried next pass", len(batch))
+            self.failed += len(batch)
+            close_old_connections()
+            OverdueNotice.objects.filter(id__in=[notice_id for notice_id, _ in batch]).update(
+                next_reminder_on=timezone.localdate(), reminders_sent=F('reminders_sent') - 1,
+            )
+
+
+def run_pass(today, worker, batch_size=None, full=False):
+    """One scheduler pass; returns what each step did."""
+    batch_size = batch_size or setting('OVERDUE_SCAN_BATCH_SIZE', 500)
+    return {
+        'opened': scan_overdue(today, batch_size, full=full),
+        'closed': close_returned(today),
+        'penalised': accrue_penalties(today, setting('OVERDUE_PENALTY_PER_DAY', Decimal('0'))),
+        'reminders': queue_reminders(today, worker, batch_size,
+                                     setting('OVERDUE_REMINDER_EVERY_DAYS', 3)),
+        'coalesced': alerts.flush_pending(),
+        'low_stock': sum(alerts.sync_low_stock()),
+        'catalogue_pruned': catalogue.prune(today),
+        'audit_checkpointed': audit.maybe_checkpoint(),
+    }
@@ -0,0 +1,183 @@
+"""
+Ranked equipment search over name, description, category and location.
+
+The backend is picked from the database vendor (SQLite FTS5, PostgreSQL
+tsvector + GIN) or forced with settings.EQUIPMENT_SEARCH_BACKEND (a dotted
+path). Anything else falls back to icontains matching.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+def tokenize(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+
+class SearchBackend:
+    """Base/fallback backend: unranked icontains on every searchable column."""
+
+    def filter(self, queryset, text):
+        for token in tokenize(text):
+            queryset = queryset.filter(
+                Q(name__icontains=token) | Q(description__icontains=token)
+                | Q(category__name__icontains=token) | Q(location__name__icontains=token)
+            )
+        return queryset
+
+    def index(self, equipment):
+        pass
+
+    def reindex(self, equipment_ids):
+        pass
+
+    def remove(self, equipment_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    FTS5 virtual table `equipment_search` (rowid = equipment id), created in
+    migration 0012 and kept in sync by equipment.signals.
+    """
+    table = 'equipment_search'
+    # bm25 column weights: name, description, category, location
+    weights = (10.0, 2.0, 4.0, 3.0)
+
+    def match_query(self, text):
+        # every token must match, each as a prefix: "osc"* "lab"*
+        return ' '.join(f'"{token}"*' for token in tokenize(text))
+
+    def filter(self, queryset, text):
+        query = self.match_query(text)
+        if not query:
+            return queryset
+        weights = ', '.join(str(w) for w in self.weights)
+        # a plain join against the FTS table: one MATCH per search, ranked by bm25
+        return queryset.extra(
+            tables=[self.table],
+            where=[f"{self.table}.rowid = {queryset.model._meta.db_table}.id",
+                   f"{self.table} MATCH %s"],
+            params=[query],
+            select={'search_rank': f"bm25({self.table}, {weights})"},
+        ).order_by('search_rank', 'id')  # bm25: lower is better
+
+    # category and location names come from their lookup tables
+    select = (
+        "SELECT e.id, e.name, e.description, c.name, l.name FROM equipment_equipment e "
+        "JOIN equipment_category c ON c.id = e.category_id JOIN equipment_location l ON l.id = e.location_id"
+    )
+
+    def index(self, equipment):
+        self.reindex([equipment.pk])
+
+    def reindex(self, equipment_ids):
+        ids = list(equipment_ids)
+        with connection.cursor() as cursor:
+            # in chunks that stay under SQLite's bound-parameter limit
+            for offset in range(0, len(ids), 500):
+                chunk = ids[offset:offset + 500]
+                marks = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({marks})", chunk)
+                cursor.execute(
+                    f"INSERT INTO {self.table} (rowid, name, description, category, location) "
+                    f"{self.select} WHERE e.id IN ({marks})", chunk,
+                )
+
+    def remove(self, equipment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [equipment_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(f"INSERT INTO {self.table} (rowid, name, description, category, location) {self.select}")
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+            cursor.execute(f"SELECT count(*) FROM {self.table}")
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Weighted tsvector per item in the side table `equipment_search`
+    (migration 0026), GIN indexed and kept in sync by equipment.signals.
+    It replaced an expression index on equipment_equipment once category
+    and location names moved to lookup tables.
+    """
+    table = 'equipment_search'
+    document = (
+        "setweight(to_tsvector('simple', coalesce(e.name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(c.name, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(l.name, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(e.description, '')), 'C')"
+    )
+    select = (
+        f"SELECT e.id, {document} FROM equipment_equipment e "
+        "JOIN equipment_category c ON c.id = e.category_id JOIN equipment_location l ON l.id = e.location_id"
+    )
+
+    def ts_query(self, text):
+        return ' & '.join(f"{token}:*" for token in tokenize(text))
+
+    def filter(self, queryset, text):
+        query = self.ts_query(text)
+        if not query:
+            return queryset
+        return queryset.extra(
+            tables=[self.table],
+            where=[f"{self.table}.equipment_id = {queryset.model._meta.db_table}.id",
+                   f"{self.table}.document @@ to_tsquery('simple', %s)"],
+            params=[query],
+            select={'search_rank': f"ts_rank({self.table}.document, to_tsquery('simple', %s))"},
+            select_params=[query],
+        ).order_by('-search_rank', 'id')
+
+    def index(self, equipment):
+        self.reindex([equipment.pk])
+
+    def reindex(self, equipment_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.table} (equipment_id, document) {self.select} WHERE e.id = ANY(%s) "
+                "ON CONFLICT (equipment_id) DO UPDATE SET document = EXCLUDED.document",
+                [list(equipment_ids)],
+            )
+
+    def remove(self, equipment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE equipment_id = %s", [equipment_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+            cursor.execute(f"INSERT INTO {self.table} (equipment_id, document) {self.select}")
+            cursor.execute(f"SELECT count(*) FROM {self.table}")
+            return cursor.fetchone()[0]
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def _backend_for(vendor, dotted_path):
+    if dotted_path:
+        return import_string(dotted_path)()
+    return VENDOR_BACKENDS.get(vendor, SearchBackend)()
+
+
+def get_search_backend():
+    return _backend_for(connection.vendor, getattr(settings, 'EQUIPMENT_SEARCH_BACKEND', None))
+
+
+def search_equipment(queryset, text):
+    return get_search_backend().filter(queryset, text)
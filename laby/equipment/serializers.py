@@ -0,0 +1,74 @@
+from rest_framework import serializers
+
+from .models import Alert, AuditEvent, Equipment, EquipmentRequest, UsageRecord
+
+
+class FieldSelectionMixin:
+    """
+    Lets clients ask for a subset of fields with ?fields=id,name,quantity.
+    Unknown names are ignored; no ?fields= returns everything.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request else None
+        if requested:
+            keep = {name.strip() for name in requested.split(',')}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+class EquipmentSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    # names for display; the *_id fields are what ?category= / ?location= / ?condition= filter on
+    category = serializers.CharField(source='category.name')
+    location = serializers.CharField(source='location.name')
+    condition = serializers.CharField(source='condition.name')
+    category_id = serializers.IntegerField()
+    location_id = serializers.IntegerField()
+    condition_id = serializers.IntegerField()
+
+    class Meta:
+        model = Equipment
+        fields = ['id', 'name', 'category', 'category_id', 'quantity', 'location', 'location_id', 'condition',
+                  'condition_id', 'added_on', 'description', 'datasheet', 'image']
+
+
+class UsageRecordSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    user = serializers.CharField(source='user.username')
+    equipment_name = serializers.CharField(source='equipment.name')
+    approved_by = serializers.CharField(source='approved_by.username', default=None)
+    collected_by = serializers.CharField(source='collected_by.username', default=None)
+
+    class Meta:
+        model = UsageRecord
+        fields = ['id', 'user', 'equipment', 'equipment_name', 'quantity_used', 'borrowed_on',
+                  'due_date', 'returned_on', 'is_damaged', 'damage_report', 'penalty_amount',
+                  'approved_by', 'collected_by']
+
+
+class EquipmentRequestSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    user = serializers.CharField(source='user.username')
+    equipment_name = serializers.CharField(source='equipment.name')
+
+    class Meta:
+        model = EquipmentRequest
+        fields = ['id', 'user', 'equipment', 'equipment_name', 'quantity', 'purpose',
+                  'status', 'requested_at', 'processed_at']
+
+
+class AlertSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    equipment_name = serializers.CharField(source='equipment.name')
+
+    class Meta:
+        model = Alert
+        fields = ['id', 'equipment', 'equipment_name', 'type', 'message', 'occurrences', 'created_at',
+                  'last_seen_at', 'is_active']
+
+
+class AuditEventSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    user = serializers.CharField(source='user.username', default=None)
+
+    class Meta:
+        model = AuditEvent
+        fields = ['id', 'model', 'object_id', 'action', 'data', 'user', 'created_at']
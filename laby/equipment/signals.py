@@ -1,31 +1,387 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import UsageRecord, Alert, Equipment
+from .models import (
+    UsageRecord, Alert, Equipment, EquipmentAvailability, Supplier, EquipmentRequest, User,
+    Category, Location, Condition,
+)
+from . import access, alerts, audit, catalogue, events, projection, rollups, stats
+from .caching import bump_version
+from .ledger import StockLedger, stock_changed
+from .search import get_search_backend
 
 @receiver(post_save, sender=UsageRecord)
-def handle_damage_and_alert(sender, instance, created, **kwargs):
-
-    # Create alert only when damage is reported
-    if instance.is_damaged and instance.damage_report:
-        Alert.objects.get_or_create(
-            equipment=instance.equipment,
-            message=f"Damage reported: {instance.damage_report[:100]}...",
-            defaults={"is_active": True}
-        )
-
-    # Auto-deduct inventory if damaged AND not already processed
-    if instance.is_damaged and not instance.damage_processed:
+def handle_damage_and_alert(sender, instance, created, update_fields=None, **kwargs):
 
-        equipment = instance.equipment
-        quantity_to_deduct = instance.quantity_used
+    # Alert once when a loan becomes damaged (stored state from remember_record_state)
+    if instance.is_damaged and _touches(update_fields, 'is_damaged'):
+        previous = instance.__dict__.get('_stats_previous')
+        if created or not (previous and previous['is_damaged']):
+            alerts.raise_alert(instance.equipment_id, Alert.DAMAGED,
+                               (instance.damage_report or "Damage reported during return")[:200])
 
-        if equipment.quantity >= quantity_to_deduct:
-            equipment.quantity -= quantity_to_deduct
-        else:
-            equipment.quantity = 0  # Prevent negative inventory
-
-        equipment.save()
+    # Damage reported after the units were restocked (e.g. edited in the admin):
+    # write them off once. Damaged returns through return_equipment are never
+    # restocked and arrive here already marked as processed.
+    if (instance.is_damaged and not instance.damage_processed
+            and instance.stockmovement_set.filter(reason='return').exists()):
+        StockLedger.apply(instance.equipment_id, -instance.quantity_used, 'damage',
+                          record=instance, clamp=True)
 
         # Mark as processed so deduction doesn't repeat
         instance.damage_processed = True
         instance.save(update_fields=["damage_processed"])
+
+
+# ---------------------------------------------------------------------------
+# Dashboard counters (DashboardStats), updated incrementally
+# ---------------------------------------------------------------------------
+
+def _touches(update_fields, *fields):
+    # a ForeignKey may be named in update_fields as `equipment` or `equipment_id`
+    return update_fields is None or bool(set(fields) & {
+        name for field in update_fields for name in (field, f'{field}_id')})
+
+
+def _remember_previous(instance, update_fields, *fields):
+    """Stash the stored values of `fields` so post_save can compute a delta."""
+    if not _touches(update_fields, *fields):
+        return
+    instance._stats_previous = None
+    if instance.pk and not instance._state.adding:
+        instance._stats_previous = (
+            type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first()
+        )
+
+
+@receiver(post_save, sender=Supplier)
+def count_supplier_added(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(supplier_count=1)
+
+
+@receiver(post_delete, sender=Supplier)
+def count_supplier_removed(sender, instance, **kwargs):
+    stats.bump(supplier_count=-1)
+
+
+@receiver(pre_save, sender=Equipment)
+def remember_equipment_category(sender, instance, update_fields=None, **kwargs):
+    _remember_previous(instance, update_fields, 'category_id')
+
+
+@receiver(post_save, sender=Equipment)
+def count_equipment_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches(update_fields, 'category_id'):
+        return
+    previous = instance.__dict__.get('_stats_previous')
+    if created or previous is None:
+        stats.bump(equipment_count=1)
+        stats.bump_category(instance.category_id, 1)
+    elif previous['category_id'] != instance.category_id:
+        stats.bump_category(previous['category_id'], -1)
+        stats.bump_category(instance.category_id, 1)
+
+
+@receiver(post_delete, sender=Equipment)
+def count_equipment_removed(sender, instance, **kwargs):
+    stats.bump(equipment_count=-1)
+    stats.bump_category(instance.category_id, -1)
+
+
+@receiver(pre_save, sender=UsageRecord)
+def remember_record_state(sender, instance, update_fields=None, **kwargs):
+    # one lookup serves both the counters and the rollups (popped by roll_up_record_saved)
+    _remember_previous(instance, update_fields, *rollups.RECORD_FIELDS)
+
+
+@receiver(post_save, sender=UsageRecord)
+def count_record_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches(update_fields, 'returned_on'):
+        return
+    previous = instance.__dict__.get('_stats_previous')
+    is_open = instance.returned_on is None
+    was_open = previous is not None and previous['returned_on'] is None
+    stats.bump(borrowed_count=int(is_open) - int(was_open))
+
+
+@receiver(post_delete, sender=UsageRecord)
+def count_record_removed(sender, instance, **kwargs):
+    if instance.returned_on is None:
+        stats.bump(borrowed_count=-1)
+
+
+# ---------------------------------------------------------------------------
+# Availability projection (equipment/projection.py), updated in the same transaction
+# ---------------------------------------------------------------------------
+
+PROJECTED_REQUEST_FIELDS = ('equipment_id', 'quantity', 'status')
+
+
+@receiver(post_save, sender=Equipment)
+def add_equipment_availability(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EquipmentAvailability.objects.get_or_create(equipment_id=instance.pk)
+
+
+@receiver(pre_save, sender=EquipmentRequest)
+def remember_request_state(sender, instance, update_fields=None, **kwargs):
+    _remember_previous(instance, update_fields, *PROJECTED_REQUEST_FIELDS)
+
+
+@receiver(post_save, sender=EquipmentRequest)
+def project_request_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches(update_fields, *PROJECTED_REQUEST_FIELDS):
+        return
+    previous = instance.__dict__.pop('_stats_previous', None)
+    current = {field: getattr(instance, field) for field in PROJECTED_REQUEST_FIELDS}
+    projection.apply_many(projection.request_change(None if created else previous, current))
+
+
+def _cascades_from_equipment(origin):
+    # the item's own row goes with it: nothing left to count
+    return isinstance(origin, Equipment) or getattr(origin, 'model', None) is Equipment
+
+
+@receiver(post_delete, sender=EquipmentRequest)
+def project_request_removed(sender, instance, origin=None, **kwargs):
+    if _cascades_from_equipment(origin):
+        return
+    current = {field: getattr(instance, field) for field in PROJECTED_REQUEST_FIELDS}
+    projection.apply_many(projection.request_change(current, None))
+
+
+# runs before roll_up_record_saved, which pops the stored state
+@receiver(post_save, sender=UsageRecord)
+def project_record_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches(update_fields, 'equipment_id', 'quantity_used', 'returned_on'):
+        return
+    previous = instance.__dict__.get('_stats_previous')
+    projection.apply_many(projection.loan_change(None if created else previous, rollups.record_state(instance)))
+
+
+@receiver(post_delete, sender=UsageRecord)
+def project_record_removed(sender, instance, origin=None, **kwargs):
+    if _cascades_from_equipment(origin):
+        return
+    projection.apply_many(projection.loan_change(rollups.record_state(instance), None))
+
+
+# ---------------------------------------------------------------------------
+# Analytics rollups (equipment/rollups.py), updated incrementally
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=UsageRecord)
+def roll_up_record_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches(update_fields, *rollups.RECORD_FIELDS):
+        return
+    previous = instance.__dict__.pop('_stats_previous', None)
+    rollups.apply_change(None if created else previous, rollups.record_state(instance))
+
+
+@receiver(post_delete, sender=UsageRecord)
+def roll_up_record_removed(sender, instance, origin=None, **kwargs):
+    if _cascades_from_equipment(origin):
+        # roll_up_equipment_removed already took the item's whole history out
+        return
+    rollups.apply_change(rollups.record_state(instance), None)
+
+
+# runs after count_equipment_saved, which leaves the stored state for it
+@receiver(post_save, sender=Equipment)
+def roll_up_equipment_moved(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches(update_fields, 'category_id'):
+        return
+    previous = instance.__dict__.pop('_stats_previous', None)
+    if not created and previous is not None:
+        rollups.move_items({instance.pk: (previous['category_id'], instance.category_id)})
+
+
+# before the cascade deletes the item's rollups
+@receiver(pre_delete, sender=Equipment)
+def roll_up_equipment_removed(sender, instance, **kwargs):
+    rollups.move_items({instance.pk: (instance.category_id, None)})
+
+
+@receiver(pre_save, sender=Alert)
+def remember_alert_state(sender, instance, update_fields=None, **kwargs):
+    _remember_previous(instance, update_fields, 'is_active')
+
+
+@receiver(post_save, sender=Alert)
+def count_alert_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches(update_fields, 'is_active'):
+        return
+    previous = instance.__dict__.pop('_stats_previous', None)
+    was_active = previous is not None and previous['is_active']
+    stats.bump(alert_count=int(instance.is_active) - int(was_active))
+
+
+@receiver(post_delete, sender=Alert)
+def count_alert_removed(sender, instance, **kwargs):
+    if instance.is_active:
+        stats.bump(alert_count=-1)
+
+
+# ---------------------------------------------------------------------------
+# Low-stock alerts follow the stock (equipment/alerts.py)
+# ---------------------------------------------------------------------------
+
+@receiver(stock_changed)
+def check_low_stock(sender, equipment_ids, **kwargs):
+    alerts.sync_low_stock(equipment_ids)
+
+
+@receiver(post_save, sender=Equipment)
+def check_low_stock_saved(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, 'quantity'):
+        alerts.sync_low_stock([instance.pk])
+
+
+# ---------------------------------------------------------------------------
+# Live updates for open dashboards (equipment/events.py); no-ops without listeners
+# ---------------------------------------------------------------------------
+
+@receiver(stock_changed)
+def publish_stock(sender, equipment_ids, **kwargs):
+    events.stock_changed(equipment_ids)
+
+
+@receiver(post_save, sender=Equipment)
+def publish_stock_saved(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, 'quantity'):
+        events.stock_changed([instance.pk])
+
+
+@receiver(post_save, sender=Alert)
+def publish_alert(sender, instance, **kwargs):
+    events.alerts_changed([instance.pk])
+
+
+@receiver(post_save, sender=EquipmentRequest)
+def publish_request(sender, instance, **kwargs):
+    events.requests_changed([instance.pk])
+
+
+# ---------------------------------------------------------------------------
+# Catalogue change log behind /api/catalogue/?since= (equipment/catalogue.py)
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+def log_catalogue_change(sender, instance, **kwargs):
+    catalogue.record([instance.pk])
+
+
+@receiver(stock_changed)
+def log_stock_change(sender, equipment_ids, **kwargs):
+    catalogue.record(equipment_ids)
+
+
+# ---------------------------------------------------------------------------
+# Audit log (equipment/audit.py), written when the transaction commits
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_save, sender=UsageRecord)
+@receiver(post_save, sender=EquipmentRequest)
+@receiver(post_save, sender=Alert)
+def audit_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        audit.record_saved(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=Equipment)
+@receiver(post_delete, sender=UsageRecord)
+@receiver(post_delete, sender=EquipmentRequest)
+@receiver(post_delete, sender=Alert)
+def audit_deleted(sender, instance, **kwargs):
+    audit.record_deleted(instance)
+
+
+@receiver(stock_changed)
+def audit_stock(sender, equipment_ids, **kwargs):
+    audit.record_stock(equipment_ids)
+
+
+# ---------------------------------------------------------------------------
+# Authorization kept in the session (equipment/access.py)
+# ---------------------------------------------------------------------------
+
+@receiver(user_logged_in)
+def remember_access(sender, request, user, **kwargs):
+    access.remember(request, user)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_access(sender, instance, **kwargs):
+    # approval, role or password changed: sessions and tokens re-read the user
+    transaction.on_commit(lambda: access.bump_access(instance.pk))
+
+
+# ---------------------------------------------------------------------------
+# Full-text search index
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Equipment)
+def index_equipment(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Equipment)
+def unindex_equipment(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+# ---------------------------------------------------------------------------
+# Cache versions: any change orphans the cached fragments built from the model
+# ---------------------------------------------------------------------------
+
+def _bump_on_commit(name):
+    transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_save, sender=UsageRecord)
+@receiver(post_save, sender=Alert)
+@receiver(post_save, sender=EquipmentRequest)
+@receiver(post_delete, sender=Equipment)
+@receiver(post_delete, sender=UsageRecord)
+@receiver(post_delete, sender=Alert)
+@receiver(post_delete, sender=EquipmentRequest)
+def bump_cache_version(sender, **kwargs):
+    _bump_on_commit(sender._meta.model_name)
+
+
+@receiver(stock_changed)
+def bump_equipment_version(sender, **kwargs):
+    _bump_on_commit('equipment')
+
+
+# ---------------------------------------------------------------------------
+# Lookup tables (equipment/lookups.py): a rename shows on every item using the row
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Condition)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=Condition)
+def bump_lookup_version(sender, **kwargs):
+    _bump_on_commit(sender._meta.model_name)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Condition)
+def rename_lookup(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    equipment_ids = list(instance.equipment.values_list('id', flat=True))
+    if equipment_ids:
+        get_search_backend().reindex(equipment_ids)
+        catalogue.record(equipment_ids)
+        _bump_on_commit('equipment')
@@ -0,0 +1,16 @@
+// Live updates from /events/ (equipment/async_views.py), e.g.
+//   labyLive("/events/", { stock: data => ..., changed: data => ... });
+// Each handler gets the event's JSON data; the browser reconnects by itself.
+function labyLive(url, handlers) {
+  if (!window.EventSource) return null;
+  const source = new EventSource(url);
+  Object.entries(handlers).forEach(([event, handle]) =>
+    source.addEventListener(event, message => handle(JSON.parse(message.data))));
+  return source;
+}
+
+// Shows the page's "reload to see the changes" notice (an element with id="live-reload").
+function labyShowReload() {
+  const notice = document.getElementById('live-reload');
+  if (notice) notice.classList.remove('d-none');
+}
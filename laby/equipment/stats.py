@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Alert, DashboardStats, Equipment, Supplier, UsageRecord
+
+
+def compute_dashboard_stats():
+    """Counts the dashboard numbers from scratch (the slow path)."""
+    category_data = Equipment.objects.values('category_id').annotate(count=Count('id'))
+    return {
+        'supplier_count': Supplier.objects.count(),
+        'equipment_count': Equipment.objects.count(),
+        'borrowed_count': UsageRecord.objects.open().count(),
+        'alert_count': Alert.objects.filter(is_active=True).count(),
+        # JSON object keys are strings, so the ids are stored as such
+        'category_counts': {str(c['category_id']): c['count'] for c in category_data},
+    }
+
+
+def rebuild_dashboard_stats():
+    stats, _ = DashboardStats.objects.update_or_create(
+        pk=DashboardStats.SINGLETON_ID, defaults=compute_dashboard_stats()
+    )
+    return stats
+
+
+def find_drift(stats=None):
+    """Returns {field: (stored, actual)} for every counter that disagrees."""
+    stats = stats or DashboardStats.load()
+    actual = compute_dashboard_stats()
+    return {
+        field: (getattr(stats, field), value)
+        for field, value in actual.items()
+        if getattr(stats, field) != value
+    }
+
+
+def bump(**deltas):
+    """Applies counter deltas in one UPDATE, e.g. bump(borrowed_count=-1)."""
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if changes:
+        DashboardStats.objects.filter(pk=DashboardStats.SINGLETON_ID).update(
+            updated_at=timezone.now(), **changes
+        )
+
+
+def bump_category(category_id, delta):
+    category = str(category_id)
+    with transaction.atomic():
+        stats = (DashboardStats.objects.select_for_update()
+                 .filter(pk=DashboardStats.SINGLETON_ID).first())
+        if stats is None:
+            return
+        count = stats.category_counts.get(category, 0) + delta
+        if count > 0:
+            stats.category_counts[category] = count
+        else:
+            stats.category_counts.pop(category, None)
+        stats.save(update_fields=['category_counts', 'updated_at'])
@@ -0,0 +1,223 @@
+"""
+Synthetic lab data for benchmarks and local development.
+
+generate() seeds Users, Suppliers, Equipment, UsageRecords,
+EquipmentRequests and Alerts with lab-like distributions and a fixed
+random seed, so two runs with the same volumes produce the same rows:
+
+- roles: ~2% admins, ~10% staff, the rest viewers
+- equipment: weighted categories, log-normal stock levels (a few items
+  low on stock), mostly "Good" condition
+- loans: Zipf-skewed popularity (a handful of items get most loans),
+  1-21 day loan periods over the past year, older loans returned,
+  ~8% of past-due loans still out (overdue), ~3% returned damaged
+- requests: mostly processed, ~10% still pending
+- alerts: low-stock and damage alerts, about a third still active
+
+Model signals are bypassed for speed; dashboard stats, analytics rollups
+and the search index are rebuilt once at the end.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, catalogue, lookups, projection, rollups
+from .bench import analyze, insert_rows
+from .models import Alert, Category, Condition, Equipment, EquipmentRequest, Location, Supplier, UsageRecord, User
+from .search import get_search_backend
+from .stats import rebuild_dashboard_stats
+
+
+DEFAULT_VOLUMES = {
+    'users': 500,
+    'suppliers': 40,
+    'equipment': 2000,
+    'usage_records': 50000,
+    'requests': 5000,
+    'alerts': 400,
+}
+
+PASSWORD = 'bench-pass'
+
+CATEGORIES = [
+    ('Electronics', 30), ('Measurement', 18), ('Optics', 10), ('Glassware', 12),
+    ('Mechanical', 10), ('Computing', 8), ('Chemicals', 7), ('Safety', 5),
+]
+ITEMS = {
+    'Electronics': ['Oscilloscope', 'Function Generator', 'Power Supply', 'Breadboard', 'Soldering Station'],
+    'Measurement': ['Multimeter', 'Vernier Caliper', 'Micrometer', 'Thermometer', 'pH Meter'],
+    'Optics': ['Laser Module', 'Convex Lens', 'Prism', 'Spectrometer', 'Microscope'],
+    'Glassware': ['Beaker', 'Burette', 'Pipette', 'Conical Flask', 'Test Tube Rack'],
+    'Mechanical': ['Torque Wrench', 'Bench Vice', 'Spring Balance', 'Pulley Kit', 'Drill Press'],
+    'Computing': ['Raspberry Pi', 'Arduino Uno', 'FPGA Board', 'Logic Analyzer', 'USB Hub'],
+    'Chemicals': ['Buffer Kit', 'Titration Set', 'Reagent Pack', 'Indicator Set', 'Salt Bridge'],
+    'Safety': ['Goggles', 'Lab Coat', 'Fire Blanket', 'First Aid Kit', 'Fume Hood Filter'],
+}
+MODIFIERS = ['Digital', 'Analog', 'Portable', 'Precision', 'Compact', 'Dual-Channel', 'Student', 'Pro']
+LOCATIONS = [f"Lab {block}{room}" for block in 'ABC' for room in range(101, 106)]
+CONDITIONS = [('Good', 85), ('Fair', 10), ('Needs Repair', 5)]
+
+
+def _weighted(rng, options):
+    values, weights = zip(*options)
+    return rng.choices(values, weights=weights)[0]
+
+
+def generate(volumes=None, seed=42):
+    """Seeds the current database; returns one sample object per role and model for the harness."""
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    password = make_password(PASSWORD)  # hashing once keeps seeding fast
+
+    with transaction.atomic():
+        users = _users(volumes['users'], password, seed)
+        admins = [u for u in users if u.role == 'Admin']
+        staff = [u for u in users if u.role == 'Staff']
+        viewers = [u for u in users if u.role == 'Viewer']
+
+        Supplier.objects.bulk_create(
+            Supplier(name=f"Supplier {n}", contact_no=f"98{rng.randint(10**7, 10**8 - 1)}",
+                     equipments_available=rng.choice([c for c, _ in CATEGORIES]),
+                     email=f"sales{n}@supplier.example", street=f"{rng.randint(1, 300)} Market Road",
+                     city=rng.choice(['Pune', 'Mumbai', 'Bengaluru', 'Chennai', 'Delhi']),
+                     pincode=str(rng.randint(400000, 600000)))
+            for n in range(volumes['suppliers'])
+        )
+
+        rows = _lookup_rows()
+        items = Equipment.objects.bulk_create(
+            _equipment(rng, n, seed, rows) for n in range(volumes['equipment'])
+        )
+        _usage_records(rng, today, items, viewers, staff or admins, volumes['usage_records'])
+        _requests(rng, items, viewers, volumes['requests'])
+        _alerts(rng, items, volumes['alerts'])
+
+    rebuild_dashboard_stats()
+    rollups.rebuild()
+    projection.rebuild()
+    catalogue.record_everything()
+    audit.checkpoint()
+    get_search_backend().rebuild()
+    analyze()
+
+    return {
+        'Admin': admins[0], 'Staff': staff[0], 'Viewer': viewers[0],
+        'equipment': items[0],
+        'usage_record': UsageRecord.objects.filter(returned_on__isnull=True).order_by('id').first(),
+        'alert': Alert.objects.filter(is_active=True).order_by('id').first(),
+        'request': EquipmentRequest.objects.order_by('id').first(),
+    }
+
+
+def _users(count, password, seed):
+    count = max(count, 3)
+    roles = ['Admin', 'Staff', 'Viewer'] + [
+        'Admin' if n % 50 == 0 else 'Staff' if n % 10 == 0 else 'Viewer' for n in range(count - 3)
+    ]
+    return User.objects.bulk_create(
+        # the seed is part of the name so differently seeded runs can share a database
+        User(username=f"{role.lower()}{n}_{seed}", email=f"{role.lower()}{n}@lab.example", role=role,
+             is_approved=True, password=password)
+        for n, role in enumerate(roles)
+    )
+
+
+def _lookup_rows():
+    """{name: row} of every category, location and condition the items can get."""
+    names = ([(Category, name) for name, _ in CATEGORIES] + [(Location, name) for name in LOCATIONS]
+             + [(Condition, name) for name, _ in CONDITIONS])
+    return {name: lookups.resolve(model, name) for model, name in names}
+
+
+def _equipment(rng, n, seed, rows):
+    category = _weighted(rng, CATEGORIES)
+    base = rng.choice(ITEMS[category])
+    # log-normal stock: most items a handful, a few dozens, some (near) zero
+    quantity = min(int(rng.lognormvariate(1.8, 0.9)), 200) if rng.random() > 0.04 else rng.randint(0, 1)
+    return Equipment(
+        asset_tag=f"LAB-{seed}-{n:06d}",
+        name=f"{rng.choice(MODIFIERS)} {base} {rng.randint(100, 999)}",
+        category=rows[category],
+        quantity=quantity,
+        location=rows[rng.choice(LOCATIONS)],
+        condition=rows[_weighted(rng, CONDITIONS)],
+        description=f"{base} for {category.lower()} practicals",
+    )
+
+
+def _usage_records(rng, today, items, viewers, approvers, count):
+    # Zipf-like popularity: the k-th most popular item gets ~1/k^1.1 of the loans
+    popularity = list(items)
+    rng.shuffle(popularity)
+    cum_weights, total = [], 0.0
+    for rank in range(1, len(popularity) + 1):
+        total += 1 / rank ** 1.1
+        cum_weights.append(total)
+
+    def rows():
+        for _ in range(count):
+            item = rng.choices(popularity, cum_weights=cum_weights)[0]
+            age = int(rng.expovariate(1 / 90)) % 365  # more recent loans than old ones
+            borrowed_on = today - timedelta(days=age)
+            due_date = borrowed_on + timedelta(days=rng.randint(1, 21))
+            returned_on = None
+            if due_date < today and rng.random() > 0.08:
+                returned_on = min(today, due_date + timedelta(days=rng.randint(-3, 4)))
+                returned_on = max(returned_on, borrowed_on)
+            elif due_date >= today and rng.random() < 0.3:
+                returned_on = borrowed_on + timedelta(days=rng.randint(0, (today - borrowed_on).days))
+            damaged = returned_on is not None and rng.random() < 0.03
+            approver = rng.choice(approvers)
+            yield (
+                rng.choice(viewers).id, item.id, rng.choice((1, 1, 1, 2, 3)), borrowed_on, due_date,
+                returned_on, damaged, "Cracked casing" if damaged else None, approver.id,
+                approver.id if returned_on else None, '0.00', damaged,
+            )
+
+    insert_rows(UsageRecord, [
+        'user', 'equipment', 'quantity_used', 'borrowed_on', 'due_date', 'returned_on',
+        'is_damaged', 'damage_report', 'approved_by', 'collected_by', 'penalty_amount',
+        'damage_processed',
+    ], rows())
+
+
+def _requests(rng, items, viewers, count):
+    now = timezone.now()
+    requests = []
+    for _ in range(count):
+        status = _weighted(rng, [('approved', 70), ('rejected', 20), ('pending', 10)])
+        requested_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))
+        requests.append(EquipmentRequest(
+            user=rng.choice(viewers), equipment=rng.choice(items), quantity=rng.randint(1, 3),
+            purpose=rng.choice(['Practical session', 'Project work', 'Thesis experiment', '']),
+            status=status, requested_at=requested_at,
+            processed_at=None if status == 'pending' else requested_at + timedelta(hours=rng.randint(1, 48)),
+        ))
+    EquipmentRequest.objects.bulk_create(requests, batch_size=5000)
+    # auto_now_add overrides requested_at on insert; put the spread back
+    EquipmentRequest.objects.bulk_update(requests, ['requested_at'], batch_size=5000)
+
+
+def _alerts(rng, items, count):
+    low_stock = [item for item in items if item.quantity <= 2] or list(items)
+    alerts, active = [], {}
+    for _ in range(count):
+        if rng.random() < 0.6:
+            item = rng.choice(low_stock)
+            alert = Alert(equipment=item, type=Alert.LOW_STOCK, message=f"Only {item.quantity} units left")
+        else:
+            alert = Alert(equipment=rng.choice(items), type=Alert.DAMAGED, message="Damage reported during return")
+        alert.is_active = rng.random() < 0.35
+        if alert.is_active:
+            # one active alert per (item, type): repeats coalesce, as in equipment/alerts.py
+            key = (alert.equipment.id, alert.type)
+            if key in active:
+                active[key].occurrences += 1
+                continue
+            active[key] = alert
+        alerts.append(alert)
+    Alert.objects.bulk_create(alerts)
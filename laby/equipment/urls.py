@@ -1,7 +1,11 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import include, path
 from django.contrib.auth import views as auth_views
 
-from . import views
+from . import async_views, views
+
+# async versions of the busiest pages, for ASGI (see equipment/async_views.py)
+pages = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -11,15 +15,18 @@ urlpatterns = [
 
     # Dashboards
     path('dashboard/', views.dashboard, name='dashboard'),#does not work
-    path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),#perfect
-    path('staff-dashboard/', views.staff_dashboard, name='staff_dashboard'),
-    path('viewer-dashboard/', views.viewer_dashboard, name='viewer_dashboard'),
+    path('admin-dashboard/', pages.admin_dashboard, name='admin_dashboard'),#perfect
+    path('staff-dashboard/', pages.staff_dashboard, name='staff_dashboard'),
+    path('staff-dashboard/requests/batch/', views.batch_process_requests, name='batch_process_requests'),
+    path('viewer-dashboard/', pages.viewer_dashboard, name='viewer_dashboard'),
     path('no-permission/', views.no_permission, name='no_permission'),
+    path('events/', async_views.events_stream, name='events'),
 
     # Equipment Views
     path('equipments/', views.equipment_list, name='equipment_list'),
-    path('equipment/<int:id>/', views.equipment_detail, name='equipment_detail'),
+    path('equipment/<int:id>/', pages.equipment_detail, name='equipment_detail'),
     path('add-equipment/', views.add_equipment, name='add_equipment'),
+    path('import-equipment/', views.import_equipment_view, name='import_equipment'),
     path('equipment/<int:id>/edit/', views.equipment_edit, name='equipment_edit'),
     path('equipment/<int:id>/delete/', views.equipment_delete, name='equipment_delete'),
 
@@ -32,12 +39,24 @@ urlpatterns = [
     path('return/<int:id>/', views.return_equipment, name='return_equipment'),
     # urls.py
     path('request-equipment/', views.request_equipment, name='request_equipment'),
+    path('reservations/', views.reservations, name='reservations'),
+    path('reservations/<int:id>/cancel/', views.cancel_reservation, name='cancel_reservation'),
+    path('equipment/<int:id>/availability/', views.equipment_availability, name='equipment_availability'),
     # Admin user management
     path('admin-dashboard/users/', views.admin_users, name='admin_users'),
     path('admin-dashboard/staff/', views.admin_staff_list, name='admin_staff_list'),
     path('admin-dashboard/approve-staff/<int:id>/', views.approve_staff, name='approve_staff'),
     path('admin-dashboard/borrowers/', views.admin_borrowers, name='admin_borrowers'),
+    path('admin-dashboard/cache-stats/', views.admin_cache_stats, name='admin_cache_stats'),
+    path('admin-dashboard/profiling/', views.admin_profiling, name='admin_profiling'),
+    path('admin-dashboard/analytics/', views.admin_analytics, name='admin_analytics'),
+    path('admin-dashboard/export/usage-records/', views.export_usage_records, name='export_usage_records'),
+    path('admin-dashboard/export/equipment/', views.export_equipment, name='export_equipment'),
+    path('admin-dashboard/export/alerts/', views.export_alerts, name='export_alerts'),
     path('resolve-alert/<int:alert_id>/<str:action>/', views.resolve_alert, name='resolve_alert'),
 
+    # Read-only REST API
+    path('api/', include('equipment.api')),
+
 
 ]
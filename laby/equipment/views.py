@@ -1,24 +1,44 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from django.contrib.auth import login, authenticate, logout
-from django.db.models import F, Count
-from django.db import models
+from django.db import models, transaction
+from django.utils.http import urlencode
+from django.utils.dateparse import parse_date
+from django.conf import settings
+from collections import Counter
+from datetime import timedelta
 
 from .models import (
-    Equipment, Supplier, UsageRecord, Alert, User, EquipmentRequest
+    Equipment, Supplier, UsageRecord, Alert, User, EquipmentRequest, DashboardStats, Reservation, Category, Location
 )
 from .forms import (
-    RegisterForm, EquipmentForm, SupplierForm, EquipmentRequestForm
+    RegisterForm, EquipmentForm, SupplierForm, EquipmentRequestForm,
+    EquipmentImportForm, EquipmentImportUploadForm, ReservationForm,
 )
+from . import alerts, exports, images, lookups, rollups
+from .access import is_admin, is_staff_member
+from .approvals import process_requests
+from .availability import ReservationConflict, cancel, free_units_many, loan_window, reserve, timeline
+from .caching import cache_stats, cached, get_versions
 from .decorators import admin_required, staff_required, viewer_allowed
+from .importer import detect_format, import_equipment, iter_rows
+from .ledger import InsufficientStock, StockLedger
+from .profiling import profile_report
+from .pagination import DEFAULT_PAGE_SIZE, clamp_page_size, paginate_usage_records
+from .search import search_equipment
 
 
 #home 
 def home(request):
-    equipments = Equipment.objects.all()[:5]
-    return render(request, 'equipment/home.html', {'equipments': equipments})
+    # the landing page only changes with the equipment table
+    html = cached('home', ['equipment'], lambda: render_to_string(
+        'equipment/home.html', {'equipments': Equipment.objects.with_lookups().with_availability()[:5]}
+    ))
+    return HttpResponse(html)
 
 #registering new users/saff/admin
 def register_view(request):
@@ -27,13 +47,7 @@ def register_view(request):
         if form.is_valid():
             user = form.save()
             login(request, user)
-
-            if user.role == 'Admin':
-                return redirect('admin_dashboard')
-            elif user.role == 'Staff':
-                return redirect('staff_dashboard')
-            else:
-                return redirect('viewer_dashboard')
+            return _dashboard_for(request, user)
 
         messages.error(request, "Please correct errors below.")
     else:
@@ -50,12 +64,7 @@ def login_view(request):
         user = authenticate(request, username=username, password=password)
         if user:
             login(request, user)
-            if user.role == 'Admin':
-                return redirect('admin_dashboard')
-            elif user.role == 'Staff':
-                return redirect('staff_dashboard')
-            else:
-                return redirect('viewer_dashboard')
+            return _dashboard_for(request, user)
 
         messages.error(request, "Invalid credentials.")
 
@@ -64,14 +73,19 @@ def login_view(request):
 #renders dash boad after login/register
 @login_required
 def dashboard(request):
-    if request.user.role == 'Admin':
+    return _dashboard_for(request, request.user)
+
+
+def _dashboard_for(request, user):
+    if is_admin(user):
         return redirect('admin_dashboard')
-    elif request.user.role == 'Staff':
+    if is_staff_member(user):
         return redirect('staff_dashboard')
+    if user.role == 'Staff':
+        messages.info(request, "Your staff account is waiting for an admin's approval.")
     return redirect('viewer_dashboard')
 
 #this is used by user/viwer to request equipmnet
-@login_required
 @viewer_allowed
 def request_equipment(request):
     if request.method == "POST":
@@ -89,38 +103,103 @@ def request_equipment(request):
     return render(request, 'equipment/request_equipment.html', {'form': form})
 
 
+#book equipment for a future date range
+@viewer_allowed
+def reservations(request):
+    if request.method == "POST":
+        form = ReservationForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                reserve(request.user, data['equipment'].id, data['quantity'],
+                        data['starts_on'], data['ends_on'], data['purpose'])
+            except ReservationConflict as exc:
+                form.add_error('quantity', f"Only {exc.free} unit(s) free for those dates.")
+            else:
+                messages.success(request, f"Reserved {data['quantity']} x {data['equipment'].name}.")
+                return redirect('reservations')
+    else:
+        form = ReservationForm(initial={'equipment': request.GET.get('equipment')})
+
+    upcoming = request.user.reservations.filter(
+        status='active', ends_on__gt=timezone.localdate(),
+    ).select_related('equipment').order_by('starts_on')
+    return render(request, 'equipment/reservations.html', {'form': form, 'reservations': upcoming})
+
+
+@login_required
+def cancel_reservation(request, id):
+    reservation = get_object_or_404(Reservation, id=id)
+    if request.method == "POST":
+        if reservation.user_id == request.user.id or is_staff_member(request.user):
+            cancel(reservation)
+            messages.success(request, "Reservation cancelled.")
+        else:
+            messages.error(request, "You can only cancel your own reservations.")
+    return redirect('reservations')
+
+
+#free units of one item per day range (?start=&end=), for the reservation form
+@login_required
+def equipment_availability(request, id):
+    equipment = get_object_or_404(Equipment.objects.only('id', 'quantity'), id=id)
+    try:
+        start = parse_date(request.GET.get('start') or '') or timezone.localdate()
+        end = parse_date(request.GET.get('end') or '') or start + timedelta(days=30)
+    except ValueError:
+        return JsonResponse({'error': "Dates must be YYYY-MM-DD."}, status=400)
+    if end <= start or (end - start).days > 366:
+        return JsonResponse({'error': "end must be after start, at most a year later."}, status=400)
+
+    segments = timeline(equipment, start, end)
+    return JsonResponse({
+        'equipment': equipment.id,
+        'start': start, 'end': end,
+        'free': min((free for _, _, free in segments), default=0),
+        'timeline': [{'from': held_from, 'until': held_until, 'free': free}
+                     for held_from, held_until, free in segments],
+    })
+
+
 #admin dashboard
 @admin_required
 def admin_dashboard(request):
-    equipments = Equipment.objects.all()
-    suppliers = Supplier.objects.all()
+    # counters come from the DashboardStats snapshot kept up to date by signals
+    context = admin_dashboard_context(DashboardStats.load(), get_versions('equipment', 'alert'),
+                                      lookups.names(Category))
+    return render(request, 'equipment/admin_dashboard.html', context)
 
-    # Existing alerts from Alert table
-    db_alerts = Alert.objects.filter(is_active=True)  # Only DB alerts
 
-    # Generate low-stock alerts dynamically
-    LOW_STOCK_THRESHOLD = 2
-    low_stock_equipments = [eq for eq in equipments if eq.quantity < LOW_STOCK_THRESHOLD]
+def admin_dashboard_context(stats, versions, category_names):
+    # every active alert, low stock included, from one indexed query (evaluated on a cache miss only)
+    db_alerts = alerts.active()
+    low_stock_alerts = _of_type(db_alerts, Alert.LOW_STOCK)
+
+    # counts are keyed by category id; the chart labels them by name
+    category_data = sorted((category_names.get(int(key), key), count)
+                           for key, count in stats.category_counts.items())
+
+    return {
+        'supplier_count': stats.supplier_count,
+        'equipment_count': stats.equipment_count,
+        'borrowed_count': stats.borrowed_count,
+        'alert_count': stats.alert_count,
+        'db_alerts': db_alerts,
+        'low_stock_alerts': low_stock_alerts,
+        'categories': [category for category, _ in category_data],
+        'counts': [count for _, count in category_data],
+        'versions': versions,
+    }
 
-    borrowed_count = UsageRecord.objects.filter(returned_on__isnull=True).count()
-    category_data = Equipment.objects.values('category').annotate(count=Count('id'))
 
-    context = {
-        'equipments': equipments,
-        'supplier_count': suppliers.count(),
-        'equipment_count': equipments.count(),
-        'borrowed_count': borrowed_count,
-        'alert_count': db_alerts.count(),
-        'db_alerts': db_alerts,            # Only DB alerts for resolving
-        'low_stock_equipments': low_stock_equipments,  # Low stock alerts
-        'categories': [c['category'] for c in category_data],
-        'counts': [c['count'] for c in category_data],
-    }
-    return render(request, 'equipment/admin_dashboard.html', context)
+def _of_type(alerts, kind):
+    # a generator function, so the alerts are only read when the template gets this far
+    for alert in alerts:
+        if alert.type == kind:
+            yield alert
 
 
 # Resolve active alerts (discard or add back)
-@login_required
 @admin_required
 def resolve_alert(request, alert_id, action):
     """
@@ -137,8 +216,7 @@ def resolve_alert(request, alert_id, action):
         alert.save()
         messages.success(request, f"{equipment.name} discarded and alert resolved.")
     elif action == "add_back":
-        equipment.quantity += 1
-        equipment.save()
+        StockLedger.apply(equipment.id, 1, 'add_back', user=request.user)
         alert.is_active = False
         alert.save()
         messages.success(request, f"{equipment.name} added back to inventory and alert resolved.")
@@ -170,127 +248,236 @@ def add_supplier(request):
 
 
 #staff dashboard - approve requests, accept back rquipments and sends alret to admin in case of damage or wishlist
-@login_required
 @staff_required
 def staff_dashboard(request):
     today = timezone.now().date()
 
-    borrowed_records = UsageRecord.objects.filter(returned_on__isnull=True)
-    borrowed_count = borrowed_records.count()
-    equipment_count = Equipment.objects.count()
-    alert_count = Alert.objects.filter(is_active=True).count()
+    borrowed_records = UsageRecord.objects.open().with_related().order_by('due_date')
 
-    overdue_records = UsageRecord.objects.filter(
-        returned_on__isnull=True,
-        due_date__lt=today
-    ).annotate(
-        days_overdue=F('due_date') - today
-    )
+    overdue_records = UsageRecord.objects.overdue(today).with_related().order_by('due_date')
 
     # Approving or rejecting equipment requests
     if request.method == "POST" and "request_id" in request.POST:
         action = request.POST.get("action")
         req_id = request.POST.get("request_id")
-        req = get_object_or_404(EquipmentRequest, id=req_id)
-        equipment = req.equipment
-
-        if action == "approve":
-            due_date = request.POST.get("due_date")
-            if not due_date:
-                messages.error(request, "Due date required.")
-                return redirect("staff_dashboard")
-            if req.quantity > equipment.quantity:
-                messages.error(request, "Not enough stock available.")
-                return redirect("staff_dashboard")
-
-            equipment.quantity -= req.quantity
-            equipment.save()
-
-            UsageRecord.objects.create(
-                user=req.user,
-                equipment=equipment,
-                quantity_used=req.quantity,
-                borrowed_on=today,
-                due_date=due_date,
-                purpose=req.purpose or "Requested through dashboard",
-                approved_by=request.user
-            )
-
-            req.status = "approved"
-            req.processed_at = timezone.now()
-            req.save()
-            messages.success(request, f"Approved request for {equipment.name}")
-
-        elif action == "reject":
-            req.status = "rejected"
-            req.processed_at = timezone.now()
-            req.save()
-            messages.info(request, "Request rejected.")
+        due_date = request.POST.get("due_date")
+        if action == "approve" and not (due_date and _is_date(due_date)):
+            messages.error(request, "A valid due date is required.")
+            return redirect("staff_dashboard")
+
+        try:
+            with transaction.atomic():
+                # lock the request so two staff can't process it twice
+                req = get_object_or_404(
+                    EquipmentRequest.objects.select_for_update(of=('self',)).select_related('equipment'), id=req_id
+                )
+                equipment = req.equipment
+                if req.status != 'pending':
+                    messages.error(request, "Request was already processed.")
+                    return redirect("staff_dashboard")
+
+                if action == "approve":
+                    # units reserved during the loan can't go out (see approvals.py)
+                    stock = dict(Equipment.objects.select_for_update().filter(pk=equipment.pk)
+                                 .values_list('id', 'quantity'))
+                    start, end = loan_window(due_date)
+                    free = free_units_many([equipment.pk], start, end, stock=stock).get(equipment.pk, 0)
+                    if free < req.quantity and req.quantity <= stock.get(equipment.pk, 0):
+                        messages.error(request, f"Only {free} {equipment.name} free until {due_date}; "
+                                                f"the rest is reserved.")
+                        return redirect("staff_dashboard")
+                    record = UsageRecord.objects.create(
+                        user_id=req.user_id,
+                        equipment=equipment,
+                        quantity_used=req.quantity,
+                        borrowed_on=today,
+                        due_date=due_date,
+                        approved_by=request.user
+                    )
+                    StockLedger.apply(equipment.id, -req.quantity, 'approve',
+                                      user=request.user, record=record, equipment_request=req)
+
+                    req.status = "approved"
+                    req.processed_at = timezone.now()
+                    req.save()
+                    messages.success(request, f"Approved request for {equipment.name}")
+
+                elif action == "reject":
+                    req.status = "rejected"
+                    req.processed_at = timezone.now()
+                    req.save()
+                    messages.info(request, "Request rejected.")
+        except InsufficientStock:
+            messages.error(request, "Not enough stock available.")
 
         return redirect("staff_dashboard")
 
-    requests_list = EquipmentRequest.objects.filter(status='pending')
+    requests_list = EquipmentRequest.objects.pending().with_related()
+    stats = DashboardStats.load()
+
+    context = staff_dashboard_context(today, borrowed_records, overdue_records, requests_list, stats,
+                                      get_versions('usagerecord', 'equipment'))
+    return render(request, "equipment/staff_dashboard.html", context)
+
 
-    context = {
+def staff_dashboard_context(today, borrowed_records, overdue_records, requests_list, stats, versions):
+    return {
         "borrowed_records": borrowed_records,
-        "borrowed_count": borrowed_count,
-        "equipment_count": equipment_count,
-        "alert_count": alert_count,
+        "borrowed_count": stats.borrowed_count,
+        "equipment_count": stats.equipment_count,
+        "alert_count": stats.alert_count,
         "overdue_records": overdue_records,
         "requests": requests_list,
         "today": today,
+        "versions": versions,
     }
-    return render(request, "equipment/staff_dashboard.html", context)
 
 
 
+def _is_date(text):
+    try:
+        return parse_date(text) is not None
+    except ValueError:
+        # well formed, but no such day
+        return False
+
+
+#approve / reject many pending requests in one go
+@staff_required
+def batch_process_requests(request):
+    if request.method != "POST":
+        return redirect("staff_dashboard")
+    wants_json = 'application/json' in request.headers.get('Accept', '')
+    due_date = request.POST.get("due_date") or None
+    action = request.POST.get("action")
+
+    error, outcomes = None, []
+    if action not in ('approve', 'reject'):
+        error = "Choose whether to approve or reject the requests."
+    elif action == 'approve' and not due_date:
+        error = "A due date is required to approve requests."
+    elif due_date and not _is_date(due_date):
+        error = "Invalid due date."
+    else:
+        try:
+            outcomes = process_requests(request.POST.getlist("request_ids"), action, request.user, due_date)
+        except InsufficientStock:
+            error = "Stock changed while processing the batch; nothing was changed, please retry."
+
+    if wants_json:
+        if error:
+            return JsonResponse({'error': error}, status=400)
+        return JsonResponse({
+            'results': [outcome._asdict() for outcome in outcomes],
+            'counts': Counter(outcome.status for outcome in outcomes),
+        })
+
+    if error:
+        messages.error(request, error)
+    done = [o for o in outcomes if o.status in ('approved', 'rejected')]
+    if done:
+        messages.success(request, f"{done[0].status.capitalize()} {len(done)} request(s).")
+    for outcome in [o for o in outcomes if o not in done][:10]:
+        messages.warning(request, f"Request #{outcome.request_id}: {outcome.message}")
+    return redirect("staff_dashboard")
+
+
 #viewer dashboard with search and filters
-@login_required
 @viewer_allowed
 def viewer_dashboard(request):
-    equipments = Equipment.objects.all()
-    categories = Equipment.objects.values_list('category', flat=True).distinct()
-    locations = Equipment.objects.values_list('location', flat=True).distinct()
+    context = viewer_dashboard_context(request, category_options(), location_options(), get_versions('equipment'))
+    return render(request, 'equipment/viewer_dashboard.html', context)
+
 
-    # Get filters from GET request
+# dropdown options: (id, name) pairs, cached until the lookup table changes
+def category_options():
+    return lookups.options(Category)
+
+
+def location_options():
+    return lookups.options(Location)
+
+
+def viewer_dashboard_context(request, categories, locations, versions):
+    equipments = Equipment.objects.with_lookups().with_availability()
+
+    # Get filters from GET request (lookup ids; anything else means no filter)
     search_name = request.GET.get('name', '')
-    category_filter = request.GET.get('category', '')
-    location_filter = request.GET.get('location', '')
+    category_filter = lookups.parse_id(request.GET.get('category'))
+    location_filter = lookups.parse_id(request.GET.get('location'))
 
     if search_name:
-        equipments = equipments.filter(name__icontains=search_name)
+        # ranked full-text search over name, description, category and location
+        equipments = search_equipment(equipments, search_name)
     if category_filter:
-        equipments = equipments.filter(category=category_filter)
+        equipments = equipments.filter(category_id=category_filter)
     if location_filter:
-        equipments = equipments.filter(location=location_filter)
+        equipments = equipments.filter(location_id=location_filter)
 
-    form = EquipmentRequestForm()
-    context = {
+    # equipments stays lazy: it is only read when the cached cards are rebuilt
+    return {
         'equipments': equipments,
         'categories': categories,
         'locations': locations,
         'search_name': search_name,
         'category_filter': category_filter,
         'location_filter': location_filter,
-        'form': form,
+        'form': EquipmentRequestForm(),
+        'versions': versions,
     }
-    return render(request, 'equipment/viewer_dashboard.html', context)
+
+
+#cache hit/miss counters of this worker process
+@admin_required
+def admin_cache_stats(request):
+    return JsonResponse({'versions': get_versions(), 'backends': cache_stats()})
+
+
+#p50/p95/p99 per view from the profiling middleware
+@admin_required
+def admin_profiling(request):
+    hours = request.GET.get('hours', '24')
+    hours = int(hours) if hours.isdigit() else 24
+    return render(request, 'equipment/admin_profiling.html', {
+        'rows': profile_report(since=timezone.now() - timedelta(hours=hours)),
+        'hours': hours,
+        'enabled': settings.LABY_PROFILING,
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+    })
+
+
+#loan analytics, read from the rollup tables only
+@admin_required
+def admin_analytics(request):
+    start, end = rollups.parse_range(request.GET)
+    category = lookups.parse_id(request.GET.get('category'))
+    report = rollups.report(start, end, category)
+    return render(request, 'equipment/admin_analytics.html', {
+        'report': report,
+        'last_day': end - timedelta(days=1),
+        'category': category,
+        'category_name': lookups.names(Category).get(category),
+        'presets': rollups.RANGE_PRESETS,
+        'trend_labels': [str(row['start']) for row in report['trend']],
+        'trend_utilization': [round((row['utilization'] or 0) * 100, 1) for row in report['trend']],
+        'trend_loans': [row['loans'] for row in report['trend']],
+        'trend_damage': [round((row['damage_rate'] or 0) * 100, 1) for row in report['trend']],
+    })
 
 
 def no_permission(request):
     return render(request, 'equipment/no_permission.html')
 
 #adding equipment by admin
-@login_required
 @admin_required
 def equipment_list(request):
-    equipments = Equipment.objects.all()
+    equipments = Equipment.objects.with_lookups().with_availability()
     return render(request, 'equipment/equipment_list.html', {'equipments': equipments})
 
 
-@login_required
+@viewer_allowed
 def equipment_detail(request, id):
-    equipment = get_object_or_404(Equipment, id=id)
+    equipment = get_object_or_404(Equipment.objects.with_lookups().with_availability(), id=id)
     return render(request, 'equipment/equipment_detail.html', {'equipment': equipment})
 
 
@@ -299,31 +486,84 @@ def add_equipment(request):
     if request.method == 'POST':
         form = EquipmentForm(request.POST, request.FILES)
         if form.is_valid():
-            form.save()
+            images.save_form(form)
             return redirect('equipment_list')
     else:
         form = EquipmentForm()
     return render(request, 'equipment/add_equipment.html', {'form': form})
 
+#bulk import of equipment from csv/jsonl
 @admin_required
-def admin_borrowers(request):
-    # Show all records (both returned and unreturned)
-    borrowers = UsageRecord.objects.all().order_by('-borrowed_on')
+def import_equipment_view(request):
+    result, errors = None, []
+    if request.method == 'POST':
+        form = EquipmentImportUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
 
+            def keep_error(line, row_errors):
+                if len(errors) < 200:  # report stays small even for huge files
+                    errors.append((line, row_errors))
+
+            result = import_equipment(iter_rows(upload, detect_format(upload.name)), on_error=keep_error)
+    else:
+        form = EquipmentImportUploadForm()
+    return render(request, 'equipment/import_equipment.html', {
+        'form': form, 'result': result, 'errors': errors, 'fields': EquipmentImportForm.Meta.fields,
+    })
+
+@admin_required
+def admin_borrowers(request):
     # Optional filters
     user_filter = request.GET.get('user')
     equipment_filter = request.GET.get('equipment')
 
-    if user_filter:
-        borrowers = borrowers.filter(user__username__icontains=user_filter)
-    if equipment_filter:
-        borrowers = borrowers.filter(equipment__name__icontains=equipment_filter)
+    # Show all records (both returned and unreturned)
+    borrowers = UsageRecord.objects.matching(user=user_filter, equipment=equipment_filter).with_related()
+
+    # keyset pagination, newest first
+    page_size = clamp_page_size(request.GET.get('page_size'))
+    page = paginate_usage_records(
+        borrowers,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=page_size,
+    )
+
+    params = {k: v for k, v in (('user', user_filter), ('equipment', equipment_filter)) if v}
+    if page_size != DEFAULT_PAGE_SIZE:
+        params['page_size'] = page_size
 
     return render(request, "equipment/admin_borrowers.html", {
-        "borrowers": borrowers
+        "borrowers": page.object_list,
+        "page": page,
+        "next_query": urlencode({**params, 'after': page.next_cursor}) if page.has_next else "",
+        "prev_query": urlencode({**params, 'before': page.prev_cursor}) if page.has_previous else "",
+        "export_query": urlencode({k: v for k, v in params.items() if k != 'page_size'}),
     })
 
 
+#streaming exports (?format=csv|xlsx)
+@admin_required
+def export_usage_records(request):
+    rows = exports.usage_record_rows(user=request.GET.get('user'), equipment=request.GET.get('equipment'))
+    return exports.export_response('usage-history', exports.USAGE_RECORD_COLUMNS, rows,
+                                   request.GET.get('format', 'csv'))
+
+
+@admin_required
+def export_equipment(request):
+    return exports.export_response('equipment', exports.EQUIPMENT_COLUMNS, exports.equipment_rows(),
+                                   request.GET.get('format', 'csv'))
+
+
+@admin_required
+def export_alerts(request):
+    rows = exports.alert_rows(active_only=request.GET.get('active') == '1')
+    return exports.export_response('alerts', exports.ALERT_COLUMNS, rows,
+                                   request.GET.get('format', 'csv'))
+
+
 
 @admin_required
 def equipment_edit(request, id):
@@ -331,7 +571,7 @@ def equipment_edit(request, id):
     if request.method == 'POST':
         form = EquipmentForm(request.POST, request.FILES, instance=equipment)
         if form.is_valid():
-            form.save()
+            images.save_form(form)
             messages.success(request, "Equipment updated.")
             return redirect('equipment_list')
     else:
@@ -350,51 +590,44 @@ def equipment_delete(request, id):
 
 
 #returning equipment
-@login_required
 @staff_required
 def return_equipment(request, id):
-    record = get_object_or_404(UsageRecord, id=id)
+    record = get_object_or_404(UsageRecord.objects.select_related('equipment'), id=id)
     equipment = record.equipment
 
     if request.method == "POST":
-        if not record.collected_by:
+        if not record.collected_by_id:
             # Mark as collected
             record.collected_by = request.user
+            record.save(update_fields=["collected_by"])
             messages.success(request, f"{equipment.name} collected successfully!")
-        else:
-            # Handle return
+            return redirect('staff_dashboard')
+
+        with transaction.atomic():
+            # re-read under lock so the loan is closed (and restocked) only once
+            record = UsageRecord.objects.select_for_update().get(id=record.id)
+            if record.returned_on:
+                messages.error(request, f"{equipment.name} was already returned.")
+                return redirect('staff_dashboard')
+
             record.returned_on = timezone.now().date()
             record.is_damaged = "is_damaged" in request.POST
             record.damage_report = request.POST.get("damage_report", "")
-            record.penalty_amount = request.POST.get("penalty_amount", 0)
+            # blank keeps the penalty accrued by the overdue scanner
+            record.penalty_amount = request.POST.get("penalty_amount") or record.penalty_amount
 
-            # Update inventory
+            # Update inventory: damaged units are written off, i.e. simply not
+            # restocked (they already left stock when the loan was approved)
             if record.is_damaged:
-                equipment.quantity -= record.quantity_used
-
-                # CREATE ALERT FOR DAMAGE
-                Alert.objects.create(
-                    equipment=equipment,
-                    alert_type="Damaged",
-                    description=record.damage_report or "Damage reported during return",
-                    is_active=True
-                )
+                record.damage_processed = True
             else:
-                equipment.quantity += record.quantity_used
-
-            # CREATE ALERT IF STOCK LOW
-            if equipment.quantity <= 2:
-                Alert.objects.create(
-                    equipment=equipment,
-                    alert_type="Low Stock",
-                    description=f"Only {equipment.quantity} units left",
-                    is_active=True
-                )
+                StockLedger.apply(equipment.id, record.quantity_used, 'return',
+                                  user=request.user, record=record)
 
-            messages.success(request, f"{equipment.name} returned successfully!")
+            # the damage alert and low-stock alert are raised by signals (equipment/alerts.py)
+            record.save()
 
-        record.save()
-        equipment.save()
+        messages.success(request, f"{equipment.name} returned successfully!")
         return redirect('staff_dashboard')
 
     return render(request, "equipment/return_equipment.html", {"record": record})
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'laby.settings')
+# the async dashboard views (settings.ASYNC_VIEWS) pay off under ASGI only
+os.environ.setdefault('LABY_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+from decimal import Decimal
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,10 +54,18 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'equipment.audit.AuditUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in request profiling (manage.py profile_report, /admin-dashboard/profiling/)
+LABY_PROFILING = os.environ.get('LABY_PROFILING') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('LABY_PROFILING_SAMPLE_RATE', 0.1))
+PROFILING_FLUSH_SIZE = 20  # samples buffered per process before one bulk insert
+if LABY_PROFILING:
+    MIDDLEWARE.insert(0, 'equipment.profiling.ProfilingMiddleware')
+
 ROOT_URLCONF = 'laby.urls'
 
 TEMPLATES = [
@@ -82,13 +91,127 @@ WSGI_APPLICATION = 'laby.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# LABY_DB=sqlite (default) or postgres, see `manage.py bench_db_writes` for the difference.
+#
+# SQLite connections are tuned by equipment/db.py on connect (SQLITE_PRAGMAS): WAL so readers
+# don't block the writer, a busy timeout instead of instant "database is locked", and
+# IMMEDIATE transactions so a transaction that will write takes the lock up front rather than
+# failing when it upgrades. LABY_SQLITE_TUNING=0 turns all of that off, for comparison.
+#
+# PostgreSQL keeps connections open for LABY_DB_CONN_MAX_AGE seconds (checked before reuse),
+# or with LABY_DB_POOL=1 uses psycopg 3's connection pool (pip install "psycopg[pool]").
+
+LABY_DB = os.environ.get('LABY_DB', 'sqlite')
+
+if LABY_DB == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('LABY_DB_NAME', 'laby'),
+            'USER': os.environ.get('LABY_DB_USER', 'laby'),
+            'PASSWORD': os.environ.get('LABY_DB_PASSWORD', ''),
+            'HOST': os.environ.get('LABY_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('LABY_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('LABY_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('LABY_DB_POOL') == '1':
+        # the pool replaces persistent connections; Django refuses both at once
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('LABY_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('LABY_DB_POOL_MAX', 10)),
+            'timeout': 10,
+        }
+else:
+    SQLITE_TUNING = os.environ.get('LABY_SQLITE_TUNING', '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('LABY_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20} if SQLITE_TUNING else {},
+        }
+    }
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'busy_timeout': 20000,  # ms, same as the driver timeout above
+        'synchronous': 'NORMAL',  # safe with WAL: a crash can lose the last commits, never corrupt
+        'mmap_size': int(os.environ.get('LABY_SQLITE_MMAP_MB', 256)) * 2**20,
+        'cache_size': -int(os.environ.get('LABY_SQLITE_CACHE_MB', 64)) * 1024,  # negative = KiB
+        'temp_store': 'MEMORY',
+    } if SQLITE_TUNING else {}
+
+
+# Cache
+# Dashboards cache fragments and lookups under per-model version keys (see equipment/caching.py).
+# LABY_CACHE=locmem (default) keeps the cache in process memory; LABY_CACHE=file shares it
+# between worker processes through LABY_CACHE_DIR. Neither needs an external service.
+
+LABY_CACHE = os.environ.get('LABY_CACHE', 'locmem')
+
+if LABY_CACHE == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'equipment.caching.StatsFileBasedCache',
+            'LOCATION': os.environ.get('LABY_CACHE_DIR', str(BASE_DIR / '.cache')),
+            'TIMEOUT': 600,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'equipment.caching.StatsLocMemCache',
+            'LOCATION': 'laby',
+            'TIMEOUT': 600,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
 
+# Uploaded files, and the thumbnail / WebP variants made from equipment images
+# (equipment/images.py) by LABY_IMAGE_WORKERS background threads; 0 = inline.
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.environ.get('LABY_MEDIA_ROOT', BASE_DIR))  # uploads live in BASE_DIR/equipment_images/
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+IMAGE_WORKERS = int(os.environ.get('LABY_IMAGE_WORKERS', 2))
+
+
+# Overdue scanner and reminder emails (manage.py run_scheduler)
+EMAIL_BACKEND = os.environ.get('LABY_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('LABY_FROM_EMAIL', 'laby@localhost')
+OVERDUE_SCAN_INTERVAL = int(os.environ.get('LABY_SCAN_INTERVAL', 300))  # seconds between passes
+OVERDUE_SCAN_BATCH_SIZE = 500
+OVERDUE_PENALTY_PER_DAY = Decimal('10.00')  # per unit, per day overdue
+OVERDUE_REMINDER_EVERY_DAYS = 3
+
+# Alerts (equipment/alerts.py): low-stock threshold, and the shortest gap between
+# two writes of the same alert; repeats in between are counted in memory
+LOW_STOCK_THRESHOLD = 2
+ALERT_COALESCE_SECONDS = 60
+
+# Analytics rollups (equipment/rollups.py); run `manage.py compact_rollups` nightly
+ROLLUP_DAY_RETENTION = 90  # days kept as day rows, then merged into weeks
+ROLLUP_WEEK_RETENTION = 365  # days kept as week rows, then merged into months
+
+# Under ASGI (uvicorn laby.asgi:application) the dashboards and equipment detail run as
+# async views (equipment/async_views.py): laby/asgi.py defaults LABY_ASYNC_VIEWS to 1.
+# Under WSGI and runserver they stay sync, where async views only add overhead.
+# LABY_ASYNC_VIEWS=0/1 overrides either (`manage.py bench_asgi` compares both). The /events/
+# stream is always async; it re-checks the cache versions every EVENTS_POLL_SECONDS to catch
+# changes made by other processes.
+ASYNC_VIEWS = os.environ.get('LABY_ASYNC_VIEWS', '0') == '1'
+EVENTS_POLL_SECONDS = 15
+
+# /api/catalogue/ (equipment/catalogue.py): a delta touching more items than this is sent
+# as the full snapshot instead; the change log behind ?since= is pruned after CATALOGUE_LOG_DAYS
+CATALOGUE_DELTA_LIMIT = 500
+CATALOGUE_LOG_DAYS = 30
+
+# Audit log (equipment/audit.py): the scheduler copies every audited row into a checkpoint
+# once this many events were logged since the last one, bounding as-of replays
+AUDIT_CHECKPOINT_EVENTS = 50000
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,9 +256,13 @@ STATICFILES_DIRS = [BASE_DIR / 'equipment' / 'static']
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = 'home'
+LOGIN_URL = 'login'
+# Role and approval are kept in the session and in API tokens (equipment/access.py), and
+# re-read from the User after it changes, or at the latest after this many seconds
+AUTH_CACHE_SECONDS = 300
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'equipment.access.AccessTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',